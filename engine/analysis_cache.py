@@ -0,0 +1,137 @@
+# Cache of search results by position
+#
+# Services that see the same positions over and over (the opening moves of
+# every web game) can look a search up here before running it. Entries are
+# keyed by the position's Polyglot hash (book.polyglot_key), the search
+# depth and the time limit. The Polyglot hash covers pieces, side to move,
+# castling rights and a capturable en passant square, and is fixed by the
+# format, so persisted entries stay valid across versions. Repetition
+# history and the fifty-move counter are not part of the key.
+#
+# Values are SearchResult.to_dict() dicts. The in-memory LRU keeps up to
+# max_entries of them for at most ttl seconds. Given a path, entries are
+# also written to an SQLite file and read back on a memory miss, so the
+# cache survives restarts and can be shared by processes on one host.
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .book import polyglot_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    key TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    movetime REAL NOT NULL,
+    created REAL NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (key, depth, movetime)
+)
+"""
+
+class AnalysisCache:
+    def __init__(self, max_entries=10000, ttl=None, path=None, clock=time.time):
+        # ttl in seconds, None to keep entries until evicted. clock is
+        # wall-clock time, since persisted timestamps outlive the process.
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()   # key -> (created, result), LRU first
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+        self.hits = 0
+        self.disk_hits = 0    # hits served from the SQLite file
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(board, depth, movetime):
+        return f"{polyglot_key(board):016x}", depth, float(movetime)
+
+    def _fresh(self, created, now):
+        return self.ttl is None or now - created < self.ttl
+
+    def _remember(self, key, created, result):
+        self._entries[key] = (created, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, board, depth, movetime):
+        # Cached result dict, or None
+        key = self.key(board, depth, movetime)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, result FROM analysis WHERE key = ? AND depth = ? AND movetime = ?",
+                    key).fetchone()
+                if row is not None and self._fresh(row[0], now):
+                    result = json.loads(row[1])
+                    self._remember(key, row[0], result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def put(self, board, depth, movetime, result):
+        key = self.key(board, depth, movetime)
+        now = self.clock()
+        with self._lock:
+            self._remember(key, now, result)
+            self.stores += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?)",
+                                 key + (now, json.dumps(result)))
+
+    def prune(self):
+        # Drop expired rows from the file; returns how many
+        if self._db is None or self.ttl is None:
+            return 0
+        with self._lock:
+            return self._db.execute("DELETE FROM analysis WHERE created <= ?",
+                                    (self.clock() - self.ttl,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM analysis")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
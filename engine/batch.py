@@ -0,0 +1,257 @@
+# Batch analysis of positions from EPD, FEN or PGN files
+#
+# Usage:
+#   python -m engine.batch positions.epd -o results.jsonl --depth 6
+#   python -m engine.batch games.pgn -o results.jsonl --movetime 0.5 --workers 8
+#   python -m engine.batch positions.fen -o results.jsonl --resume
+#
+# Positions are read lazily, searched in a process pool and written as one
+# JSON line each as soon as they finish (in input order, or in completion
+# order with --unordered). At most `window` positions are in flight or
+# waiting to be written, so memory stays flat for inputs of any size.
+#
+# With an output file, progress is checkpointed next to it (<output>.ckpt):
+# the output size, the first input index not yet written and the written
+# indices past it. --resume truncates the output to the checkpointed size
+# and skips what is done, so every position appears exactly once.
+#
+# EPD operations acd (depth) and acs (seconds) override the limits for
+# their position, and bm/am are checked against the engine's move.
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from . import search as search_mod
+from .board import Board
+from .pgn import read_games, parse_san
+
+DEFAULT_DEPTH = 4
+# Seconds between checkpoint writes
+CHECKPOINT_INTERVAL = 1.0
+EPD_OPERATION = re.compile(r'\s*(\w+)\s*((?:"[^"]*"|[^;])*);?')
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return {'.epd': 'epd', '.pgn': 'pgn'}.get(ext, 'fen')
+
+def read_fens(lines):
+    # FEN per line; blank lines and '#' comments are skipped
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield {'id': str(n), 'fen': line}
+
+def read_epd(lines):
+    # EPD: four FEN fields followed by operations ('bm e4; id "x";')
+    for n, line in enumerate(lines, 1):
+        fields = line.strip().split(None, 4)
+        if len(fields) < 4 or fields[0].startswith('#'):
+            continue
+        ops = {}
+        for name, value in EPD_OPERATION.findall(fields[4] if len(fields) > 4 else ""):
+            ops[name] = value.strip().strip('"')
+        fen = " ".join(fields[:4]) + f" {ops.get('hmvc', 0)} {ops.get('fmvn', 1)}"
+        job = {'id': ops.get('id', str(n)), 'fen': fen}
+        if 'acd' in ops:
+            job['depth'] = int(ops['acd'])
+        if 'acs' in ops:
+            job['movetime'] = float(ops['acs'])
+        for op in ('bm', 'am'):
+            if op in ops:
+                job[op] = ops[op].split()
+        yield job
+
+def read_pgn(lines):
+    # Every position of every game, before each move is played
+    for g, (tags, moves) in enumerate(read_games(lines), 1):
+        board = Board(tags['FEN']) if 'FEN' in tags else Board()
+        for ply, san in enumerate(moves):
+            yield {'id': f"{g}.{ply}", 'fen': board.fen()}
+            try:
+                board.make_move(parse_san(board, san))
+            except ValueError:
+                # Rest of the game is unreadable; keep what we have
+                break
+
+READERS = {'fen': read_fens, 'epd': read_epd, 'pgn': read_pgn}
+
+def read_positions(path, fmt=None):
+    # Jobs (dicts with id, fen and optional limits) from a file, lazily
+    with open(path) as f:
+        yield from READERS[fmt or detect_format(path)](f)
+
+def analyse_job(job, depth=None, movetime=None):
+    # Runs in a worker process: search one job, return its result record.
+    # The table is cleared so depth-limited results do not depend on which
+    # positions a worker saw before.
+    result = {'index': job['index'], 'id': job['id'], 'fen': job['fen']}
+    try:
+        board = Board(job['fen'])
+        depth = job.get('depth', depth)
+        movetime = job.get('movetime', movetime)
+        if depth is None and movetime is None:
+            depth = DEFAULT_DEPTH
+        search_mod.clear_tt()
+        start = time.perf_counter()
+        found = search_mod.analyse(board, depth or search_mod.MAX_PLY, movetime)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+        return result
+    best = found.best_move
+    result.update(best_move=best.to_uci() if best else None, score=found.score,
+                  depth=found.depth, pv=[m.to_uci() for m in found.pv],
+                  nodes=found.stats.nodes, time=round(elapsed, 3))
+    for op in ('bm', 'am'):
+        if op in job:
+            moves = set()
+            for san in job[op]:
+                try:
+                    moves.add(parse_san(board, san))
+                except ValueError:
+                    pass
+            result[op] = job[op]
+            result['solved'] = result.get('solved', True) and (best in moves) == (op == 'bm')
+    return result
+
+def run_batch(jobs, depth=None, movetime=None, workers=None, ordered=True, window=None):
+    # Search jobs in a process pool and yield result records. Jobs need a
+    # unique 'index'; results come in job order unless ordered is False.
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+    jobs = iter(jobs)
+    # Spawned like the search pools (see parallel.py), never forked
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        running = set()
+        order = []      # indices submitted and not yet yielded, in job order
+        finished = {}   # index -> result waiting for earlier indices
+        exhausted = False
+        while True:
+            # Keep the window full; ordered mode counts results held back
+            while not exhausted and len(order if ordered else running) < window:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                running.add(pool.submit(analyse_job, job, depth, movetime))
+                order.append(job['index'])
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if ordered:
+                    finished[result['index']] = result
+                else:
+                    order.remove(result['index'])
+                    yield result
+            while ordered and order and order[0] in finished:
+                yield finished.pop(order.pop(0))
+
+class Checkpoint:
+    # Which input indices have been written, and how much output that is
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input_path = input_path
+        self.offset = 0
+        self.next = 0          # every index below this is written
+        self.done = set()      # written indices above next
+
+    @classmethod
+    def load(cls, path, input_path):
+        with open(path) as f:
+            state = json.load(f)
+        if state['input'] != input_path:
+            raise ValueError(f"{path} is a checkpoint for {state['input']}, not {input_path}")
+        checkpoint = cls(path, input_path)
+        checkpoint.offset = state['offset']
+        checkpoint.next = state['next']
+        checkpoint.done = set(state['done'])
+        return checkpoint
+
+    def is_done(self, index):
+        return index < self.next or index in self.done
+
+    def mark(self, index, offset):
+        self.offset = offset
+        self.done.add(index)
+        while self.next in self.done:
+            self.done.remove(self.next)
+            self.next += 1
+
+    def save(self):
+        state = {'input': self.input_path, 'offset': self.offset,
+                 'next': self.next, 'done': sorted(self.done)}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+def analyse_file(input_path, output_path=None, fmt=None, depth=None, movetime=None,
+                 workers=None, ordered=True, resume=False):
+    # Analyse every position in input_path into JSONL at output_path
+    # (stdout if None). Returns the number of results written.
+    checkpoint = None
+    if output_path is None:
+        out = sys.stdout.buffer
+    else:
+        ckpt_path = output_path + ".ckpt"
+        if resume and os.path.exists(ckpt_path):
+            checkpoint = Checkpoint.load(ckpt_path, input_path)
+            out = open(output_path, "r+b")
+            out.truncate(checkpoint.offset)
+            out.seek(checkpoint.offset)
+        else:
+            checkpoint = Checkpoint(ckpt_path, input_path)
+            out = open(output_path, "wb")
+
+    jobs = (dict(job, index=i) for i, job in enumerate(read_positions(input_path, fmt)))
+    if checkpoint is not None:
+        jobs = (job for job in jobs if not checkpoint.is_done(job['index']))
+    written = 0
+    last_save = time.monotonic()
+    try:
+        for result in run_batch(jobs, depth, movetime, workers, ordered):
+            out.write(json.dumps(result).encode() + b"\n")
+            out.flush()
+            written += 1
+            if checkpoint is not None:
+                checkpoint.mark(result['index'], out.tell())
+                if time.monotonic() - last_save >= CHECKPOINT_INTERVAL:
+                    checkpoint.save()
+                    last_save = time.monotonic()
+    finally:
+        if checkpoint is not None:
+            checkpoint.save()
+            out.close()
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse positions from EPD, FEN or PGN files")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--format", choices=sorted(READERS), help="input format (default: from extension)")
+    parser.add_argument("--depth", type=int, help=f"search depth (default {DEFAULT_DEPTH} without --movetime)")
+    parser.add_argument("--movetime", type=float, help="seconds per position")
+    parser.add_argument("--workers", type=int, help="search processes (default: CPU count)")
+    parser.add_argument("--unordered", action="store_true", help="write results as they finish")
+    parser.add_argument("--resume", action="store_true", help="continue from the output's checkpoint")
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+
+    start = time.perf_counter()
+    written = analyse_file(args.input, args.output, args.format, args.depth, args.movetime,
+                           args.workers, not args.unordered, args.resume)
+    elapsed = time.perf_counter() - start
+    print(f"{written} positions in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Vectorized evaluation of many positions at once
+#
+# Positions are packed as an (N, 64) int8 array of piece constants in
+# mailbox order (index 0 = a8), or as (N, 12) uint64 bitboard planes
+# (Board.pieces[1:13]). Scores are the same tapered material + PST values
+# as eval.evaluate, from white's point of view.
+import numpy as np
+
+from .board import STR_PIECE, EMPTY, wP, bP, wK, bK, WHITE, CASTLE_ROOK
+from .pst import PST_MG, PST_EG, PHASE, PHASE_MAX
+
+MG = np.array(PST_MG, dtype=np.int32)    # (13, 64), signed per colour
+EG = np.array(PST_EG, dtype=np.int32)
+PHASE_NP = np.array(PHASE, dtype=np.int32)
+SQUARES = np.arange(64)
+BITS = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+# Rook relocation for castling, indexed by king target square (-1: none)
+ROOK_FROM = np.full(64, -1, dtype=np.int64)
+ROOK_TO = np.full(64, -1, dtype=np.int64)
+for _king_to, (_from, _to) in CASTLE_ROOK.items():
+    ROOK_FROM[_king_to] = _from
+    ROOK_TO[_king_to] = _to
+
+def _taper(mg, eg, phase):
+    phase = np.minimum(phase, PHASE_MAX)  # Extra queens from promotion
+    return (mg * phase + eg * (PHASE_MAX - phase)) // PHASE_MAX
+
+def evaluate_batch(squares):
+    # squares: (N, 64) array of piece constants. Returns (N,) int64 scores.
+    squares = np.asarray(squares, dtype=np.intp)
+    mg = MG[squares, SQUARES].sum(axis=1, dtype=np.int64)
+    eg = EG[squares, SQUARES].sum(axis=1, dtype=np.int64)
+    phase = PHASE_NP[squares].sum(axis=1, dtype=np.int64)
+    return _taper(mg, eg, phase)
+
+def evaluate_planes(planes):
+    # planes: (N, 12) uint64 bitboards for wP..bK. Returns (N,) int64 scores.
+    planes = np.asarray(planes, dtype=np.uint64)
+    bits = ((planes[:, :, None] & BITS) != 0).astype(np.int64)  # (N, 12, 64)
+    mg = np.einsum('npk,pk->n', bits, MG[1:].astype(np.int64))
+    eg = np.einsum('npk,pk->n', bits, EG[1:].astype(np.int64))
+    phase = bits.sum(axis=2) @ PHASE_NP[1:].astype(np.int64)
+    return _taper(mg, eg, phase)
+
+def pack_boards(boards):
+    # Board objects -> (N, 64) int8
+    return np.array([b.mailbox for b in boards], dtype=np.int8).reshape(-1, 64)
+
+def pack_planes(boards):
+    # Board objects -> (N, 12) uint64
+    return np.array([b.pieces[1:13] for b in boards], dtype=np.uint64).reshape(-1, 12)
+
+def pack_fens(fens):
+    # FEN strings -> (N, 64) int8, reading only the piece placement field
+    out = np.zeros((len(fens), 64), dtype=np.int8)
+    for i, fen in enumerate(fens):
+        row = out[i]
+        sq = 0
+        for char in fen.split(None, 1)[0]:
+            if char == '/':
+                continue
+            if char.isdigit():
+                sq += int(char)
+            else:
+                row[sq] = STR_PIECE[char]
+                sq += 1
+    return out
+
+def evaluate_fens(fens):
+    return evaluate_batch(pack_fens(fens))
+
+def child_squares(board, moves):
+    # (N, 64) positions after each of `moves` (int codes) from `board`,
+    # built without make/unmake
+    moves = np.asarray(moves, dtype=np.int64)
+    n = len(moves)
+    start, end, promo = moves & 63, (moves >> 6) & 63, moves >> 12
+    out = np.repeat(np.array(board.mailbox, dtype=np.int8)[None, :], n, axis=0)
+    rows = np.arange(n)
+    piece = out[rows, start].astype(np.int64)
+    white = board.turn == WHITE
+    placed = np.where(promo > 0, promo + (1 if white else 7), piece)
+
+    # En passant: the captured pawn is beside the target square
+    if board.en_passant is not None:
+        ep = (end == board.en_passant) & (piece == (wP if white else bP))
+        out[rows[ep], end[ep] + (8 if white else -8)] = EMPTY
+    # Castling: the king moves two files and the rook comes along
+    castle = (piece == (wK if white else bK)) & (np.abs(start - end) == 2)
+    if castle.any():
+        r = rows[castle]
+        rook_from, rook_to = ROOK_FROM[end[castle]], ROOK_TO[end[castle]]
+        out[r, rook_to] = out[r, rook_from]
+        out[r, rook_from] = EMPTY
+
+    out[rows, start] = EMPTY
+    out[rows, end] = placed
+    return out
+
+def evaluate_children(board, moves):
+    # Static eval after each move, from white's point of view
+    return evaluate_batch(child_squares(board, moves))
@@ -0,0 +1,310 @@
+# Endgame bitbases
+#
+# Win/draw/loss tables for king + pieces against a lone king (KQK, KRK,
+# KPK, KBNK), built by retrograde analysis over Board's own legal move
+# generator and stored at two bits per position. Tables are opened with
+# mmap, so probing reads a single byte and loading costs nothing.
+#
+# Usage:
+#   python -m engine.bitbase --dir bitbases            # build all tables
+#   python -m engine.bitbase --dir bitbases KRK KPK    # build some
+#
+# Positions are indexed with the strong side as white: (side to move,
+# strong king, weak king, strong pieces...). Pawnless tables keep only the
+# 10 strong-king squares of the a1-d1-d4 triangle (board symmetry), pawn
+# tables only pawns on files a-d (mirror symmetry). Side to move 0 means
+# the strong side moves.
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from .board import Board, WHITE, BLACK, wP, wN, wB, wR, wQ, wK, bK
+from .bitboard import BIT, KING_ATTACKS, popcount
+from .move import move_buffer
+
+MAGIC = b"CEBB"
+VERSION = 1
+# magic, version, ending name, number of positions
+HEADER = struct.Struct("<4sB7sQ")
+EXTENSION = ".bb"
+
+# Stored values are wdl + 1: 0 loss, 1 draw, 2 win for the side to move
+LOSS, DRAW, WIN = -1, 0, 1
+
+def _transform(sq, t):
+    # One of the 8 board symmetries: bit 0 mirrors files, bit 1 mirrors
+    # rows, bit 2 transposes
+    row, col = divmod(sq, 8)
+    if t & 1:
+        col = 7 - col
+    if t & 2:
+        row = 7 - row
+    if t & 4:
+        row, col = col, row
+    return row * 8 + col
+
+SYMMETRY = [[_transform(sq, t) for sq in range(64)] for t in range(8)]
+# a1-d1-d4 triangle (row 7 is the first rank)
+TRIANGLE = [sq for sq in range(64) if sq // 8 >= 4 and sq % 8 <= 3 and 7 - sq // 8 <= sq % 8]
+# Symmetry that brings a king on each square into the triangle
+KING_SYMMETRY = [next(t for t in range(8) if SYMMETRY[t][sq] in TRIANGLE) for sq in range(64)]
+
+class Ending:
+    def __init__(self, name, pieces):
+        # pieces: white piece constants beside the king, in index order
+        self.name = name
+        self.pieces = pieces
+        self.pawns = wP in pieces
+        self.king_squares = list(range(64)) if self.pawns else TRIANGLE
+        self.king_index = {sq: i for i, sq in enumerate(self.king_squares)}
+        self.size = 2 * len(self.king_squares) * 64 ** (len(pieces) + 1)
+
+    def canonical(self, sk, wk, squares):
+        # Strong king, weak king and piece squares in table orientation
+        if self.pawns:
+            if squares[self.pieces.index(wP)] % 8 > 3:
+                return sk ^ 7, wk ^ 7, [s ^ 7 for s in squares]
+            return sk, wk, squares
+        sym = SYMMETRY[KING_SYMMETRY[sk]]
+        return sym[sk], sym[wk], [sym[s] for s in squares]
+
+    def index(self, stm, sk, wk, squares):
+        sk, wk, squares = self.canonical(sk, wk, squares)
+        idx = (stm * len(self.king_squares) + self.king_index[sk]) * 64 + wk
+        for s in squares:
+            idx = idx * 64 + s
+        return idx
+
+ENDINGS = {
+    'KQK': Ending('KQK', [wQ]),
+    'KRK': Ending('KRK', [wR]),
+    'KPK': Ending('KPK', [wP]),
+    'KBNK': Ending('KBNK', [wB, wN]),
+}
+# Build order: KPK promotes into KQK / KRK
+BUILD_ORDER = ['KQK', 'KRK', 'KPK', 'KBNK']
+# Tables keyed by sorted strong-side piece types
+BY_MATERIAL = {tuple(sorted(e.pieces)): e for e in ENDINGS.values()}
+# Lone king, or king and one minor piece, against a king cannot be won
+DRAWN_MATERIAL = {(), (wN,), (wB,)}
+MAX_MEN = 2 + max(len(e.pieces) for e in ENDINGS.values())
+
+class Bitbase:
+    # One mmap'd table file
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, name, size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a bitbase file")
+        self.ending = ENDINGS[name.rstrip(b"\0").decode()]
+        if size != self.ending.size:
+            self._mmap.close()
+            raise ValueError(f"{path} has {size} entries, expected {self.ending.size}")
+
+    def wdl(self, idx):
+        byte = self._mmap[HEADER.size + (idx >> 2)]
+        return ((byte >> ((idx & 3) * 2)) & 3) - 1
+
+    def close(self):
+        self._mmap.close()
+
+class Bitbases:
+    # All tables found in a directory
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}
+        for name in ENDINGS:
+            path = os.path.join(directory, name + EXTENSION)
+            if os.path.exists(path):
+                self.tables[name] = Bitbase(path)
+        self.max_men = max((len(t.ending.pieces) + 2 for t in self.tables.values()), default=0)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def close(self):
+        for t in self.tables.values():
+            t.close()
+        self.tables = {}
+        self.max_men = 0
+
+    def probe(self, board):
+        # WIN / DRAW / LOSS for the side to move, or None if no table covers
+        # the position
+        occupancy = board.occupancy
+        if popcount(occupancy[BLACK]) == 1:
+            strong = WHITE
+        elif popcount(occupancy[WHITE]) == 1:
+            strong = BLACK
+        else:
+            return None
+        off = 0 if strong == WHITE else 6
+        found = []
+        for p in (wP, wN, wB, wR, wQ):
+            bb = board.pieces[p + off]
+            while bb:
+                low = bb & -bb
+                bb ^= low
+                found.append((p, low.bit_length() - 1))
+        material = tuple(sorted(p for p, _ in found))
+        if material in DRAWN_MATERIAL:
+            return DRAW
+        ending = BY_MATERIAL.get(material)
+        if ending is None or ending.name not in self.tables:
+            return None
+        # Strong side as white: black's pieces are mirrored onto white's rows
+        flip = 0 if strong == WHITE else 56
+        squares = [next(sq for p2, sq in found if p2 == p) ^ flip for p in ending.pieces]
+        stm = 0 if board.turn == strong else 1
+        idx = ending.index(stm, board.king_sq[strong] ^ flip, board.king_sq[strong ^ 1] ^ flip, squares)
+        return self.tables[ending.name].wdl(idx)
+
+def _positions(ending):
+    # (index, side to move, strong king, weak king, piece squares) for every
+    # slot, in index order
+    n = len(ending.pieces)
+    idx = 0
+    for stm in (0, 1):
+        for sk in ending.king_squares:
+            for wk in range(64):
+                for combo in range(64 ** n):
+                    squares = []
+                    for _ in range(n):
+                        squares.append(combo % 64)
+                        combo //= 64
+                    squares.reverse()
+                    yield idx, stm, sk, wk, squares
+                    idx += 1
+
+def _setup(board, ending, stm, sk, wk, squares):
+    # Place the position on a scratch board; returns False if it is
+    # invalid or not in canonical orientation
+    if KING_ATTACKS[sk] & BIT[wk]:
+        return False
+    used = BIT[sk] | BIT[wk]
+    for p, s in zip(ending.pieces, squares):
+        if used & BIT[s] or (p == wP and (s < 8 or s >= 56)):
+            return False
+        used |= BIT[s]
+    if ending.canonical(sk, wk, squares) != (sk, wk, squares):
+        return False
+    board.pieces = [0] * 13
+    board.occupancy = [0, 0]
+    board.mailbox = [0] * 64
+    board._put(sk, wK)
+    board._put(wk, bK)
+    for p, s in zip(ending.pieces, squares):
+        board._put(s, p)
+    board.king_sq = [sk, wk]
+    board.turn = WHITE if stm == 0 else BLACK
+    board.en_passant = None
+    board.castling_rights = 0
+    # The side that just moved may not be in check
+    occ = board.occupancy[WHITE] | board.occupancy[BLACK]
+    return not board.attackers_to(board.king_sq[board.turn ^ 1], board.turn, occ)
+
+def generate(name, directory, log=None):
+    # Build one table by retrograde analysis and write it to directory.
+    # Tables it promotes into must already be there.
+    import numpy as np
+
+    ending = ENDINGS[name]
+    deps = Bitbases(directory)
+    board = Board("8/8/8/8/8/8/8/8 w - - 0 1")
+    buf = move_buffer()
+    start_time = time.perf_counter()
+
+    # Successor graph in CSR form for every position with legal moves.
+    # Children inside this table are stored as their index; children in
+    # other tables (promotion, captures) as -2 - wdl.
+    values = np.zeros(ending.size, dtype=np.int8)
+    owners = array('i')
+    offsets = array('i')
+    children = array('i')
+    for idx, stm, sk, wk, squares in _positions(ending):
+        if not _setup(board, ending, stm, sk, wk, squares):
+            continue
+        n = board.generate(buf)
+        if not n:
+            values[idx] = LOSS if board.in_check() else DRAW
+            continue
+        owners.append(idx)
+        offsets.append(len(children))
+        for move in buf[:n]:
+            start, end = move & 63, (move >> 6) & 63
+            if move >> 12 or board.mailbox[end]:
+                # Material changes: look the child up in another table
+                board.make_move(move)
+                wdl = deps.probe(board)
+                board.unmake_move(move)
+                if wdl is None:
+                    raise RuntimeError(f"{name} needs tables missing from {directory}")
+                children.append(-2 - wdl)
+            elif start == sk:
+                children.append(ending.index(stm ^ 1, end, wk, squares))
+            elif start == wk:
+                children.append(ending.index(stm ^ 1, sk, end, squares))
+            else:
+                moved = [end if s == start else s for s in squares]
+                children.append(ending.index(stm ^ 1, sk, wk, moved))
+    deps.close()
+    if log:
+        log(f"{name}: {len(owners)} positions, {len(children)} moves "
+            f"({time.perf_counter() - start_time:.1f}s)")
+
+    # Iterate to a fixed point: a position is won if some move reaches a
+    # position lost for the opponent, lost if every move reaches a won one
+    owners = np.frombuffer(owners, dtype=np.int32)
+    offsets = np.frombuffer(offsets, dtype=np.int32)
+    children = np.frombuffer(children, dtype=np.int32)
+    external = children < 0
+    external_values = (-2 - children[external]).astype(np.int8)
+    internal = np.where(external, 0, children)
+    passes = 0
+    while True:
+        passes += 1
+        child = values[internal]
+        child[external] = external_values
+        won = np.logical_or.reduceat(child == LOSS, offsets)
+        lost = np.logical_and.reduceat(child == WIN, offsets)
+        new = np.where(won, WIN, np.where(lost, LOSS, DRAW)).astype(np.int8)
+        if np.array_equal(new, values[owners]):
+            break
+        values[owners] = new
+    if log:
+        log(f"{name}: solved in {passes} passes ({time.perf_counter() - start_time:.1f}s)")
+
+    # Two bits per position, four positions per byte
+    stored = (values + 1).astype(np.uint8)
+    stored = np.concatenate([stored, np.full(-len(stored) % 4, DRAW + 1, dtype=np.uint8)])
+    quads = stored.reshape(-1, 4)
+    packed = quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+    path = os.path.join(directory, name + EXTENSION)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, name.encode(), ending.size))
+        f.write(packed.astype(np.uint8).tobytes())
+    os.replace(tmp, path)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build endgame bitbases")
+    parser.add_argument("endings", nargs="*", default=BUILD_ORDER,
+                        help=f"tables to build (default: {' '.join(BUILD_ORDER)})")
+    parser.add_argument("--dir", default="bitbases", help="output directory")
+    args = parser.parse_args(argv)
+    os.makedirs(args.dir, exist_ok=True)
+    for name in BUILD_ORDER:
+        if name in args.endings:
+            generate(name, args.dir, log=print)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Bitboard helpers and precomputed attack tables
+#
+# Square numbering follows board.py: index 0 is a8, index 63 is h1, so
+# bit `sq` of a bitboard is set when that square is occupied.
+# White pawns move towards lower indices (-8), black pawns towards higher (+8).
+
+FULL = (1 << 64) - 1
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_8 = 0xFF            # row 0
+RANK_1 = 0xFF << 56      # row 7
+
+BIT = [1 << sq for sq in range(64)]
+
+
+def popcount(bb):
+    return bb.bit_count()
+
+
+def lsb(bb):
+    # Index of the least significant set bit (bb must be non-zero)
+    return (bb & -bb).bit_length() - 1
+
+
+def iter_bits(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def _on_board(r, f):
+    return 0 <= r < 8 and 0 <= f < 8
+
+
+def _step_table(deltas):
+    table = []
+    for sq in range(64):
+        r, f = divmod(sq, 8)
+        bb = 0
+        for dr, df in deltas:
+            if _on_board(r + dr, f + df):
+                bb |= 1 << ((r + dr) * 8 + f + df)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                              (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _step_table([(-1, -1), (-1, 0), (-1, 1), (0, -1),
+                            (0, 1), (1, -1), (1, 0), (1, 1)])
+# PAWN_ATTACKS[color][sq]: squares a pawn of `color` standing on sq attacks.
+# Index 0 is WHITE (captures towards row - 1), index 1 is BLACK.
+PAWN_ATTACKS = [
+    _step_table([(-1, -1), (-1, 1)]),
+    _step_table([(1, -1), (1, 1)]),
+]
+
+
+# Sliding pieces use one lookup per line through the square (rank, file,
+# diagonal, anti-diagonal). Each line table is indexed by the occupancy of
+# the line with the square itself and the edge squares masked out, which
+# keeps every table at <= 64 entries per square.
+
+def _ray(sq, dr, df):
+    r, f = divmod(sq, 8)
+    squares = []
+    r, f = r + dr, f + df
+    while _on_board(r, f):
+        squares.append(r * 8 + f)
+        r, f = r + dr, f + df
+    return squares
+
+
+def _line_tables(dir_a, dir_b):
+    masks = []
+    tables = []
+    for sq in range(64):
+        rays = [_ray(sq, *dir_a), _ray(sq, *dir_b)]
+        mask = 0
+        for ray in rays:
+            for s in ray[:-1]:
+                mask |= 1 << s
+        table = {}
+        sub = 0
+        while True:
+            attacks = 0
+            for ray in rays:
+                for s in ray:
+                    attacks |= 1 << s
+                    if sub >> s & 1:
+                        break
+            table[sub] = attacks
+            sub = (sub - mask) & mask
+            if sub == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+RANK_MASK, RANK_ATTACKS = _line_tables((0, -1), (0, 1))
+FILE_MASK, FILE_ATTACKS = _line_tables((-1, 0), (1, 0))
+DIAG_MASK, DIAG_ATTACKS = _line_tables((-1, -1), (1, 1))
+ANTI_MASK, ANTI_ATTACKS = _line_tables((-1, 1), (1, -1))
+
+
+def rook_attacks(sq, occ):
+    return (RANK_ATTACKS[sq][occ & RANK_MASK[sq]] |
+            FILE_ATTACKS[sq][occ & FILE_MASK[sq]])
+
+
+def bishop_attacks(sq, occ):
+    return (DIAG_ATTACKS[sq][occ & DIAG_MASK[sq]] |
+            ANTI_ATTACKS[sq][occ & ANTI_MASK[sq]])
+
+
+def queen_attacks(sq, occ):
+    return rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+
+
+def _between_and_line():
+    # BETWEEN[a][b]: squares strictly between a and b when they share a
+    # rank, file or diagonal (0 otherwise).
+    # LINE[a][b]: the full board line through a and b (0 if not aligned).
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for dr, df in [(-1, 0), (1, 0), (0, -1), (0, 1),
+                       (-1, -1), (-1, 1), (1, -1), (1, 1)]:
+            full = 1 << a
+            for s in _ray(a, dr, df) + _ray(a, -dr, -df):
+                full |= 1 << s
+            path = 0
+            for s in _ray(a, dr, df):
+                between[a][s] = path
+                line[a][s] = full
+                path |= 1 << s
+    return between, line
+
+
+BETWEEN, LINE = _between_and_line()
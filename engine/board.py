@@ -1,5 +1,11 @@
-import copy
-from .move import Move
+# Chess Engine Package
+from .move import Move, move_buffer, UCI_NAMES, SQUARE_NAMES
+from .bitboard import (
+    BIT, FULL, BETWEEN, LINE, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+    rook_attacks, bishop_attacks, queen_attacks,
+)
+from .zobrist import PIECE_KEYS, CASTLE_KEYS, EP_KEYS, SIDE_KEY
+from .pst import PST_MG, PST_EG, PHASE
 
 # Piece constants
 EMPTY = 0
@@ -16,40 +22,102 @@ STR_PIECE = {v: k for k, v in PIECE_STR.items()}
 WHITE = 0
 BLACK = 1
 
+PROMO_PIECE = {'q': wQ, 'r': wR, 'b': wB, 'n': wN}
+# Promotion bits of a move code (see move.py), queen first. The promoted
+# piece is (code >> 12) + 1 for white, + 7 for black.
+PROMOS = [4 << 12, 3 << 12, 2 << 12, 1 << 12]
+QUEEN_PROMO = PROMOS[:1]
+UNDER_PROMOS = PROMOS[1:]
+
+# What generate() produces. CAPTURES are captures (en passant included)
+# and queen promotions; QUIETS is everything else, so the two together
+# are exactly ALL_MOVES.
+ALL_MOVES = 0
+CAPTURES = 1
+QUIETS = 2
+
+# Castling rights as bits
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_BITS = {'K': CASTLE_WK, 'Q': CASTLE_WQ, 'k': CASTLE_BK, 'q': CASTLE_BQ}
+
+# King square, king target, squares that must be empty and squares that
+# must not be attacked for each castling move. Index 0 is a8, so white
+# castles along row 7.
+CASTLE_PATHS = {
+    CASTLE_WK: (60, 62, BIT[61] | BIT[62], [61, 62]),
+    CASTLE_WQ: (60, 58, BIT[57] | BIT[58] | BIT[59], [59, 58]),
+    CASTLE_BK: (4, 6, BIT[5] | BIT[6], [5, 6]),
+    CASTLE_BQ: (4, 2, BIT[1] | BIT[2] | BIT[3], [3, 2]),
+}
+# Rook relocation for a castling king move, keyed by king target square
+CASTLE_ROOK = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+# Rights kept when a piece moves from or to each square
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[60] = 15 & ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_MASK[63] = 15 & ~CASTLE_WK
+CASTLE_MASK[56] = 15 & ~CASTLE_WQ
+CASTLE_MASK[4] = 15 & ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_MASK[7] = 15 & ~CASTLE_BK
+CASTLE_MASK[0] = 15 & ~CASTLE_BQ
+
 class Board:
     def __init__(self, fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
-        self.squares = [EMPTY] * 64
+        # One bitboard per piece constant (index 0 unused) plus per-colour
+        # occupancy. The mailbox mirrors the bitboards for O(1) piece lookup.
+        self.pieces = [0] * 13
+        self.occupancy = [0, 0]
+        self.mailbox = [EMPTY] * 64
+        self.king_sq = [-1, -1] # King square per colour
         self.turn = WHITE
-        self.castling = {'K': True, 'Q': True, 'k': True, 'q': True}
+        self.castling_rights = CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ
         self.en_passant = None # Square index or None
         self.halfmove_clock = 0
         self.fullmove_number = 1
+        self.hash = 0 # Zobrist key, updated incrementally by make/unmake
+        # Material + piece-square accumulators (white's point of view) and
+        # game phase, updated incrementally by make/unmake
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
         self.parse_fen(fen)
         
-        # History for unmake_move (simplified)
+        # Undo records for unmake_move:
+        # (captured piece, en passant, castling rights, halfmove clock, hash,
+        #  mg, eg, phase)
         self.history = []
 
+    @property
+    def squares(self):
+        # Compatibility view: 64-entry list of piece constants
+        return self.mailbox
+
+    @property
+    def castling(self):
+        # Compatibility view of the castling bits as {'K': bool, ...}
+        return {c: bool(self.castling_rights & bit) for c, bit in CASTLE_BITS.items()}
+
     def parse_fen(self, fen):
         parts = fen.split()
         rows = parts[0].split('/')
-        
+
+        self.pieces = [0] * 13
+        self.occupancy = [0, 0]
+        self.mailbox = [EMPTY] * 64
         sq = 0
         for row in rows:
             for char in row:
                 if char.isdigit():
                     sq += int(char)
                 else:
-                    self.squares[sq] = STR_PIECE[char]
+                    self._put(sq, STR_PIECE[char])
                     sq += 1
         
         self.turn = WHITE if parts[1] == 'w' else BLACK
         
-        self.castling = {
-            'K': 'K' in parts[2],
-            'Q': 'Q' in parts[2],
-            'k': 'k' in parts[2],
-            'q': 'q' in parts[2]
-        }
+        self.castling_rights = 0
+        for c, bit in CASTLE_BITS.items():
+            if c in parts[2]:
+                self.castling_rights |= bit
         
         if parts[3] != '-':
             files = "abcdefgh"
@@ -61,303 +129,470 @@ class Board:
             
         self.halfmove_clock = int(parts[4]) if len(parts) > 4 else 0
         self.fullmove_number = int(parts[5]) if len(parts) > 5 else 1
+        self.king_sq = [
+            self.pieces[wK].bit_length() - 1,
+            self.pieces[bK].bit_length() - 1,
+        ]
+        self.hash = self.compute_hash()
+        self.mg, self.eg, self.phase = self.compute_psqt()
+
+    def fen(self):
+        # Inverse of parse_fen
+        rows = []
+        for r in range(8):
+            row = ""
+            empty = 0
+            for p in self.mailbox[r * 8:r * 8 + 8]:
+                if p == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_STR[p]
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(c for c, bit in CASTLE_BITS.items() if self.castling_rights & bit) or "-"
+        ep = "-" if self.en_passant is None else SQUARE_NAMES[self.en_passant]
+        return (f"{'/'.join(rows)} {'w' if self.turn == WHITE else 'b'} {castling} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def copy(self):
+        # Independent copy of the position (undo history included)
+        other = Board.__new__(Board)
+        other.__dict__.update(self.__dict__)
+        other.pieces = self.pieces[:]
+        other.occupancy = self.occupancy[:]
+        other.mailbox = self.mailbox[:]
+        other.king_sq = self.king_sq[:]
+        other.history = self.history[:]
+        return other
+
+    def compute_psqt(self):
+        # Full (mg, eg, phase) from scratch; make_move keeps them in sync
+        mg = eg = phase = 0
+        for sq, p in enumerate(self.mailbox):
+            if p != EMPTY:
+                mg += PST_MG[p][sq]
+                eg += PST_EG[p][sq]
+                phase += PHASE[p]
+        return mg, eg, phase
+
+    def compute_hash(self):
+        # Full Zobrist key from scratch; make_move keeps self.hash in sync
+        h = 0
+        for sq, p in enumerate(self.mailbox):
+            if p != EMPTY:
+                h ^= PIECE_KEYS[p][sq]
+        h ^= CASTLE_KEYS[self.castling_rights]
+        if self.en_passant is not None:
+            h ^= EP_KEYS[self.en_passant & 7]
+        if self.turn == BLACK:
+            h ^= SIDE_KEY
+        return h
+
+    def _put(self, sq, p):
+        bit = BIT[sq]
+        self.pieces[p] |= bit
+        self.occupancy[WHITE if p <= wK else BLACK] |= bit
+        self.mailbox[sq] = p
 
     def print_board(self):
         for r in range(8):
             line = ""
             for f in range(8):
                 sq = r * 8 + f
-                line += PIECE_STR[self.squares[sq]] + " "
+                line += PIECE_STR[self.mailbox[sq]] + " "
             print(line)
 
+    def attackers_to(self, square, by_color, occ):
+        # Bitboard of `by_color` pieces attacking `square` given occupancy `occ`
+        pieces = self.pieces
+        off = 0 if by_color == WHITE else 6
+        queens = pieces[wQ + off]
+        return ((PAWN_ATTACKS[by_color ^ 1][square] & pieces[wP + off]) |
+                (KNIGHT_ATTACKS[square] & pieces[wN + off]) |
+                (KING_ATTACKS[square] & pieces[wK + off]) |
+                (bishop_attacks(square, occ) & (pieces[wB + off] | queens)) |
+                (rook_attacks(square, occ) & (pieces[wR + off] | queens)))
+
     def is_square_attacked(self, square, by_color):
-        # Simplified attack check
-        # Check pawn attacks
-        # Check knight attacks
-        # Check sliding pieces (bishop, rook, queen)
-        # Check king attacks
-        # This is critical for legality checking
-        
-        # Directions for sliding pieces
-        orthogonals = [-8, 8, -1, 1]
-        diagonals = [-9, -7, 7, 9]
-        
-        # Enemy pieces
-        if by_color == WHITE:
-            pawns, knights, bishops, rooks, queens, king = wP, wN, wB, wR, wQ, wK
-            pawn_dir = 8 # White pawns attack "up" (lower index) from their perspective? 
-            # Wait, rank 0 is top (a8..h8). So index increases as we go down.
-            # White pawns are at rank 6 (index 48-55) moving to rank 0.
-            # So white pawns move -8. Attacks are -9 and -7.
-            # Wait, standard FEN: r is rank 8 (top), R is rank 1 (bottom).
-            # My parse_fen iterates rows from top to bottom.
-            # So index 0 is a8, index 63 is h1.
-            # White is at bottom (indices 48-63).
-            # White moves UP (index decreases).
-            pawn_attacks = [7, 9] # From target square, looking for white pawns below
-        else:
-            pawns, knights, bishops, rooks, queens, king = bP, bN, bB, bR, bQ, bK
-            pawn_attacks = [-7, -9] # From target square, looking for black pawns above
-
-        r, f = square // 8, square % 8
-
-        # 1. Pawns
-        for diff in pawn_attacks:
-            src = square + diff
-            if 0 <= src < 64:
-                sr, sf = src // 8, src % 8
-                if abs(sf - f) == 1: # Must be adjacent file
-                    if self.squares[src] == pawns:
-                        return True
-
-        # 2. Knights
-        knight_moves = [-17, -15, -10, -6, 6, 10, 15, 17]
-        for diff in knight_moves:
-            src = square + diff
-            if 0 <= src < 64:
-                sr, sf = src // 8, src % 8
-                # Check if valid knight move (L-shape)
-                if abs(sr - r) in [1, 2] and abs(sf - f) in [1, 2] and abs(sr-r)+abs(sf-f)==3:
-                    if self.squares[src] == knights:
-                        return True
-
-        # 3. Sliding
-        for directions, pieces in [(orthogonals, [rooks, queens]), (diagonals, [bishops, queens])]:
-            for d in directions:
-                curr = square
-                while True:
-                    curr += d
-                    cr, cf = curr // 8, curr % 8
-                    pr, pf = (curr - d) // 8, (curr - d) % 8
-                    
-                    # Boundary check: must handle wrapping
-                    # If we moved -1 (left) and changed row, or +1 (right) and changed row, stop.
-                    # Actually, simpler: check if we went off board or wrapped around.
-                    if not (0 <= curr < 64): break
-                    if abs(cr - pr) > 1 or abs(cf - pf) > 1: break # Wrapped around
-                    
-                    # Specific check for left/right wrapping
-                    if d == 1 and cf == 0: break
-                    if d == -1 and cf == 7: break
-                    # Diagonals wrapping
-                    if d == -9 and (cf == 7 or cr == 7): break # Up-Left? No, -9 is Up-Left (if 8 is width). 
-                    # Let's rely on coordinate math.
-                    
-                    # Re-verify coordinate logic
-                    # curr is valid index.
-                    # Check if it's on a consistent ray.
-                    # Ray logic is hard with 1D array without mailbox 0x88 or similar.
-                    # Let's use coordinates.
-                    
-                    # Reset and do coordinate based ray casting
-                    break
-        
-        # Re-implement sliding with coordinates for safety
-        for directions, pieces in [(orthogonals, [rooks, queens]), (diagonals, [bishops, queens])]:
-            for dr, df in [(-1, 0), (1, 0), (0, -1), (0, 1)] if pieces == [rooks, queens] else [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                cr, cf = r, f
-                while True:
-                    cr += dr
-                    cf += df
-                    if not (0 <= cr < 8 and 0 <= cf < 8): break
-                    idx = cr * 8 + cf
-                    p = self.squares[idx]
-                    if p != EMPTY:
-                        if p in pieces: return True
-                        break # Blocked by something else
-        
-        # 4. King
-        for dr in [-1, 0, 1]:
-            for df in [-1, 0, 1]:
-                if dr == 0 and df == 0: continue
-                cr, cf = r + dr, f + df
-                if 0 <= cr < 8 and 0 <= cf < 8:
-                    if self.squares[cr * 8 + cf] == king:
-                        return True
-                        
+        # Attacks are symmetric: look from the target square with each piece's
+        # attack pattern and intersect with the attacker's bitboards.
+        pieces = self.pieces
+        occ = self.occupancy[WHITE] | self.occupancy[BLACK]
+        off = 0 if by_color == WHITE else 6
+
+        # Pawns: a white pawn attacks `square` if it stands where a black
+        # pawn on `square` would attack, and vice versa.
+        if PAWN_ATTACKS[by_color ^ 1][square] & pieces[wP + off]:
+            return True
+        if KNIGHT_ATTACKS[square] & pieces[wN + off]:
+            return True
+        if KING_ATTACKS[square] & pieces[wK + off]:
+            return True
+        queens = pieces[wQ + off]
+        if bishop_attacks(square, occ) & (pieces[wB + off] | queens):
+            return True
+        if rook_attacks(square, occ) & (pieces[wR + off] | queens):
+            return True
         return False
 
+    def in_check(self):
+        return self.is_square_attacked(self.king_sq[self.turn], self.turn ^ 1)
+
+    def pinned_pieces(self, color):
+        # Own pieces of `color` pinned to their king, mapped to the line
+        # they may still move along
+        ksq = self.king_sq[color]
+        pieces = self.pieces
+        them = 6 if color == WHITE else 0
+        occ = self.occupancy[WHITE] | self.occupancy[BLACK]
+        own = self.occupancy[color]
+        queens = pieces[wQ + them]
+        snipers = ((rook_attacks(ksq, 0) & (pieces[wR + them] | queens)) |
+                   (bishop_attacks(ksq, 0) & (pieces[wB + them] | queens)))
+        pinned = {}
+        while snipers:
+            low = snipers & -snipers
+            snipers ^= low
+            s = low.bit_length() - 1
+            blockers = BETWEEN[ksq][s] & occ
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned[blockers.bit_length() - 1] = LINE[ksq][s]
+        return pinned
+
     def generate_moves(self):
-        moves = []
-        # Simplified generator: iterate all squares, find pieces of current turn, generate pseudo-legal
-        # Then filter for legality (king not in check)
+        # Legal moves as Move objects; the search uses generate() instead
+        buf = move_buffer()
+        return [Move(m) for m in buf[:self.generate(buf)]]
+
+    def generate_captures(self):
+        # Legal captures (including en passant) and queen promotions only,
+        # for quiescence search
+        buf = move_buffer()
+        return [Move(m) for m in buf[:self.generate(buf, CAPTURES)]]
+
+    def legal_moves_by_uci(self):
+        # {uci string: Move} index of the legal moves
+        buf = move_buffer()
+        return {UCI_NAMES[m]: Move(m) for m in buf[:self.generate(buf)]}
+
+    def is_legal(self, move, buf):
+        # Whether a move code (e.g. a hash move or killer from another
+        # position) is legal here, generating only the moving piece's moves
+        start = move & 63
+        if not self.occupancy[self.turn] & BIT[start]:
+            return False
+        return move in buf[:self.generate(buf, ALL_MOVES, BIT[start])]
+
+    def generate(self, buf, kind=ALL_MOVES, sources=FULL):
+        # Legal move generation into a move buffer (see move.move_buffer);
+        # returns the number of moves written. kind is ALL_MOVES, CAPTURES
+        # or QUIETS; sources limits it to pieces on those squares.
+        # Checkers and pinned pieces are computed once per position, so no
+        # candidate needs a make/unmake to be verified.
+        n = 0
         
         my_color = self.turn
-        opp_color = BLACK if self.turn == WHITE else WHITE
-        
-        for sq in range(64):
-            p = self.squares[sq]
-            if p == EMPTY: continue
-            
-            # Check color
-            is_white = p in [wP, wN, wB, wR, wQ, wK]
-            if (is_white and self.turn == BLACK) or (not is_white and self.turn == WHITE):
-                continue
-                
-            r, f = sq // 8, sq % 8
-            
-            # Pawn moves
-            if p == wP or p == bP:
-                direction = -8 if is_white else 8
-                start_rank = 6 if is_white else 1
-                
-                # Forward 1
-                tgt = sq + direction
-                if 0 <= tgt < 64 and self.squares[tgt] == EMPTY:
-                    # Promotion?
-                    tr = tgt // 8
-                    if (is_white and tr == 0) or (not is_white and tr == 7):
-                        promos = ['q', 'r', 'b', 'n']
+        opp_color = my_color ^ 1
+        pieces = self.pieces
+        off = 0 if my_color == WHITE else 6
+        own = self.occupancy[my_color]
+        enemy = self.occupancy[opp_color]
+        occ = own | enemy
+        ksq = self.king_sq[my_color]
+
+        # King moves: test destinations with the king lifted off the board so
+        # it cannot hide behind itself from a slider
+        occ_no_king = occ ^ BIT[ksq]
+        if kind == CAPTURES:
+            targets = enemy
+        elif kind == QUIETS:
+            targets = ~occ
+        else:
+            targets = ~own
+        att = KING_ATTACKS[ksq] & targets if sources & BIT[ksq] else 0
+        while att:
+            t = att & -att
+            att ^= t
+            tgt = t.bit_length() - 1
+            if not self.attackers_to(tgt, opp_color, occ_no_king):
+                buf[n] = ksq | (tgt << 6)
+                n += 1
+
+        checkers = self.attackers_to(ksq, opp_color, occ)
+        if checkers & (checkers - 1):
+            # Double check: only the king can move
+            return n
+        if checkers:
+            # Capture the checker or block the line
+            check_mask = checkers | BETWEEN[ksq][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+        pinned = self.pinned_pieces(my_color)
+        targets &= check_mask
+        promos = QUEEN_PROMO if kind == CAPTURES else UNDER_PROMOS if kind == QUIETS else PROMOS
+
+        # Pawn moves
+        direction = -8 if my_color == WHITE else 8
+        start_row, promo_row = (6, 0) if my_color == WHITE else (1, 7)
+        pawn_caps = PAWN_ATTACKS[my_color]
+        bb = pieces[wP + off] & sources
+        while bb:
+            low = bb & -bb
+            bb ^= low
+            sq = low.bit_length() - 1
+            promoting = (sq + direction) // 8 == promo_row
+            allowed = check_mask & pinned[sq] if sq in pinned else check_mask
+
+            # Forward 1 and 2
+            tgt = sq + direction
+            if not occ & BIT[tgt] and (promoting or kind != CAPTURES):
+                if BIT[tgt] & allowed:
+                    if promoting:
                         for promo in promos:
-                            moves.append(Move(sq, tgt, promotion=promo))
+                            buf[n] = sq | (tgt << 6) | promo
+                            n += 1
                     else:
-                        moves.append(Move(sq, tgt))
-                        
-                    # Forward 2
-                    if r == start_rank:
-                        tgt2 = sq + direction * 2
-                        if self.squares[tgt2] == EMPTY:
-                            moves.append(Move(sq, tgt2))
-                            
-                # Captures
-                for df in [-1, 1]:
-                    if 0 <= f + df < 8:
-                        tgt = sq + direction + df
-                        if 0 <= tgt < 64:
-                            target_p = self.squares[tgt]
-                            if target_p != EMPTY:
-                                # Check if enemy
-                                is_enemy = (target_p >= bP) if is_white else (target_p <= wK)
-                                if is_enemy:
-                                    # Promotion check
-                                    tr = tgt // 8
-                                    if (is_white and tr == 0) or (not is_white and tr == 7):
-                                        promos = ['q', 'r', 'b', 'n']
-                                        for promo in promos:
-                                            moves.append(Move(sq, tgt, promotion=promo))
-                                    else:
-                                        moves.append(Move(sq, tgt))
-                            elif tgt == self.en_passant:
-                                # En passant capture
-                                moves.append(Move(sq, tgt, is_en_passant=True))
-
-            # Knight moves
-            elif p == wN or p == bN:
-                dr_df = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-                for dr, df in dr_df:
-                    nr, nf = r + dr, f + df
-                    if 0 <= nr < 8 and 0 <= nf < 8:
-                        tgt = nr * 8 + nf
-                        tp = self.squares[tgt]
-                        if tp == EMPTY or ((tp >= bP) if is_white else (tp <= wK)):
-                            moves.append(Move(sq, tgt))
-
-            # King moves
-            elif p == wK or p == bK:
-                for dr in [-1, 0, 1]:
-                    for df in [-1, 0, 1]:
-                        if dr == 0 and df == 0: continue
-                        nr, nf = r + dr, f + df
-                        if 0 <= nr < 8 and 0 <= nf < 8:
-                            tgt = nr * 8 + nf
-                            tp = self.squares[tgt]
-                            if tp == EMPTY or ((tp >= bP) if is_white else (tp <= wK)):
-                                moves.append(Move(sq, tgt))
-                
-                # Castling
-                # This requires checking castling rights, empty squares, and not attacked squares
-                # Simplified: just check rights and empty squares for now, legality check later?
-                # No, castling rules are strict: cannot castle out of, through, or into check.
-                # I'll implement basic rights check here.
-                pass # TODO: Implement castling
-
-            # Sliding moves (B, R, Q)
-            else:
-                dirs = []
-                if p in [wB, bB, wQ, bQ]: dirs.extend([(-1, -1), (-1, 1), (1, -1), (1, 1)])
-                if p in [wR, bR, wQ, bQ]: dirs.extend([(-1, 0), (1, 0), (0, -1), (0, 1)])
-                
-                for dr, df in dirs:
-                    nr, nf = r, f
-                    while True:
-                        nr += dr
-                        nf += df
-                        if not (0 <= nr < 8 and 0 <= nf < 8): break
-                        tgt = nr * 8 + nf
-                        tp = self.squares[tgt]
-                        if tp == EMPTY:
-                            moves.append(Move(sq, tgt))
-                        else:
-                            if (tp >= bP) if is_white else (tp <= wK):
-                                moves.append(Move(sq, tgt))
-                            break
-
-        # Filter legal moves
-        legal_moves = []
-        for m in moves:
-            self.make_move(m)
-            # Find king
-            king_val = wK if my_color == WHITE else bK
-            king_pos = -1
-            for i in range(64):
-                if self.squares[i] == king_val:
-                    king_pos = i
-                    break
-            
-            if king_pos != -1 and not self.is_square_attacked(king_pos, opp_color):
-                legal_moves.append(m)
-            self.unmake_move(m)
-            
-        return legal_moves
+                        buf[n] = sq | (tgt << 6)
+                        n += 1
+                tgt2 = tgt + direction
+                if (sq // 8 == start_row and not occ & BIT[tgt2]
+                        and BIT[tgt2] & allowed):
+                    buf[n] = sq | (tgt2 << 6)
+                    n += 1
+
+            # Captures
+            caps = pawn_caps[sq] & enemy & allowed if promoting or kind != QUIETS else 0
+            while caps:
+                c = caps & -caps
+                caps ^= c
+                tgt = c.bit_length() - 1
+                if promoting:
+                    for promo in promos:
+                        buf[n] = sq | (tgt << 6) | promo
+                        n += 1
+                else:
+                    buf[n] = sq | (tgt << 6)
+                    n += 1
+
+        # En passant: two pawns leave the capturing row at once, so verify
+        # the resulting occupancy directly against the enemy sliders
+        if self.en_passant is not None and kind != QUIETS:
+            ep = self.en_passant
+            cap_sq = ep + 8 if my_color == WHITE else ep - 8
+            if check_mask & (BIT[ep] | BIT[cap_sq]):
+                them = 6 - off
+                rq = pieces[wR + them] | pieces[wQ + them]
+                bq = pieces[wB + them] | pieces[wQ + them]
+                src = PAWN_ATTACKS[opp_color][ep] & pieces[wP + off] & sources
+                while src:
+                    low = src & -src
+                    src ^= low
+                    sq = low.bit_length() - 1
+                    after = (occ ^ low ^ BIT[cap_sq]) | BIT[ep]
+                    if (rook_attacks(ksq, after) & rq) or (bishop_attacks(ksq, after) & bq):
+                        continue
+                    buf[n] = sq | (ep << 6)
+                    n += 1
+
+        # Knight, bishop, rook and queen moves
+        for p, attacks in ((wN, None), (wB, bishop_attacks), (wR, rook_attacks),
+                           (wQ, queen_attacks)):
+            bb = pieces[p + off] & sources
+            while bb:
+                low = bb & -bb
+                bb ^= low
+                sq = low.bit_length() - 1
+                if p == wN:
+                    if sq in pinned:
+                        # A pinned knight can never move
+                        continue
+                    att = KNIGHT_ATTACKS[sq]
+                else:
+                    att = attacks(sq, occ)
+                att &= targets
+                if sq in pinned:
+                    att &= pinned[sq]
+                while att:
+                    t = att & -att
+                    att ^= t
+                    buf[n] = sq | ((t.bit_length() - 1) << 6)
+                    n += 1
+
+        # Castling: rights, empty path, and the king may not castle out of,
+        # through, or into check.
+        if not checkers and kind != CAPTURES and sources & BIT[ksq]:
+            for right in ((CASTLE_WK, CASTLE_WQ) if my_color == WHITE else (CASTLE_BK, CASTLE_BQ)):
+                if not self.castling_rights & right:
+                    continue
+                king_sq, king_tgt, empty, safe = CASTLE_PATHS[right]
+                if occ & empty or ksq != king_sq:
+                    continue
+                if any(self.attackers_to(s, opp_color, occ) for s in safe):
+                    continue
+                buf[n] = king_sq | (king_tgt << 6)
+                n += 1
+
+        return n
 
     def make_move(self, move):
-        # Save state
-        self.history.append({
-            'squares': self.squares[:],
-            'turn': self.turn,
-            'castling': self.castling.copy(),
-            'en_passant': self.en_passant,
-            'halfmove': self.halfmove_clock,
-            'fullmove': self.fullmove_number
-        })
-        
-        p = self.squares[move.start]
-        self.squares[move.start] = EMPTY
-        self.squares[move.end] = p
-        
+        # Push a small undo record; everything else is reversed in place.
+        # move is an int code (or Move).
+        start, end, promo = move & 63, (move >> 6) & 63, move >> 12
+        mailbox = self.mailbox
+        pieces = self.pieces
+        occupancy = self.occupancy
+        turn = self.turn
+        captured = mailbox[end]
+        h = self.hash
+        mg, eg = self.mg, self.eg
+        self.history.append((captured, self.en_passant, self.castling_rights,
+                             self.halfmove_clock, h, mg, eg, self.phase))
+
+        start_bit = BIT[start]
+        end_bit = BIT[end]
+        p = mailbox[start]
+        if captured != EMPTY:
+            pieces[captured] ^= end_bit
+            occupancy[turn ^ 1] ^= end_bit
+            h ^= PIECE_KEYS[captured][end]
+            mg -= PST_MG[captured][end]
+            eg -= PST_EG[captured][end]
+            self.phase -= PHASE[captured]
+
         # Promotion
-        if move.promotion:
-            # Map promo char to piece constant
-            # 'q' -> wQ or bQ depending on turn
-            offset = 0 if self.turn == WHITE else 6
-            promo_map = {'q': wQ, 'r': wR, 'b': wB, 'n': wN}
-            self.squares[move.end] = promo_map[move.promotion.lower()] + offset
-
-        # En passant capture
-        if move.is_en_passant:
-            # Remove the captured pawn
-            # If white moved to e6 (from e5) capturing d6 (ep square), the pawn was at d5.
-            # Target is index of e6. Captured pawn is at target + 8 (if white) or -8 (if black)?
-            # White moves up (-8). En passant target is behind the pawn.
-            # If white moves P to ep square, the captured pawn is "below" the ep square (index + 8).
-            cap_sq = move.end + 8 if self.turn == WHITE else move.end - 8
-            self.squares[cap_sq] = EMPTY
+        placed = p
+        if promo:
+            # Promotion code 1..4 maps to N..Q of the side to move
+            placed = promo + (1 if turn == WHITE else 7)
+        pieces[p] ^= start_bit
+        pieces[placed] |= end_bit
+        occupancy[turn] ^= start_bit | end_bit
+        mailbox[start] = EMPTY
+        mailbox[end] = placed
+        h ^= PIECE_KEYS[p][start] ^ PIECE_KEYS[placed][end]
+        mg += PST_MG[placed][end] - PST_MG[p][start]
+        eg += PST_EG[placed][end] - PST_EG[p][start]
+        if placed != p:
+            self.phase += PHASE[placed]
+
+        is_pawn = p == wP or p == bP
+        # En passant capture (detected from the board, so move codes need
+        # no flag for it)
+        if is_pawn and end == self.en_passant:
+            # White moves up (-8), so the captured pawn sits "below" the ep square.
+            cap_sq = end + 8 if turn == WHITE else end - 8
+            cap_p = mailbox[cap_sq]
+            pieces[cap_p] ^= BIT[cap_sq]
+            occupancy[turn ^ 1] ^= BIT[cap_sq]
+            mailbox[cap_sq] = EMPTY
+            h ^= PIECE_KEYS[cap_p][cap_sq]
+            mg -= PST_MG[cap_p][cap_sq]
+            eg -= PST_EG[cap_p][cap_sq]
+            captured = cap_p
+
+        elif p == wK or p == bK:
+            self.king_sq[turn] = end
+            # Castling: the king moves two files, bring the rook along
+            if start - end == 2 or end - start == 2:
+                rook_from, rook_to = CASTLE_ROOK[end]
+                rook = mailbox[rook_from]
+                pieces[rook] ^= BIT[rook_from] | BIT[rook_to]
+                occupancy[turn] ^= BIT[rook_from] | BIT[rook_to]
+                mailbox[rook_from] = EMPTY
+                mailbox[rook_to] = rook
+                h ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+                mg += PST_MG[rook][rook_to] - PST_MG[rook][rook_from]
+                eg += PST_EG[rook][rook_to] - PST_EG[rook][rook_from]
+
+        rights = self.castling_rights & CASTLE_MASK[start] & CASTLE_MASK[end]
+        if rights != self.castling_rights:
+            h ^= CASTLE_KEYS[self.castling_rights] ^ CASTLE_KEYS[rights]
+            self.castling_rights = rights
 
         # Update En Passant rights
+        if self.en_passant is not None:
+            h ^= EP_KEYS[self.en_passant & 7]
         self.en_passant = None
-        if (p == wP or p == bP) and abs(move.start - move.end) == 16:
-            self.en_passant = (move.start + move.end) // 2
+        if is_pawn and (start - end == 16 or end - start == 16):
+            self.en_passant = (start + end) // 2
+            h ^= EP_KEYS[self.en_passant & 7]
+
+        # Clocks
+        if is_pawn or captured != EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if turn == BLACK:
+            self.fullmove_number += 1
 
         # Update turn
-        self.turn = BLACK if self.turn == WHITE else WHITE
-        
-        # TODO: Update castling rights, halfmove clock, etc.
+        self.turn = turn ^ 1
+        self.hash = h ^ SIDE_KEY
+        self.mg = mg
+        self.eg = eg
 
     def unmake_move(self, move):
-        state = self.history.pop()
-        self.squares = state['squares']
-        self.turn = state['turn']
-        self.castling = state['castling']
-        self.en_passant = state['en_passant']
-        self.halfmove_clock = state['halfmove']
-        self.fullmove_number = state['fullmove']
+        (captured, en_passant, castling_rights, halfmove,
+         self.hash, self.mg, self.eg, self.phase) = self.history.pop()
+        start, end = move & 63, (move >> 6) & 63
+        mailbox = self.mailbox
+        pieces = self.pieces
+        occupancy = self.occupancy
+        turn = self.turn ^ 1  # side that made the move
+        self.turn = turn
+        self.en_passant = en_passant
+        self.castling_rights = castling_rights
+        self.halfmove_clock = halfmove
+        if turn == BLACK:
+            self.fullmove_number -= 1
+
+        start_bit = BIT[start]
+        end_bit = BIT[end]
+        placed = mailbox[end]
+        p = placed
+        if move >> 12:
+            p = wP if turn == WHITE else bP
+        pieces[placed] ^= end_bit
+        pieces[p] |= start_bit
+        occupancy[turn] ^= start_bit | end_bit
+        mailbox[start] = p
+        mailbox[end] = EMPTY
+
+        if (p == wP or p == bP) and end == en_passant:
+            cap_sq = end + 8 if turn == WHITE else end - 8
+            captured = bP if turn == WHITE else wP
+            pieces[captured] |= BIT[cap_sq]
+            occupancy[turn ^ 1] |= BIT[cap_sq]
+            mailbox[cap_sq] = captured
+        else:
+            if captured != EMPTY:
+                pieces[captured] |= end_bit
+                occupancy[turn ^ 1] |= end_bit
+                mailbox[end] = captured
+            if p == wK or p == bK:
+                self.king_sq[turn] = start
+                if start - end == 2 or end - start == 2:
+                    rook_from, rook_to = CASTLE_ROOK[end]
+                    rook = mailbox[rook_to]
+                    pieces[rook] ^= BIT[rook_from] | BIT[rook_to]
+                    occupancy[turn] ^= BIT[rook_from] | BIT[rook_to]
+                    mailbox[rook_to] = EMPTY
+                    mailbox[rook_from] = rook
+
+    def make_null_move(self):
+        # Pass the turn (null-move pruning). Only the side to move and the
+        # en passant square change; the undo record has the usual layout.
+        h = self.hash
+        self.history.append((EMPTY, self.en_passant, self.castling_rights,
+                             self.halfmove_clock, h, self.mg, self.eg, self.phase))
+        if self.en_passant is not None:
+            h ^= EP_KEYS[self.en_passant & 7]
+            self.en_passant = None
+        self.turn ^= 1
+        self.hash = h ^ SIDE_KEY
+
+    def unmake_null_move(self):
+        (_, self.en_passant, _, _, self.hash, _, _, _) = self.history.pop()
+        self.turn ^= 1
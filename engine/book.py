@@ -0,0 +1,126 @@
+# Polyglot opening books
+#
+# A .bin book is a sorted array of 16-byte big-endian entries
+# (key: u64, move: u16, weight: u16, learn: u32). The file is mmap'd and
+# searched in place, so opening a book of any size costs nothing and a
+# probe reads O(log n) entries.
+import mmap
+import random
+import struct
+
+from .board import WHITE, wP, bP, wK, bK, CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ
+from .bitboard import PAWN_ATTACKS
+from .move import Move, move_buffer
+from .polyglot_keys import RANDOM64, RANDOM_CASTLE, RANDOM_EN_PASSANT, RANDOM_TURN
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+# Polyglot piece kinds are black pawn, white pawn, black knight, ...;
+# indexed here by our piece constants
+POLYGLOT_PIECE = [None, 1, 3, 5, 7, 9, 11, 0, 2, 4, 6, 8, 10]
+CASTLE_ORDER = [CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ]
+# Polyglot writes castling as king-takes-rook
+CASTLE_MOVES = {(60, 63): 62, (60, 56): 58, (4, 7): 6, (4, 0): 2}
+
+def polyglot_key(board):
+    # Polyglot squares count from a1, ours from a8: flip the row (sq ^ 56)
+    key = 0
+    for sq, p in enumerate(board.mailbox):
+        if p:
+            key ^= RANDOM64[64 * POLYGLOT_PIECE[p] + (sq ^ 56)]
+    for i, right in enumerate(CASTLE_ORDER):
+        if board.castling_rights & right:
+            key ^= RANDOM64[RANDOM_CASTLE + i]
+    # The en passant file only counts if a pawn could actually capture
+    ep = board.en_passant
+    if ep is not None:
+        pawn = wP if board.turn == WHITE else bP
+        if PAWN_ATTACKS[board.turn ^ 1][ep] & board.pieces[pawn]:
+            key ^= RANDOM64[RANDOM_EN_PASSANT + (ep & 7)]
+    if board.turn == WHITE:
+        key ^= RANDOM64[RANDOM_TURN]
+    return key
+
+def decode_move(board, raw):
+    # Polyglot move (to, from, promotion; a1 = 0) -> our move code
+    end = (raw & 63) ^ 56
+    start = ((raw >> 6) & 63) ^ 56
+    p = board.mailbox[start]
+    if (p == wK or p == bK) and (start, end) in CASTLE_MOVES:
+        end = CASTLE_MOVES[(start, end)]
+    return start | (end << 6) | (((raw >> 12) & 7) << 12)
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self._mmap = None
+        self.size = len(self._mmap) // ENTRY.size if self._mmap is not None else 0
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+        self.size = 0
+
+    def _lower_bound(self, key):
+        # Index of the first entry with entry key >= key
+        lo, hi = 0, self.size
+        buf = self._mmap
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(buf, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, board):
+        # [(Move, weight, learn)] for the position, legal moves only
+        key = polyglot_key(board)
+        buf = move_buffer()
+        legal = set(buf[:board.generate(buf)])
+        found = []
+        i = self._lower_bound(key)
+        while i < self.size:
+            k, raw, weight, learn = ENTRY.unpack_from(self._mmap, i * ENTRY.size)
+            if k != key:
+                break
+            move = decode_move(board, raw)
+            if move in legal:
+                found.append((Move(move), weight, learn))
+            i += 1
+        return found
+
+    def choose(self, board, mode="weighted", rng=random):
+        # A book move for the position, or None. mode "best" takes the
+        # highest weight; "weighted" picks at random in proportion to weight.
+        found = self.entries(board)
+        if not found:
+            return None
+        if mode == "best":
+            return max(found, key=lambda e: e[1])[0]
+        total = sum(w for _, w, _ in found)
+        if total == 0:
+            return found[0][0]
+        pick = rng.randrange(total)
+        for move, weight, _ in found:
+            pick -= weight
+            if pick < 0:
+                return move
+        return found[-1][0]
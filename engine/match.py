@@ -0,0 +1,542 @@
+# Engine-vs-engine matches
+#
+# Usage:
+#   python -m engine.match --engine name=base --engine name=dev option.BatchEval=true \
+#       --games 400 --concurrency 4 --tc 5+0.05 --openings openings.epd --sprt 0 10
+#   python -m engine.match --engine name=new --engine "name=old" "cmd=./old-engine" --depth 4
+#
+# Every engine is a UCI process: this engine (python -m engine.uci) unless
+# cmd= names another executable, configured with option.<Name>=<value>.
+# Each opening is played twice with colours reversed. Games run
+# concurrently, each game slot owning its own pair of engine processes
+# which are reused from game to game.
+#
+# After every game the score, Elo estimate, LOS and (with --sprt) the
+# log-likelihood ratio are updated; the match stops early once the SPRT
+# accepts either hypothesis. Every move's wall time, nodes, nps and depth
+# are recorded, so throughput changes are measured alongside strength.
+import argparse
+import json
+import math
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+from .board import Board, WHITE, wP, wR, wQ, bP, bR, bQ
+from .bitboard import popcount
+
+STARTPOS = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+DEFAULT_COMMAND = [sys.executable, "-m", "engine.uci"]
+# Directory `engine` is importable from, for the default command
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Games longer than this are drawn
+MAX_PLIES = 400
+# Seconds an engine may overrun its limit before it loses on time
+TIME_MARGIN = 1.0
+# Seconds to wait for uciok / readyok
+HANDSHAKE_TIMEOUT = 10.0
+
+# --- statistics -------------------------------------------------------------
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def elo(score):
+    # Elo difference for a score fraction (clamped away from 0 and 1)
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def _mean_var(wins, draws, losses):
+    n = wins + draws + losses
+    mean = (wins + draws / 2) / n
+    var = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / n
+    return mean, var
+
+def elo_error(wins, draws, losses):
+    # Half-width of the 95% confidence interval, in Elo
+    n = wins + draws + losses
+    if n == 0:
+        return math.inf
+    mean, var = _mean_var(wins, draws, losses)
+    margin = 1.96 * math.sqrt(var / n)
+    return (elo(mean + margin) - elo(mean - margin)) / 2
+
+def los(wins, losses):
+    # Likelihood of superiority: chance the first engine is the stronger
+    if wins + losses == 0:
+        return 0.5
+    return 0.5 * (1 + math.erf((wins - losses) / math.sqrt(2 * (wins + losses))))
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Log-likelihood ratio of H1 (elo1) against H0 (elo0), using the normal
+    # approximation of the trinomial game outcome
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0
+    mean, var = _mean_var(wins, draws, losses)
+    if var == 0:
+        return 0.0
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return (s1 - s0) * (2 * mean - s0 - s1) / (2 * var / n)
+
+def sprt_bounds(alpha, beta):
+    # (lower, upper): accept H0 below lower, H1 above upper
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+# --- engines ----------------------------------------------------------------
+
+class EngineError(RuntimeError):
+    # The engine died, hung or broke the protocol
+    pass
+
+class EngineConfig:
+    def __init__(self, name, command=None, options=None):
+        self.name = name
+        self.command = command or DEFAULT_COMMAND
+        self.options = options or {}
+
+    @classmethod
+    def parse(cls, tokens):
+        # ['name=dev', 'cmd=./engine --flag', 'option.Hash=64']
+        fields = dict(t.split("=", 1) for t in tokens)
+        name = fields.pop("name", None)
+        command = shlex.split(fields.pop("cmd")) if "cmd" in fields else None
+        options = {}
+        for key, value in fields.items():
+            if not key.startswith("option."):
+                raise ValueError(f"Unknown engine setting: {key}")
+            options[key[len("option."):]] = value
+        return cls(name or (command[0] if command else "engine"), command, options)
+
+class UCIPlayer:
+    # A UCI engine process. Output is read on a thread so every wait can
+    # time out.
+    def __init__(self, config):
+        self.config = config
+        self.proc = None
+        self.lines = queue.Queue()
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.config.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1,
+            cwd=ROOT if self.config.command is DEFAULT_COMMAND else None)
+        threading.Thread(target=self._read, daemon=True).start()
+        self.send("uci")
+        self.wait_for("uciok", HANDSHAKE_TIMEOUT)
+        for name, value in self.config.options.items():
+            self.send(f"setoption name {name} value {value}")
+        self.ready()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            self.lines.put(line.strip())
+        self.lines.put(None)
+
+    def send(self, line):
+        try:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise EngineError(f"{self.config.name}: {e}") from None
+
+    def wait_for(self, prefix, timeout):
+        # Lines up to and including the first starting with prefix
+        deadline = time.monotonic() + timeout
+        seen = []
+        while True:
+            try:
+                line = self.lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise EngineError(f"{self.config.name}: no '{prefix}' within {timeout}s") from None
+            if line is None:
+                raise EngineError(f"{self.config.name}: engine exited")
+            seen.append(line)
+            if line.startswith(prefix):
+                return seen
+
+    def ready(self):
+        self.send("isready")
+        self.wait_for("readyok", HANDSHAKE_TIMEOUT)
+
+    def new_game(self):
+        self.send("ucinewgame")
+        self.ready()
+
+    def go(self, start_fen, moves, go_args, timeout):
+        # (bestmove, last info fields) for the position
+        position = "startpos" if start_fen == STARTPOS else f"fen {start_fen}"
+        self.send(f"position {position}" + (" moves " + " ".join(moves) if moves else ""))
+        self.send("go " + go_args)
+        lines = self.wait_for("bestmove", timeout)
+        info = {}
+        for line in lines:
+            if line.startswith("info ") and " depth " in line:
+                info = parse_info(line)
+        parts = lines[-1].split()
+        return (parts[1] if len(parts) > 1 else None), info
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.send("quit")
+            self.proc.wait(timeout=2)
+        except (EngineError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+def parse_info(line):
+    # Numeric fields of a UCI info line, and the score in centipawns or
+    # as 'mate N'
+    parts = line.split()
+    info = {}
+    for key in ("depth", "seldepth", "nodes", "nps", "time"):
+        if key in parts:
+            info[key] = int(parts[parts.index(key) + 1])
+    if "score" in parts:
+        i = parts.index("score")
+        kind, value = parts[i + 1], int(parts[i + 2])
+        info["score"] = value if kind == "cp" else f"mate {value}"
+    return info
+
+# --- games ------------------------------------------------------------------
+
+class Limits:
+    # Per-move limits: a clock (base + increment, seconds), a fixed time
+    # per move, or a fixed depth
+    def __init__(self, base=None, inc=0.0, movetime=None, depth=None):
+        self.base = base
+        self.inc = inc
+        self.movetime = movetime
+        self.depth = depth
+
+    @classmethod
+    def parse_tc(cls, tc):
+        # "5+0.05" or "5"
+        base, _, inc = tc.partition("+")
+        return cls(base=float(base), inc=float(inc or 0))
+
+    def go_args(self, clocks):
+        if self.base is not None:
+            return (f"wtime {int(clocks[0] * 1000)} btime {int(clocks[1] * 1000)} "
+                    f"winc {int(self.inc * 1000)} binc {int(self.inc * 1000)}")
+        if self.movetime is not None:
+            return f"movetime {int(self.movetime * 1000)}"
+        return f"depth {self.depth}"
+
+    def timeout(self, clock):
+        # Longest wait for a bestmove before the mover loses on time
+        if self.base is not None:
+            return clock + TIME_MARGIN
+        if self.movetime is not None:
+            return self.movetime + TIME_MARGIN
+        return 600.0
+
+def insufficient_material(board):
+    # Bare kings, or a single minor piece left
+    p = board.pieces
+    if p[wP] | p[bP] | p[wR] | p[bR] | p[wQ] | p[bQ]:
+        return False
+    return popcount(board.occupancy[0] | board.occupancy[1]) <= 3
+
+def adjudicate(board, seen):
+    # (result, reason) if the game is over, else None. seen counts
+    # occurrences of each position hash.
+    if not board.generate_moves():
+        if board.in_check():
+            return ("0-1" if board.turn == WHITE else "1-0"), "checkmate"
+        return "1/2-1/2", "stalemate"
+    if seen.get(board.hash, 0) >= 3:
+        return "1/2-1/2", "threefold repetition"
+    if board.halfmove_clock >= 100:
+        return "1/2-1/2", "fifty-move rule"
+    if insufficient_material(board):
+        return "1/2-1/2", "insufficient material"
+    return None
+
+def play_game(white, black, start_fen, opening, limits, max_plies=MAX_PLIES):
+    # Play one game between two started UCIPlayers. Returns a record with
+    # the result from white's point of view and per-move statistics.
+    board = Board(start_fen)
+    moves = []
+    for uci in opening:
+        board.make_move(board.legal_moves_by_uci()[uci])
+        moves.append(uci)
+    seen = {board.hash: 1}
+    clocks = [limits.base, limits.base]
+    players = (white, black)
+    record = {'white': white.config.name, 'black': black.config.name,
+              'fen': start_fen, 'opening': list(opening), 'moves': [], 'stats': []}
+    for player in players:
+        player.new_game()
+
+    outcome = None
+    while outcome is None:
+        outcome = adjudicate(board, seen)
+        if outcome is not None:
+            break
+        if len(moves) - len(opening) >= max_plies:
+            outcome = "1/2-1/2", "move limit"
+            break
+        side = board.turn
+        loss = ("0-1" if side == WHITE else "1-0")
+        player = players[side]
+        start = time.perf_counter()
+        try:
+            uci, info = player.go(start_fen, moves, limits.go_args(clocks), limits.timeout(clocks[side] or 0))
+        except EngineError as e:
+            # Kill it: a hung engine could answer this move in the next game
+            player.close()
+            outcome = loss, f"failed: {e}"
+            break
+        elapsed = time.perf_counter() - start
+        if limits.base is not None:
+            clocks[side] -= elapsed
+            if clocks[side] < 0:
+                outcome = loss, f"{player.config.name} lost on time"
+                break
+            clocks[side] += limits.inc
+        move = board.legal_moves_by_uci().get(uci or "")
+        if move is None:
+            outcome = loss, f"{player.config.name} played illegal move {uci}"
+            break
+        board.make_move(move)
+        moves.append(uci)
+        seen[board.hash] = seen.get(board.hash, 0) + 1
+        record['moves'].append(uci)
+        record['stats'].append(dict(info, engine=player.config.name, elapsed=round(elapsed, 4)))
+    record['result'], record['reason'] = outcome
+    return record
+
+def load_openings(path=None, plies=8):
+    # [(start fen, [uci moves])]. EPD / FEN files give start positions;
+    # PGN games give their first `plies` moves.
+    if path is None:
+        return [(STARTPOS, [])]
+    from .batch import detect_format, read_positions
+    if detect_format(path) != 'pgn':
+        return [(Board(job['fen']).fen(), []) for job in read_positions(path)]
+    from .move import UCI_NAMES
+    from .pgn import read_games, parse_san
+    openings = []
+    with open(path) as f:
+        for tags, sans in read_games(f):
+            board = Board(tags['FEN']) if 'FEN' in tags else Board()
+            fen = board.fen()
+            line = []
+            for san in sans[:plies]:
+                move = parse_san(board, san)
+                board.make_move(move)
+                line.append(UCI_NAMES[move])
+            openings.append((fen, line))
+    return openings
+
+# --- match ------------------------------------------------------------------
+
+class EngineTotals:
+    # Throughput of one engine over the match
+    def __init__(self):
+        self.moves = 0
+        self.elapsed = 0.0
+        self.nodes = 0
+        self.depth = 0
+
+    def add(self, stat):
+        self.moves += 1
+        self.elapsed += stat['elapsed']
+        self.nodes += stat.get('nodes', 0)
+        self.depth += stat.get('depth', 0)
+
+    def to_dict(self):
+        return {
+            'moves': self.moves,
+            'time_per_move': self.elapsed / self.moves if self.moves else 0.0,
+            'nps': int(self.nodes / self.elapsed) if self.elapsed > 0 else 0,
+            'depth': self.depth / self.moves if self.moves else 0.0,
+        }
+
+class Match:
+    def __init__(self, first, second, limits, games=100, concurrency=1, openings=None,
+                 sprt=None, out=None, log=None):
+        # sprt: (elo0, elo1, alpha, beta) or None. out: file object for one
+        # JSON line per game.
+        self.engines = (first, second)
+        self.limits = limits
+        self.games = games
+        self.concurrency = concurrency
+        self.openings = openings or [(STARTPOS, [])]
+        self.sprt = sprt
+        self.out = out
+        self.log = log
+        # Results from the first engine's point of view
+        self.wins = self.draws = self.losses = 0
+        self.totals = {first.name: EngineTotals(), second.name: EngineTotals()}
+        self.decision = None
+        self._tasks = iter(range(games))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._results = queue.Queue()
+
+    def _next_task(self):
+        # (game number, start fen, opening moves, first engine plays white)
+        with self._lock:
+            n = next(self._tasks, None)
+        if n is None or self._stop.is_set():
+            return None
+        fen, opening = self.openings[(n // 2) % len(self.openings)]
+        return n, fen, opening, n % 2 == 0
+
+    def _worker(self):
+        players = [UCIPlayer(c) for c in self.engines]
+        try:
+            for p in players:
+                p.start()
+            while True:
+                task = self._next_task()
+                if task is None:
+                    break
+                n, fen, opening, first_white = task
+                white, black = players if first_white else players[::-1]
+                record = play_game(white, black, fen, opening, self.limits)
+                record['game'] = n
+                self._results.put(record)
+                for i, p in enumerate(players):
+                    if p.proc is None or p.proc.poll() is not None:
+                        # Crashed: replace it for the next game
+                        p.close()
+                        players[i] = UCIPlayer(self.engines[i])
+                        players[i].start()
+        except EngineError as e:
+            self._results.put({'error': str(e)})
+        finally:
+            for p in players:
+                p.close()
+            self._results.put(None)
+
+    def _record(self, record):
+        result = record['result']
+        first = self.engines[0].name
+        if result == "1/2-1/2":
+            self.draws += 1
+        elif (result == "1-0") == (record['white'] == first):
+            self.wins += 1
+        else:
+            self.losses += 1
+        for stat in record['stats']:
+            self.totals[stat['engine']].add(stat)
+        if self.out is not None:
+            self.out.write(json.dumps(record) + "\n")
+            self.out.flush()
+        if self.sprt is not None and self.decision is None:
+            elo0, elo1, alpha, beta = self.sprt
+            llr = sprt_llr(self.wins, self.draws, self.losses, elo0, elo1)
+            lower, upper = sprt_bounds(alpha, beta)
+            if llr >= upper:
+                self.decision = "H1"
+            elif llr <= lower:
+                self.decision = "H0"
+            if self.decision is not None:
+                self._stop.set()
+
+    def summary(self):
+        n = self.wins + self.draws + self.losses
+        first, second = (e.name for e in self.engines)
+        summary = {
+            'games': n,
+            'wins': self.wins, 'draws': self.draws, 'losses': self.losses,
+            'score': (self.wins + self.draws / 2) / n if n else 0.0,
+            'elo': elo((self.wins + self.draws / 2) / n) if n else 0.0,
+            'elo_error': elo_error(self.wins, self.draws, self.losses),
+            'los': los(self.wins, self.losses),
+            'engines': {name: t.to_dict() for name, t in self.totals.items()},
+        }
+        if self.sprt is not None:
+            elo0, elo1, alpha, beta = self.sprt
+            summary['llr'] = sprt_llr(self.wins, self.draws, self.losses, elo0, elo1)
+            summary['bounds'] = sprt_bounds(alpha, beta)
+            summary['decision'] = self.decision
+        summary['title'] = f"{first} vs {second}"
+        return summary
+
+    def run(self):
+        threads = [threading.Thread(target=self._worker, daemon=True)
+                   for _ in range(min(self.concurrency, self.games))]
+        for t in threads:
+            t.start()
+        running = len(threads)
+        while running:
+            record = self._results.get()
+            if record is None:
+                running -= 1
+            elif 'error' in record:
+                self._stop.set()
+                raise EngineError(record['error'])
+            else:
+                self._record(record)
+                if self.log:
+                    self.log(format_summary(self.summary()))
+        return self.summary()
+
+def format_summary(s):
+    line = (f"{s['title']}: {s['wins']} - {s['losses']} - {s['draws']} "
+            f"[{s['score']:.3f}] {s['games']} games, Elo {s['elo']:+.1f} +/- {s['elo_error']:.1f}, "
+            f"LOS {s['los'] * 100:.1f}%")
+    if 'llr' in s:
+        line += f", LLR {s['llr']:.2f} ({s['bounds'][0]:.2f}, {s['bounds'][1]:.2f})"
+        if s['decision']:
+            line += f" {s['decision']} accepted"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play an engine-vs-engine match")
+    parser.add_argument("--engine", nargs="+", action="append", required=True, metavar="KEY=VALUE",
+                        help="name=..., cmd=... (default: this engine), option.<Name>=...; given twice")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="games played at once (each runs two engine processes)")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--tc", help="clock per game: seconds[+increment]")
+    limit.add_argument("--movetime", type=float, help="seconds per move")
+    limit.add_argument("--depth", type=int, help="fixed depth per move")
+    parser.add_argument("--openings", help="EPD, FEN or PGN file of openings")
+    parser.add_argument("--opening-plies", type=int, default=8, help="moves taken from PGN openings")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"),
+                        help="stop early with an SPRT of ELO0 against ELO1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--out", help="write every game as a JSON line to this file")
+    args = parser.parse_args(argv)
+    if len(args.engine) != 2:
+        parser.error("give --engine exactly twice")
+
+    engines = [EngineConfig.parse(tokens) for tokens in args.engine]
+    if engines[0].name == engines[1].name:
+        engines[1].name += "-2"
+    if args.movetime is not None:
+        limits = Limits(movetime=args.movetime)
+    elif args.depth is not None:
+        limits = Limits(depth=args.depth)
+    else:
+        limits = Limits.parse_tc(args.tc or "10+0.1")
+    sprt = (args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    out = open(args.out, "w") if args.out else None
+    try:
+        match = Match(engines[0], engines[1], limits, args.games, args.concurrency,
+                      load_openings(args.openings, args.opening_plies), sprt, out, log=print)
+        summary = match.run()
+    finally:
+        if out is not None:
+            out.close()
+    for name, totals in summary['engines'].items():
+        print(f"{name}: {totals['moves']} moves, {totals['time_per_move']:.3f}s/move, "
+              f"{totals['nps']} nps, depth {totals['depth']:.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,73 @@
-class Move:
-    def __init__(self, start, end, promotion=None, is_castling=False, is_en_passant=False):
-        self.start = start
-        self.end = end
-        self.promotion = promotion
-        self.is_castling = is_castling
-        self.is_en_passant = is_en_passant
-
-    def __eq__(self, other):
-        return (self.start == other.start and 
-                self.end == other.end and 
-                self.promotion == other.promotion)
+# Moves are 16-bit integers:
+#
+#   bits 0-5    from square
+#   bits 6-11   to square
+#   bits 12-14  promotion (0 none, 1 n, 2 b, 3 r, 4 q)
+#
+# Castling and en passant are recognised from the board in make_move, so
+# they need no flag bits of their own and a move always has exactly one
+# code. Code 0 (a8a8) is never legal and stands for "no move".
+#
+# The engine passes plain ints around; Move is a thin int subclass used at
+# API boundaries (UCI, server, tests) for its readable attributes.
+from array import array
+
+# More than the legal moves of any reachable position (218)
+MAX_MOVES = 256
+
+PROMO_CHARS = ['', 'n', 'b', 'r', 'q']
+PROMO_CODES = {'n': 1, 'b': 2, 'r': 3, 'q': 4}
+
+FILES = "abcdefgh"
+RANKS = "87654321"  # 0-index is rank 8
+SQUARE_NAMES = [FILES[sq % 8] + RANKS[sq // 8] for sq in range(64)]
+
+# UCI string for every code, and the reverse index
+UCI_NAMES = [SQUARE_NAMES[c & 63] + SQUARE_NAMES[(c >> 6) & 63] + PROMO_CHARS[c >> 12]
+             for c in range(5 << 12)]
+UCI_CODES = {name: code for code, name in enumerate(UCI_NAMES) if code}
+
+def encode(start, end, promo=0):
+    return start | (end << 6) | (promo << 12)
+
+def move_buffer():
+    # Preallocated move list; generators fill it and return the count
+    return array('H', bytes(2 * MAX_MOVES))
+
+class Move(int):
+    __slots__ = ()
+
+    def __new__(cls, start, end=None, promotion=None):
+        # Move(code) or Move(start, end, promotion char)
+        if end is None:
+            return int.__new__(cls, start)
+        return int.__new__(cls, start | (end << 6) | (PROMO_CODES[promotion] << 12 if promotion else 0))
+
+    @property
+    def start(self):
+        return self & 63
+
+    @property
+    def end(self):
+        return (self >> 6) & 63
+
+    @property
+    def promotion(self):
+        return PROMO_CHARS[self >> 12] or None
 
     def __repr__(self):
-        # Simple algebraic notation helper (not full SAN)
-        files = "abcdefgh"
-        ranks = "12345678"
-        s = files[self.start % 8] + ranks[7 - (self.start // 8)]
-        e = files[self.end % 8] + ranks[7 - (self.end // 8)]
-        promo = self.promotion if self.promotion else ""
-        return f"{s}{e}{promo}"
+        return UCI_NAMES[self]
+
+    __str__ = __repr__
 
     def to_uci(self):
-        return self.__repr__()
+        return UCI_NAMES[self]
 
     @staticmethod
     def from_uci(uci_str):
-        # This will need board context to be fully robust (for validation), 
-        # but for parsing coordinates it's fine.
-        # uci_str example: "e2e4", "a7a8q"
-        files = "abcdefgh"
-        ranks = "87654321" # 0-index is rank 8
-        
-        f1, r1 = uci_str[0], uci_str[1]
-        f2, r2 = uci_str[2], uci_str[3]
-        
-        start = (ranks.index(r1) * 8) + files.index(f1)
-        end = (ranks.index(r2) * 8) + files.index(f2)
-        
-        promotion = None
-        if len(uci_str) > 4:
-            promotion = uci_str[4]
-            
-        return Move(start, end, promotion)
+        # Coordinates only; legality needs the board
+        # (Board.legal_moves_by_uci)
+        code = UCI_CODES.get(uci_str.lower())
+        if code is None:
+            raise ValueError(f"Invalid UCI move: {uci_str}")
+        return Move(code)
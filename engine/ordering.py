@@ -0,0 +1,176 @@
+# Move ordering: hash move, MVV-LVA captures, killers, history heuristic
+from .board import EMPTY, WHITE, BLACK, wP, bP, wN, wB, wR, wQ, wK, CAPTURES, QUIETS
+
+# Ordering value per piece constant. The king is given a large value so
+# that king captures sort last among equal victims.
+PIECE_VALUE = [0] + [100, 320, 330, 500, 900, 20000] * 2
+
+MAX_PLY = 128
+
+# Score bands; everything below KILLER_SCORE is a history score
+HASH_SCORE = 10_000_000
+CAPTURE_SCORE = 1_000_000
+KILLER_SCORE = 900_000
+HISTORY_MAX = 500_000
+
+# Promotion bits (move >> 12) of a queen promotion
+PROMO_QUEEN = 4
+
+# Moves are int codes (see move.py): from = move & 63, to = (move >> 6) & 63
+
+def mvv_lva(board, move):
+    # Most valuable victim first, least valuable attacker as tiebreak
+    victim = board.mailbox[(move >> 6) & 63]
+    victim_value = PIECE_VALUE[victim] if victim != EMPTY else PIECE_VALUE[1]  # en passant
+    return victim_value * 10 - PIECE_VALUE[board.mailbox[move & 63]] // 10
+
+def is_capture(board, move):
+    end = (move >> 6) & 63
+    if board.mailbox[end] != EMPTY:
+        return True
+    p = board.mailbox[move & 63]
+    return end == board.en_passant and (p == wP or p == bP)
+
+def see(board, move):
+    # Static exchange evaluation: material balance for the side to move
+    # after the full sequence of captures on the target square, each side
+    # always recapturing with its least valuable attacker (swap algorithm).
+    start, to = move & 63, (move >> 6) & 63
+    mailbox = board.mailbox
+    pieces = board.pieces
+    occ = board.occupancy[WHITE] | board.occupancy[BLACK]
+    attacker = mailbox[start]
+    victim = mailbox[to]
+    if victim == EMPTY and to == board.en_passant and (attacker == wP or attacker == bP):
+        victim = bP if attacker == wP else wP
+        occ ^= 1 << (to + 8 if attacker == wP else to - 8)
+
+    gain = [PIECE_VALUE[victim]]
+    on_square = PIECE_VALUE[attacker]
+    if move >> 12:
+        promoted = (move >> 12) + 1
+        gain[0] += PIECE_VALUE[promoted] - PIECE_VALUE[wP]
+        on_square = PIECE_VALUE[promoted]
+    occ ^= 1 << start
+    side = board.turn ^ 1
+    while True:
+        attackers = board.attackers_to(to, side, occ) & occ
+        if not attackers:
+            break
+        off = 0 if side == WHITE else 6
+        for p in (wP, wN, wB, wR, wQ, wK):
+            found = attackers & pieces[p + off]
+            if found:
+                break
+        # Capturing the king is never legal: a king cannot take into a
+        # defended square
+        if p == wK and board.attackers_to(to, side ^ 1, occ) & occ:
+            break
+        gain.append(on_square - gain[-1])
+        if max(-gain[-2], gain[-1]) < 0:
+            break
+        on_square = PIECE_VALUE[p]
+        occ ^= found & -found
+        side ^= 1
+    while len(gain) > 1:
+        last = gain.pop()
+        gain[-1] = -max(-gain[-1], last)
+    return gain[0]
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[color][from][to]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def new_search(self):
+        # Killers are position specific; history is kept but aged so that
+        # it still reflects the previous search without dominating
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for side in self.history:
+            for row in side:
+                for to in range(64):
+                    row[to] >>= 1
+
+    def clear(self):
+        self.__init__()
+
+    def score(self, board, move, tt_move, ply):
+        if tt_move is not None and move == tt_move:
+            return HASH_SCORE
+        if is_capture(board, move):
+            return CAPTURE_SCORE + mvv_lva(board, move)
+        if move >> 12:
+            # Quiet promotions: queen first, underpromotions with the quiets
+            return CAPTURE_SCORE if move >> 12 == PROMO_QUEEN else 0
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        if move == killers[0]:
+            return KILLER_SCORE + 1
+        if move == killers[1]:
+            return KILLER_SCORE
+        return self.history[board.turn][move & 63][(move >> 6) & 63]
+
+    def order(self, board, moves, tt_move=None, ply=0):
+        # moves: any sequence of move codes, e.g. a slice of a move buffer
+        scored = [(self.score(board, m, tt_move, ply), m) for m in moves]
+        scored.sort(reverse=True)
+        return [m for _, m in scored]
+
+    def pick(self, board, buf, tt_move=None, ply=0):
+        # Staged move picker: yields the legal moves lazily, generating
+        # each stage only once the previous one is used up, so a cutoff
+        # early on skips the rest. Stages: hash move, winning and equal
+        # captures (and queen promotions) by MVV-LVA, killers, quiets and
+        # underpromotions by history, losing captures. buf (the ply's move
+        # buffer) is overwritten between stages.
+        if tt_move is not None and board.is_legal(tt_move, buf):
+            yield tt_move
+
+        captures = sorted(buf[:board.generate(buf, CAPTURES)],
+                          key=lambda m: mvv_lva(board, m), reverse=True)
+        losing = []
+        mailbox = board.mailbox
+        for move in captures:
+            if move == tt_move:
+                continue
+            # Only a capture by a more valuable piece can lose material
+            victim = mailbox[(move >> 6) & 63]
+            if (PIECE_VALUE[mailbox[move & 63]] > PIECE_VALUE[victim or wP] and not move >> 12
+                    and see(board, move) < 0):
+                losing.append(move)
+                continue
+            yield move
+
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        for move in killers:
+            if (move is not None and move != tt_move and not is_capture(board, move)
+                    and board.is_legal(move, buf)):
+                yield move
+
+        history = self.history[board.turn]
+        quiets = sorted(buf[:board.generate(buf, QUIETS)],
+                        key=lambda m: history[m & 63][(m >> 6) & 63], reverse=True)
+        for move in quiets:
+            if move != tt_move and move not in killers:
+                yield move
+
+        yield from losing
+
+    def update(self, board, move, depth, ply):
+        # Called for the move that caused a beta cutoff (board before the move)
+        if is_capture(board, move) or move >> 12:
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        row = self.history[board.turn][move & 63]
+        end = (move >> 6) & 63
+        row[end] += depth * depth
+        if row[end] > HISTORY_MAX:
+            # Keep history scores below the killer band
+            for side in self.history:
+                for r in side:
+                    for to in range(64):
+                        r[to] >>= 1
@@ -0,0 +1,194 @@
+# Multi-process root-splitting search
+#
+# Each iteration searches the first (hash / previous best) root move in
+# this process to establish alpha, then farms the remaining root moves out
+# to a pool of worker processes, each searching its move with the window
+# (alpha, INF). Results are combined into one best move and score per
+# iteration. Worker node counts are merged into the coordinator's stats.
+#
+# The transposition table is moved into shared memory for the pool, so
+# workers and the coordinator probe and fill the same table; history
+# tables stay per process and warm up across iterations. Workers take the
+# table's generation from the coordinator with every task, so entries
+# age the same way in every process.
+#
+# Workers are spawned, not forked: the search runs on a UCI worker thread
+# while the main thread sits in sys.stdin.readline() holding the stdin
+# lock, and a forked child would inherit that lock held and hang.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from . import search as search_mod
+from .search import INF, orderer, negamax, root_search, iteration_done
+from .stats import SearchStats, SearchResult
+from .move import Move
+from .tt import EXACT, SharedTranspositionTable
+from .timeman import TimeManager
+
+# Iterations this shallow are cheaper to run in-process than to dispatch
+PARALLEL_MIN_DEPTH = 3
+# How often the coordinator checks its clock while waiting on workers
+WAIT_INTERVAL = 0.01
+# How long stopped workers get to unwind before the pool is given up on
+STOP_GRACE = 1.0
+
+_pool = None
+_pool_size = 0
+_pool_tt = None
+_stop_event = None
+_search_id = 0
+
+# Worker-process state
+_worker_stop = None
+_worker_search_id = None
+
+def _init_worker(stop_event, tt_name):
+    global _worker_stop
+    _worker_stop = stop_event
+    search_mod.use_shared_tt(name=tt_name)
+
+def _search_move(board, move, depth, alpha, search_id, generation, time_left, settings):
+    # Runs in a worker process: score one root move. Returns
+    # (score, completed, stats dict).
+    global _worker_search_id
+    search_mod.tt.generation = generation
+    if search_id != _worker_search_id:
+        # First task of a new search in this worker
+        _worker_search_id = search_id
+        orderer.new_search()
+    search_mod.timer = TimeManager(hard=time_left, stop_event=_worker_stop)
+    search_mod.stats = SearchStats()
+    search_mod.apply_settings(settings)
+    board.make_move(move)
+    score = -negamax(board, depth - 1, -INF, -alpha, 1)
+    board.unmake_move(move)
+    return score, not search_mod.timer.stopped, search_mod.stats.to_dict()
+
+def get_pool(workers):
+    # Long-lived pool, rebuilt when the worker count or shared table
+    # changes. The table is compared by identity: a resized table is a new
+    # segment under the same name, and workers still attached to the old
+    # one would no longer share anything.
+    global _pool, _pool_size, _pool_tt, _stop_event
+    tt = search_mod.tt
+    if not isinstance(tt, SharedTranspositionTable):
+        tt = search_mod.use_shared_tt(size_mb=tt.size_mb)
+    if _pool is None or _pool_size != workers or _pool_tt is not tt:
+        shutdown_pool()
+        ctx = multiprocessing.get_context("spawn")
+        _stop_event = ctx.Event()
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                    initializer=_init_worker, initargs=(_stop_event, tt.name))
+        _pool_size = workers
+        _pool_tt = tt
+    return _pool
+
+def shutdown_pool(wait=True):
+    # wait=False abandons workers that did not respond to the stop event
+    global _pool, _pool_size, _pool_tt
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+    _pool = None
+    _pool_size = 0
+    _pool_tt = None
+
+def _split_root(pool, board, moves, depth, alpha, timer):
+    # Search moves[1:] in the pool; returns [(score, move)] or None if the
+    # iteration was interrupted
+    settings = search_mod.get_settings()
+    generation = search_mod.tt.generation
+    futures = {
+        pool.submit(_search_move, board, m, depth, alpha, _search_id, generation,
+                    timer.remaining(), settings): m
+        for m in moves
+    }
+    results = []
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=WAIT_INTERVAL, return_when=FIRST_COMPLETED)
+        for f in done:
+            score, completed, worker_stats = f.result()
+            search_mod.stats.merge(worker_stats)
+            if not completed:
+                timer.stop()
+            results.append((score, futures[f]))
+        if pending and timer.expired():
+            # Tell the workers to unwind, then drain their results
+            _stop_event.set()
+            for f in pending:
+                f.cancel()
+            done, stuck = wait(pending, timeout=STOP_GRACE)
+            for f in done:
+                if not f.cancelled() and f.exception() is None:
+                    search_mod.stats.merge(f.result()[2])
+            if stuck:
+                # Workers that do not unwind would block every later
+                # search; start over with a fresh pool next time
+                shutdown_pool(wait=False)
+            return None
+    if timer.stopped:
+        _stop_event.set()
+        return None
+    return results
+
+def parallel_search(board, max_depth, timer, workers, info=None, root_moves=None):
+    # Same contract as search.analyse(); expects search.stats to be fresh.
+    # root_moves restricts the root as in search.root_search.
+    global _search_id
+    pool = get_pool(workers)
+    _stop_event.clear()
+    _search_id += 1
+    search_mod.timer = timer
+    tt = search_mod.tt
+    tt.new_search()
+    orderer.new_search()
+    root = board.copy()
+    root.history = []
+    result = SearchResult(stats=search_mod.stats)
+
+    for depth in range(1, max_depth + 1):
+        if depth > 1 and timer.soft_expired():
+            break
+
+        if depth < PARALLEL_MIN_DEPTH:
+            score, move = root_search(root, depth, -INF, INF, root_moves)
+            if timer.stopped:
+                if result.best_move is None:
+                    result.best_move = Move(move) if move is not None else None
+                break
+            if move is None:
+                # Checkmate or stalemate at the root
+                result = SearchResult(None, score, depth, stats=search_mod.stats)
+                break
+            result = iteration_done(root, depth, score, move, info, search_mod.root_lines)
+            continue
+
+        moves = root_moves or root.generate_moves()
+        if not moves:
+            break
+        entry = tt.probe(root.hash)
+        moves = orderer.order(root, moves, entry[4] if entry else None, 0)
+
+        # Principal move first, in this process, to get a tight alpha
+        root.make_move(moves[0])
+        best_score = -negamax(root, depth - 1, -INF, INF, 1)
+        root.unmake_move(moves[0])
+        if timer.stopped:
+            break
+        move = moves[0]
+
+        results = _split_root(pool, root, moves[1:], depth, best_score, timer)
+        if results is None:
+            break
+        for score, m in results:
+            if score > best_score:
+                best_score, move = score, m
+
+        tt.store(root.hash, depth, EXACT, best_score, move)
+        result = iteration_done(root, depth, best_score, move, info)
+
+    if result.best_move is None:
+        moves = root_moves or root.generate_moves()
+        if moves:
+            result.best_move = Move(moves[0])
+    return result
@@ -0,0 +1,183 @@
+# Perft / divide: move generator correctness and throughput benchmark
+#
+# Usage:
+#   python -m engine.perft                      # run the standard suite
+#   python -m engine.perft --depth 4 --json out.json
+#   python -m engine.perft --fen "<fen>" --depth 3 --divide
+#   python -m engine.perft --baseline old.json  # compare nps against a saved run
+import argparse
+import json
+import platform
+import sys
+import time
+
+from .board import Board
+from .move import move_buffer, UCI_NAMES
+
+# (name, fen, {depth: expected leaf nodes})
+SUITE = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    # En passant edge cases
+    ("ep_illegal", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     {1: 18, 2: 92, 3: 1670, 4: 10138}),
+    ("ep_discovered", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     {1: 13, 2: 102, 3: 1266, 4: 10276}),
+    ("ep_check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {1: 15, 2: 126, 3: 1928, 4: 13931}),
+    # Promotion edge cases
+    ("promo_out_of_check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {1: 11, 2: 133, 3: 1442, 4: 19174}),
+    ("promo_check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {1: 9, 2: 40, 3: 472, 4: 2661}),
+    ("underpromo", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     {1: 6, 2: 27, 3: 273, 4: 1329}),
+    # Castling edge cases
+    ("castle_rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     {1: 26, 2: 1141, 3: 27826}),
+    ("castle_prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {1: 44, 2: 1494, 3: 50509}),
+    ("castle_check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     {1: 15, 2: 66, 3: 1198}),
+]
+
+DEFAULT_DEPTH = 3
+
+def perft(board, depth, buffers=None):
+    # Count leaf nodes of the legal move tree, with one move buffer per
+    # remaining depth
+    if depth == 0:
+        return 1
+    if buffers is None:
+        buffers = [move_buffer() for _ in range(depth + 1)]
+    buf = buffers[depth]
+    n = board.generate(buf)
+    if depth == 1:
+        return n
+    nodes = 0
+    for move in buf[:n]:
+        board.make_move(move)
+        nodes += perft(board, depth - 1, buffers)
+        board.unmake_move(move)
+    return nodes
+
+def divide(board, depth):
+    # Per-root-move perft counts, keyed by UCI string
+    counts = {}
+    buf = move_buffer()
+    buffers = [move_buffer() for _ in range(depth)]
+    for move in buf[:board.generate(buf)]:
+        board.make_move(move)
+        counts[UCI_NAMES[move]] = perft(board, depth - 1, buffers) if depth > 1 else 1
+        board.unmake_move(move)
+    return counts
+
+def run_position(fen, depth, expected=None):
+    board = Board(fen)
+    start = time.perf_counter()
+    nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    return {
+        'fen': fen,
+        'depth': depth,
+        'nodes': nodes,
+        'expected': expected,
+        'ok': expected is None or nodes == expected,
+        'seconds': round(elapsed, 4),
+        'nps': int(nodes / elapsed) if elapsed > 0 else 0,
+    }
+
+def run_suite(depth=DEFAULT_DEPTH, suite=SUITE, out=None):
+    # Each position runs at min(depth, deepest known count)
+    results = []
+    for name, fen, expected in suite:
+        d = min(depth, max(expected))
+        result = run_position(fen, d, expected[d])
+        result['name'] = name
+        results.append(result)
+        if out:
+            status = "ok" if result['ok'] else f"FAIL (expected {result['expected']})"
+            print(f"{name:20s} depth {d}  nodes {result['nodes']:>9d}  "
+                  f"{result['seconds']:8.3f}s  {result['nps']:>8d} nps  {status}", file=out)
+    total_nodes = sum(r['nodes'] for r in results)
+    total_seconds = sum(r['seconds'] for r in results)
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'depth': depth,
+        'results': results,
+        'total_nodes': total_nodes,
+        'total_seconds': round(total_seconds, 4),
+        'nps': int(total_nodes / total_seconds) if total_seconds > 0 else 0,
+        'ok': all(r['ok'] for r in results),
+    }
+
+def compare(report, baseline):
+    # nps ratio (current / baseline) per position name present in both runs
+    old = {r['name']: r for r in baseline['results']}
+    ratios = {}
+    for r in report['results']:
+        b = old.get(r['name'])
+        if b and b['nps'] and b['depth'] == r['depth']:
+            ratios[r['name']] = r['nps'] / b['nps']
+    return ratios
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft move generator benchmark")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--fen", help="run a single position instead of the suite")
+    parser.add_argument("--divide", action="store_true", help="print per-move counts (with --fen)")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare nps against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed nps slowdown vs baseline before failing (default 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        board = Board(args.fen)
+        if args.divide:
+            start = time.perf_counter()
+            counts = divide(board, args.depth)
+            elapsed = time.perf_counter() - start
+            for uci, n in sorted(counts.items()):
+                print(f"{uci}: {n}")
+            nodes = sum(counts.values())
+            print(f"\nNodes searched: {nodes}")
+            print(f"Time: {elapsed:.3f}s  ({int(nodes / elapsed) if elapsed > 0 else 0} nps)")
+            return 0
+        result = run_position(args.fen, args.depth)
+        print(f"depth {result['depth']}  nodes {result['nodes']}  "
+              f"{result['seconds']:.3f}s  {result['nps']} nps")
+        report = {'results': [dict(result, name='fen')], 'ok': True}
+    else:
+        report = run_suite(args.depth, out=sys.stdout)
+        print(f"\nTotal: {report['total_nodes']} nodes in {report['total_seconds']:.3f}s "
+              f"({report['nps']} nps)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    status = 0 if report['ok'] else 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            ratios = compare(report, json.load(f))
+        for name, ratio in ratios.items():
+            flag = "  REGRESSION" if ratio < 1 - args.tolerance else ""
+            print(f"{name:20s} {ratio:6.2f}x baseline nps{flag}")
+            if flag:
+                status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# PGN reading
+#
+# Enough PGN to feed games into analysis: tag pairs, movetext in SAN
+# (comments, variations, NAGs and move numbers are skipped) and SAN to
+# move conversion against the board's legal moves. Games are read one at
+# a time, so files of any size stream in constant memory.
+import re
+
+from .board import WHITE, wP, wN, wB, wR, wQ, wK
+from .move import move_buffer, SQUARE_NAMES, PROMO_CODES
+
+TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+TOKEN = re.compile(r'\{[^}]*\}?|;[^\n]*|\$\d+|[()]|\d+\.+|[^\s{}();$]+')
+SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+PIECE_LETTERS = {'N': wN, 'B': wB, 'R': wR, 'Q': wQ, 'K': wK}
+CASTLES = {'O-O': 2, '0-0': 2, 'O-O-O': -2, '0-0-0': -2}
+
+def parse_san(board, san):
+    # Move code for a SAN move in this position; ValueError if it is not
+    # exactly one legal move
+    san = san.rstrip('+#!?')
+    buf = move_buffer()
+    moves = buf[:board.generate(buf)]
+    king = board.king_sq[board.turn]
+    if san in CASTLES:
+        for m in moves:
+            if m & 63 == king and ((m >> 6) & 63) - king == CASTLES[san]:
+                return m
+        raise ValueError(f"Illegal move: {san}")
+    match = SAN.match(san)
+    if match is None:
+        raise ValueError(f"Invalid SAN: {san}")
+    letter, file, rank, target, promo = match.groups()
+    piece = PIECE_LETTERS[letter] if letter else wP
+    if board.turn != WHITE:
+        piece += 6
+    end = SQUARE_NAMES.index(target)
+    promo = PROMO_CODES[promo.lower()] if promo else 0
+    found = [m for m in moves
+             if (m >> 6) & 63 == end and m >> 12 == promo and board.mailbox[m & 63] == piece
+             and (file is None or SQUARE_NAMES[m & 63][0] == file)
+             and (rank is None or SQUARE_NAMES[m & 63][1] == rank)]
+    if len(found) != 1:
+        raise ValueError(f"{'Ambiguous' if found else 'Illegal'} move: {san}")
+    return found[0]
+
+def _parse_movetext(text):
+    # Mainline SAN moves and the result token (or None)
+    moves = []
+    depth = 0
+    for token in TOKEN.findall(text):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth or token[0] in '{;$' or token[0].isdigit() and token.endswith('.'):
+            continue
+        elif token in RESULTS:
+            return moves, token
+        else:
+            moves.append(token)
+    return moves, None
+
+def read_games(lines):
+    # (tags, SAN moves) for each game in an iterable of PGN lines
+    tags = {}
+    movetext = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('[') and not movetext:
+            match = TAG.match(stripped)
+            if match:
+                tags[match.group(1)] = match.group(2)
+            continue
+        if stripped.startswith('[') and movetext:
+            # Tags of the next game: the previous one had no result token
+            yield tags, _parse_movetext(" ".join(movetext))[0]
+            match = TAG.match(stripped)
+            tags = {match.group(1): match.group(2)} if match else {}
+            movetext = []
+            continue
+        if stripped:
+            movetext.append(stripped)
+            if stripped.split()[-1] in RESULTS:
+                moves, result = _parse_movetext(" ".join(movetext))
+                if result is not None:
+                    yield tags, moves
+                    tags = {}
+                    movetext = []
+    if tags or movetext:
+        yield tags, _parse_movetext(" ".join(movetext))[0]
@@ -0,0 +1,188 @@
+# Bounded process pool for engine searches
+#
+# Services that search for many clients at once (ui/server.py) submit
+# searches here instead of running them on the request thread. At most
+# `workers` searches run at a time and at most `max_queue` more wait for a
+# worker; past that submit() raises Saturated straight away, so callers
+# can shed load rather than pile up requests.
+#
+# Every job carries a deadline. A job still queued when its deadline
+# passes is dropped by the worker, and a running search gets no more than
+# the time left.
+#
+# submit_stream() runs a search that reports each completed iteration
+# through a queue and can be stopped from the parent; without a time limit
+# it keeps deepening until stopped (analysis mode).
+#
+# Worker and manager processes are spawned: the pool is created from
+# threaded servers, and a forked child could inherit a lock held by
+# another thread (see parallel.py).
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from . import search as search_mod
+from .ordering import MAX_PLY
+from .timeman import TimeManager
+
+# Searches that would get less time than this are not started
+MIN_SEARCH_TIME = 0.05
+# Extra wait for a result beyond the deadline (process hand-off, pickling)
+DEADLINE_GRACE = 1.0
+
+class Saturated(RuntimeError):
+    # Every worker is busy and the queue is full
+    pass
+
+class DeadlineExceeded(RuntimeError):
+    # The job could not be finished before its deadline
+    pass
+
+def _init_worker(hash_mb, bitbase_dir):
+    if hash_mb:
+        search_mod.set_hash_size(hash_mb)
+    if bitbase_dir and search_mod.bitbases is None:
+        search_mod.use_bitbases(bitbase_dir)
+
+def _run_search(board, depth, movetime, deadline):
+    # Runs in a worker process. deadline is wall-clock time (time.time()),
+    # which unlike the monotonic clock means the same in every process.
+    # Returns a SearchResult, or None if the deadline has passed.
+    remaining = deadline - time.time()
+    if remaining < MIN_SEARCH_TIME:
+        return None
+    return search_mod.analyse(board, depth, min(movetime, remaining))
+
+def _run_stream(board, depth, movetime, deadline, events, stop, multipv=1):
+    # Runs in a worker process: like _run_search, but puts every completed
+    # iteration's SearchResult.to_dict() on events and stops when stop is
+    # set. movetime None searches until stopped or depth is reached.
+    try:
+        if deadline - time.time() < MIN_SEARCH_TIME:
+            return None
+        timer = TimeManager(soft=movetime, hard=movetime, stop_event=stop)
+        return search_mod.analyse(board, depth, time_manager=timer,
+                                  info=lambda r: events.put(r.to_dict()), multipv=multipv)
+    finally:
+        events.put(None)
+
+class AnalysisStream:
+    # Handle on a submit_stream() job
+    def __init__(self, future, events, stop):
+        self.future = future   # final SearchResult, or None if it expired
+        self.events = events   # iteration dicts, then None once finished
+        self._stop = stop
+
+    def stop(self):
+        # Ask the search to finish with what it has; future still gets
+        # the result
+        self._stop.set()
+
+class EnginePool:
+    def __init__(self, workers=None, max_queue=None, hash_mb=None, bitbase_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = 2 * self.workers if max_queue is None else max_queue
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(hash_mb, bitbase_dir))
+        self._manager = None   # queues and events for streams, started on demand
+        self._lock = threading.Lock()
+        self.pending = 0      # submitted and not finished yet
+        self.completed = 0
+        self.expired = 0      # dropped or cut off by their deadline
+        self.rejected = 0     # refused with Saturated
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    def submit(self, board, depth, movetime, deadline):
+        # Future for a SearchResult (None if the deadline passes first).
+        # deadline is in seconds from now. Raises Saturated when full.
+        return self._submit(_run_search, board, depth, movetime, time.time() + deadline)
+
+    def submit_stream(self, board, depth=MAX_PLY, movetime=None, deadline=DEADLINE_GRACE,
+                      multipv=1):
+        # AnalysisStream for a search that reports every iteration (with
+        # the best multipv root moves); deadline bounds only the wait for a
+        # worker. Raises Saturated when full.
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+        events = self._manager.Queue()
+        stop = self._manager.Event()
+        future = self._submit(_run_stream, board, depth, movetime, time.time() + deadline,
+                              events, stop, multipv)
+        return AnalysisStream(future, events, stop)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise Saturated(f"{self.pending} searches pending")
+            self.pending += 1
+        try:
+            job = self._executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        # Callers get their own future, completed only after the slot is
+        # released, so a caller that has its result can submit again
+        future = Future()
+        future.add_done_callback(lambda f: f.cancelled() and job.cancel())
+        job.add_done_callback(lambda job: self._done(job, future))
+        return future
+
+    def _done(self, job, future):
+        with self._lock:
+            self.pending -= 1
+            if not job.cancelled() and job.exception() is None:
+                if job.result() is None:
+                    self.expired += 1
+                else:
+                    self.completed += 1
+        try:
+            if job.cancelled():
+                future.cancel()
+            elif job.exception() is not None:
+                future.set_exception(job.exception())
+            else:
+                future.set_result(job.result())
+        except InvalidStateError:
+            # The caller cancelled while the job was running
+            pass
+
+    def search(self, board, depth, movetime, deadline):
+        # Blocking submit: the SearchResult, or Saturated / DeadlineExceeded
+        future = self.submit(board, depth, movetime, deadline)
+        try:
+            result = future.result(timeout=deadline + DEADLINE_GRACE)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.expired += 1
+            raise DeadlineExceeded(f"no result within {deadline}s") from None
+        if result is None:
+            raise DeadlineExceeded(f"still queued after {deadline}s")
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'running': min(self.pending, self.workers),
+                'queued': max(0, self.pending - self.workers),
+                'completed': self.completed,
+                'expired': self.expired,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -1,94 +1,570 @@
-import time
 from .eval import evaluate
-from .board import WHITE, BLACK
+from .board import WHITE, BLACK, wP, wK, CAPTURES
+import atexit
+from .tt import TranspositionTable, SharedTranspositionTable, DEFAULT_HASH_MB, EXACT, LOWER, UPPER
+from .ordering import MoveOrderer, PIECE_VALUE, MAX_PLY, mvv_lva, see, is_capture
+from .timeman import TimeManager
+from .stats import SearchStats, SearchResult
+from .move import Move, move_buffer
+from .bitboard import popcount
+try:
+    from .batch_eval import evaluate_children
+except ImportError:
+    # numpy is missing: frontier batching is unavailable
+    evaluate_children = None
 
 INF = 1000000
 
+# Checkmate scores: MATE_SCORE - ply for delivering mate at that ply, so
+# shorter mates score higher. Anything beyond MATE_BOUND is a mate score.
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - MAX_PLY
+
+# Bitbase results below mate scores: a won position scores BITBASE_WIN
+# plus its static eval, so the search still prefers progress
+BITBASE_WIN = 20000
+
+# Quiescence delta pruning: skip captures that cannot lift the score back
+# to alpha even with this much positional slack
+DELTA_MARGIN = 200
+
+# Selective search. Each technique can be switched off (UCI options PVS,
+# AspirationWindows, NullMove, LMR) to measure what it saves.
+# Principal variation search: moves after the first get a null window
+# and are re-searched with the full window only if they beat alpha
+use_pvs = True
+# Iterations from ASPIRATION_MIN_DEPTH on start with a window of
+# +-ASPIRATION_WINDOW around the previous score, widened on failure
+use_aspiration = True
+ASPIRATION_MIN_DEPTH = 4
+ASPIRATION_WINDOW = 50
+# Null-move pruning: if passing still fails high at reduced depth, so
+# would a real move. Not tried in check, twice in a row, or with only
+# pawns left (zugzwang).
+use_null_move = True
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_R = 2
+# Late move reductions: quiet moves from LMR_MIN_MOVE on are searched one
+# ply shallower, and again at full depth if they beat alpha
+use_lmr = True
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVE = 3
+
 # Transposition Table
-tt = {}
+tt = TranspositionTable(DEFAULT_HASH_MB)
+
+# Killer and history tables; history persists across iterations and is
+# aged between searches
+orderer = MoveOrderer()
+
+# Clock for the running search; negamax polls it and unwinds once it stops
+timer = TimeManager()
+
+# Counters for the running search
+stats = SearchStats()
+
+# Evaluate all children of depth-1 nodes in one vectorized call
+# (batch_eval, needs numpy) instead of one at a time in quiescence.
+# Turn it on with use_batch_frontier(), which checks that numpy is there.
+batch_frontier = False
+
+# Endgame bitbases (bitbase.Bitbases) or None. Interior nodes with at most
+# probe_men pieces are scored from the tables; probe_men is 0 when the root
+# itself is a table position, so that the search keeps looking for the mate
+# among the moves that preserve the result.
+bitbases = None
+probe_men = 0
+
+# Triangular PV table: pv_lines[ply] is the best line found from the node
+# being searched at ply, built from the child's line whenever a move
+# raises alpha. root_lines holds the lines of the last root_search as
+# (score, moves) pairs, best first; more than one with MultiPV.
+pv_lines = [()] * (MAX_PLY + 2)
+root_lines = []
+# Previous iteration's PV. While follow_pv is set the search is still on
+# that line, and its move is tried first at each ply.
+last_pv = []
+follow_pv = False
+
+# One move buffer per ply, reused by every node at that ply. Quiescence at
+# a ply only runs where negamax would not generate, so they can share.
+buffers = [move_buffer() for _ in range(MAX_PLY + 1)]
 
 def clear_tt():
+    tt.clear()
+    orderer.clear()
+
+def set_hash_size(size_mb):
+    # Resizing drops all stored entries
+    if isinstance(tt, SharedTranspositionTable):
+        use_shared_tt(tt.name if tt.path is None else None, tt.path, size_mb, replace=True)
+    else:
+        tt.resize(size_mb)
+
+def use_shared_tt(name=None, path=None, size_mb=None, replace=False):
+    # Switch this process to a shared-memory (or mmap'd file) table. Processes
+    # using the same name / path share entries; the first one creates it.
     global tt
-    tt = {}
+    if size_mb is None:
+        size_mb = tt.size_mb
+    old = tt
+    if isinstance(old, SharedTranspositionTable):
+        if not replace and (old.name == name or (path and old.path == path)):
+            return old
+        old.close()
+    tt = SharedTranspositionTable(size_mb, name=name, path=path)
+    if tt.owner:
+        atexit.register(tt.close)
+    return tt
 
-def search(board, max_depth, time_limit=5.0):
-    best_move = None
-    start_time = time.time()
-    
-    print(f"Starting search to depth {max_depth}...")
+def use_local_tt(size_mb=None):
+    # Back to a private in-process table
+    global tt
+    if isinstance(tt, SharedTranspositionTable):
+        tt.close()
+    tt = TranspositionTable(size_mb or tt.size_mb)
+    return tt
+
+def use_batch_frontier(enabled):
+    # Raises ValueError when enabling it without numpy
+    global batch_frontier
+    if enabled and evaluate_children is None:
+        raise ValueError("batch evaluation needs numpy")
+    batch_frontier = enabled
+
+def use_bitbases(directory):
+    # Load the bitbase files in directory; None or "" turns probing off
+    global bitbases
+    if bitbases is not None:
+        bitbases.close()
+        bitbases = None
+    if directory:
+        from .bitbase import Bitbases
+        bitbases = Bitbases(directory)
+    return bitbases
+
+def get_settings():
+    # Search options that worker processes must mirror
+    return {
+        'batch_frontier': batch_frontier,
+        'bitbases': bitbases.directory if bitbases is not None else None,
+        'probe_men': probe_men,
+        'pvs': use_pvs,
+        'aspiration': use_aspiration,
+        'null_move': use_null_move,
+        'lmr': use_lmr,
+    }
+
+def apply_settings(settings):
+    global batch_frontier, probe_men, use_pvs, use_aspiration, use_null_move, use_lmr
+    batch_frontier = settings['batch_frontier']
+    probe_men = settings['probe_men']
+    use_pvs = settings['pvs']
+    use_aspiration = settings['aspiration']
+    use_null_move = settings['null_move']
+    use_lmr = settings['lmr']
+    current = bitbases.directory if bitbases is not None else None
+    if settings['bitbases'] != current:
+        use_bitbases(settings['bitbases'])
+
+def bitbase_root_moves(board):
+    # Root moves that keep the bitbase result, or None if no table covers
+    # the root. Children without a table are assumed to keep it.
+    if bitbases is None:
+        return None
+    wdl = bitbases.probe(board)
+    if wdl is None:
+        return None
+    buf = move_buffer()
+    scored = []
+    for move in buf[:board.generate(buf)]:
+        board.make_move(move)
+        child = bitbases.probe(board)
+        board.unmake_move(move)
+        scored.append((wdl if child is None else -child, move))
+    best = max((v for v, _ in scored), default=wdl)
+    return [m for v, m in scored if v == best]
+
+def bitbase_score(board, wdl, ply):
+    if wdl == 0:
+        return 0
+    static = evaluate(board)
+    if board.turn != WHITE:
+        static = -static
+    return (BITBASE_WIN - ply if wdl > 0 else -BITBASE_WIN + ply) + static
+
+def search(board, max_depth, time_limit=5.0, time_manager=None, workers=1, info=None):
+    # Returns the best move; see analyse() for score, PV and statistics
+    return analyse(board, max_depth, time_limit, time_manager, workers, info).best_move
+
+def analyse(board, max_depth, time_limit=5.0, time_manager=None, workers=1, info=None,
+            multipv=1):
+    # time_limit (seconds) is a hard cap checked inside the search; pass a
+    # TimeManager instead for clock-based soft/hard limits.
+    # workers > 1 splits the root moves over a pool of processes.
+    # info, if given, is called with a SearchResult after every completed
+    # iteration. Returns the SearchResult of the last completed iteration.
+    # multipv > 1 also scores the runners-up: result.lines has the best
+    # multipv root moves with their lines (always searched in-process).
+    global timer, stats, probe_men, last_pv
+    if time_manager is None:
+        time_manager = TimeManager(soft=time_limit, hard=time_limit)
+    stats = SearchStats()
+    last_pv = []
+    root_moves = bitbase_root_moves(board)
+    probe_men = bitbases.max_men if bitbases is not None and root_moves is None else 0
+    if workers > 1 and multipv == 1:
+        from .parallel import parallel_search
+        return parallel_search(board, max_depth, time_manager, workers, info, root_moves)
+    timer = time_manager
+    result = SearchResult(stats=stats)
+
+    tt.new_search()
+    orderer.new_search()
     
     for depth in range(1, max_depth + 1):
-        # Check time
-        if time.time() - start_time > time_limit:
+        # Don't start an iteration we are unlikely to finish
+        if depth > 1 and timer.soft_expired():
             break
-            
-        score, move = root_search(board, depth, -INF, INF)
-        best_move = move
-        print(f"Depth {depth}: Score {score}, Best Move {move}")
+
+        score, move = aspiration_search(board, depth, result.score, root_moves, multipv)
+        if timer.stopped:
+            # Aborted mid-iteration: keep the last completed iteration's
+            # move unless nothing has completed yet
+            if result.best_move is None:
+                result.best_move = Move(move) if move is not None else None
+            break
+        if move is None:
+            # Checkmate or stalemate at the root: no move, just the score
+            result = SearchResult(None, score, depth, stats=stats)
+            break
+        result = iteration_done(board, depth, score, move, info, root_lines)
+
+    if result.best_move is None:
+        # Stopped before the first root move finished
+        moves = root_moves or board.generate_moves()
+        if moves:
+            result.best_move = Move(moves[0])
         
-    return best_move
+    return result
 
-def root_search(board, depth, alpha, beta):
+def aspiration_search(board, depth, previous, root_moves=None, multipv=1):
+    # One iteration, searched in a window around the previous iteration's
+    # score. A side that fails is widened (doubling each time) and the
+    # iteration searched again until the score lands inside.
+    if (not use_aspiration or depth < ASPIRATION_MIN_DEPTH or abs(previous) > MATE_BOUND
+            or multipv > 1):
+        return root_search(board, depth, -INF, INF, root_moves, multipv)
+    delta = ASPIRATION_WINDOW
+    alpha, beta = previous - delta, previous + delta
+    while True:
+        score, move = root_search(board, depth, alpha, beta, root_moves)
+        if timer.stopped:
+            return score, move
+        if score <= alpha:
+            alpha = max(score - delta, -INF)
+        elif score >= beta:
+            beta = min(score + delta, INF)
+        else:
+            return score, move
+        stats.researches += 1
+        delta *= 2
+
+def iteration_done(board, depth, score, move, info, lines=None):
+    # Record a completed iteration and report it. lines: root_lines of the
+    # iteration, or None to take the PV from the TT alone.
+    global last_pv
+    stats.depth_times.append((depth, round(stats.elapsed(), 4), stats.nodes))
+    if not lines or lines[0][1][0] != move:
+        lines = [(score, (move,))]
+    lines = [(s, [Move(m) for m in extract_pv(board, line, depth)]) for s, line in lines]
+    pv = lines[0][1]
+    last_pv = [int(m) for m in pv]
+    result = SearchResult(Move(move), score, depth, pv, stats, tt.hashfull(), lines)
+    if info is not None:
+        info(result)
+    return result
+
+def extract_pv(board, line, max_len):
+    # Principal variation: the moves of line (the search's PV) continued
+    # with the chain of TT moves once it ends, e.g. where a TT hit cut the
+    # search short. Stops at an illegal or missing move or a repeated
+    # position.
+    pv = []
+    seen = set()
+    buf = move_buffer()
+    move = line[0]
+    while move is not None and len(pv) < max(max_len, 1) and board.hash not in seen:
+        if move not in buf[:board.generate(buf)]:
+            break
+        seen.add(board.hash)
+        board.make_move(move)
+        pv.append(move)
+        if len(pv) < len(line):
+            move = line[len(pv)]
+        else:
+            entry = tt.probe(board.hash)
+            move = entry[4] if entry else None
+    for m in reversed(pv):
+        board.unmake_move(m)
+    return pv
+
+def score_to_tt(score, ply):
+    # Mate scores are stored relative to the node, not the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+def root_search(board, depth, alpha, beta, root_moves=None, multipv=1):
+    # root_moves restricts the search to a subset of the legal moves.
+    # With multipv > 1 a move only has to beat the multipv-th best score
+    # so far to get an exact score; the best multipv end up in root_lines.
+    global root_lines, follow_pv
+    alpha_orig = alpha
     best_move = None
     best_score = -INF
+    root_lines = []
     
-    moves = board.generate_moves()
-    if not moves:
-        return 0, None # Draw or Mate logic needed
+    buf = buffers[0]
+    n = board.generate(buf)
+    if not n:
+        return (-MATE_SCORE if board.in_check() else 0), None
         
-    # Move ordering could go here
+    stats.nodes += 1
+    # Previous iteration's best move goes first (from its PV, else the TT)
+    moves = root_moves or buf[:n]
+    entry = tt.probe(board.hash)
+    first = entry[4] if entry else None
+    follow_pv = bool(last_pv) and last_pv[0] in moves
+    if follow_pv:
+        first = last_pv[0]
+    moves = orderer.order(board, moves, first, 0)
     
-    for move in moves:
+    for i, move in enumerate(moves):
+        if len(root_lines) >= multipv:
+            alpha = max(alpha, root_lines[-1][0])
         board.make_move(move)
-        score = -negamax(board, depth - 1, -beta, -alpha)
+        if i >= multipv and use_pvs:
+            score = -negamax(board, depth - 1, -alpha - 1, -alpha, 1)
+            if alpha < score < beta:
+                stats.researches += 1
+                score = -negamax(board, depth - 1, -beta, -alpha, 1)
+        else:
+            score = -negamax(board, depth - 1, -beta, -alpha, 1)
         board.unmake_move(move)
+        follow_pv = False
+        if timer.stopped:
+            # Result of an interrupted subtree is meaningless
+            return best_score, best_move
         
         if score > best_score:
             best_score = score
             best_move = move
             
         if score > alpha:
-            alpha = score
+            root_lines.append((score, (move,) + pv_lines[1]))
+            root_lines.sort(key=lambda line: -line[0])
+            del root_lines[multipv:]
+            if multipv == 1:
+                alpha = score
             
-        if alpha >= beta:
+        if score >= beta:
+            stats.cutoff(i)
+            orderer.update(board, move, depth, 0)
             break
-            
+
+    if best_score >= beta:
+        bound = LOWER
+    elif best_score <= alpha_orig:
+        # Failed low (aspiration window): the move is only a guess
+        bound = UPPER
+    else:
+        bound = EXACT
+    tt.store(board.hash, depth, bound, best_score, best_move)
     return best_score, best_move
 
-def negamax(board, depth, alpha, beta):
+def has_pieces(board, color):
+    # Anything besides pawns and the king; positions without are where
+    # zugzwang is common and null-move pruning goes wrong
+    off = 0 if color == WHITE else 6
+    return board.occupancy[color] != board.pieces[wP + off] | board.pieces[wK + off]
+
+def negamax(board, depth, alpha, beta, ply=0, static=None, null_ok=True):
+    # static: precomputed white-POV eval of this position (frontier batching)
+    # null_ok: False right after a null move, so two never follow each other
+    global follow_pv
+    pv_lines[ply] = ()
+    if timer.poll():
+        return 0
+
     # Check TT
-    # (Simplified: not implementing full Zobrist hashing here, just using board string or similar for demo)
-    # board_hash = str(board.squares) + str(board.turn)
-    # if board_hash in tt: ...
-    
-    if depth == 0:
-        # Quiescence search could go here
-        # For now, just static eval
-        # Eval returns white score. If black to move, negate it?
-        # My eval returns white advantage.
-        # If turn is white, return eval. If black, return -eval.
-        score = evaluate(board)
-        return score if board.turn == WHITE else -score
-
-    moves = board.generate_moves()
-    if not moves:
-        # Checkmate or Stalemate
-        # If check, return -INF + ply (to prefer shorter mates)
-        # If not check, return 0
-        return 0 # Simplified
-        
+    alpha_orig = alpha
+    stats.tt_probes += 1
+    entry = tt.probe(board.hash)
+    if entry is not None:
+        stats.tt_hits += 1
+        if entry[1] >= depth:
+            bound, tt_score = entry[2], score_from_tt(entry[3], ply)
+            if (bound == EXACT or (bound == LOWER and tt_score >= beta)
+                    or (bound == UPPER and tt_score <= alpha)):
+                stats.tt_cutoffs += 1
+                return tt_score
+
+    if probe_men and popcount(board.occupancy[WHITE] | board.occupancy[BLACK]) <= probe_men:
+        wdl = bitbases.probe(board)
+        if wdl is not None:
+            stats.tb_hits += 1
+            return bitbase_score(board, wdl, ply)
+
+    if depth == 0 or ply >= MAX_PLY:
+        return quiescence(board, alpha, beta, ply, static)
+
+    stats.nodes += 1
+    if ply > stats.seldepth:
+        stats.seldepth = ply
+
+    in_check = board.in_check()
+    if (use_null_move and null_ok and not in_check and not follow_pv
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and abs(beta) < MATE_BOUND
+            and has_pieces(board, board.turn)):
+        stand_pat = evaluate(board) if static is None else static
+        if (stand_pat if board.turn == WHITE else -stand_pat) >= beta:
+            reduction = NULL_MOVE_R + (1 if depth > 6 else 0)
+            board.make_null_move()
+            score = -negamax(board, max(depth - 1 - reduction, 0), -beta, -beta + 1,
+                             ply + 1, None, False)
+            board.unmake_null_move()
+            if timer.stopped:
+                return 0
+            if score >= beta:
+                stats.null_cutoffs += 1
+                # A mate found after passing is not a proven mate
+                return beta if score > MATE_BOUND else score
+
+    buf = buffers[ply]
     best_score = -INF
+    best_move = None
+    first = entry[4] if entry else None
+    if follow_pv:
+        # Still on the previous iteration's PV: its move goes first
+        if ply < len(last_pv) and board.is_legal(last_pv[ply], buf):
+            first = last_pv[ply]
+        else:
+            follow_pv = False
+    # Moves are generated stage by stage as the loop asks for them
+    moves = orderer.pick(board, buf, first, ply)
+    statics = None
+    if depth == 1 and batch_frontier:
+        moves = list(moves)
+        statics = evaluate_children(board, moves).tolist()
+    lmr = use_lmr and depth >= LMR_MIN_DEPTH and not in_check
+    killers = orderer.killers[ply] if ply < MAX_PLY else ()
     
-    for move in moves:
+    for i, move in enumerate(moves):
+        # Quiet late moves (no capture, promotion, killer or check) are reduced
+        reduce = (lmr and i >= LMR_MIN_MOVE and not move >> 12 and move not in killers
+                  and not is_capture(board, move))
         board.make_move(move)
-        score = -negamax(board, depth - 1, -beta, -alpha)
+        child_static = None if statics is None else statics[i]
+        if reduce and board.in_check():
+            reduce = False
+        new_depth = depth - 1 - (1 if reduce else 0)
+        if i and use_pvs:
+            score = -negamax(board, new_depth, -alpha - 1, -alpha, ply + 1, child_static)
+            if score > alpha and reduce:
+                stats.researches += 1
+                score = -negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1, child_static)
+            if alpha < score < beta:
+                stats.researches += 1
+                score = -negamax(board, depth - 1, -beta, -alpha, ply + 1, child_static)
+        else:
+            score = -negamax(board, new_depth, -beta, -alpha, ply + 1, child_static)
+            if score > alpha and reduce:
+                stats.researches += 1
+                score = -negamax(board, depth - 1, -beta, -alpha, ply + 1, child_static)
         board.unmake_move(move)
+        follow_pv = False
+        if timer.stopped:
+            return 0
         
         if score > best_score:
             best_score = score
+            best_move = move
             
-        alpha = max(alpha, score)
-        if alpha >= beta:
-            break
-            
+        if score > alpha:
+            alpha = score
+            if alpha >= beta:
+                stats.cutoff(i)
+                orderer.update(board, move, depth, ply)
+                break
+            pv_lines[ply] = (move,) + pv_lines[ply + 1]
+
+    if best_move is None:
+        # No legal moves: checkmate or stalemate
+        return -MATE_SCORE + ply if in_check else 0
+
+    if best_score >= beta:
+        bound = LOWER
+    elif best_score <= alpha_orig:
+        bound = UPPER
+    else:
+        bound = EXACT
+    tt.store(board.hash, depth, bound, score_to_tt(best_score, ply), best_move)
+    return best_score
+
+def quiescence(board, alpha, beta, ply=0, static=None):
+    # Captures and queen promotions only, until the position is quiet.
+    # Eval returns white's advantage; negate it when black is to move.
+    if timer.poll():
+        return 0
+    stats.nodes += 1
+    stats.qnodes += 1
+    if ply > stats.seldepth:
+        stats.seldepth = ply
+    stand_pat = evaluate(board) if static is None else static
+    if board.turn != WHITE:
+        stand_pat = -stand_pat
+    if stand_pat >= beta:
+        return stand_pat
+    if stand_pat > alpha:
+        alpha = stand_pat
+    best_score = stand_pat
+    if ply >= MAX_PLY:
+        return best_score
+
+    buf = buffers[ply]
+    moves = sorted(buf[:board.generate(buf, CAPTURES)], key=lambda m: mvv_lva(board, m), reverse=True)
+    for move in moves:
+        # Delta pruning: even winning the victim outright cannot reach alpha
+        if not move >> 12:
+            victim = board.mailbox[(move >> 6) & 63]
+            gain = PIECE_VALUE[victim] if victim else PIECE_VALUE[1]
+            if stand_pat + gain + DELTA_MARGIN < alpha:
+                continue
+        # Losing captures are not worth searching here
+        if see(board, move) < 0:
+            continue
+
+        board.make_move(move)
+        score = -quiescence(board, -beta, -alpha, ply + 1)
+        board.unmake_move(move)
+        if timer.stopped:
+            return 0
+
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
     return best_score
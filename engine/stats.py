@@ -0,0 +1,93 @@
+# Search statistics and results
+import time
+
+# Beta cutoffs are bucketed by the index of the move that caused them;
+# the last bucket collects everything from CUTOFF_BUCKETS - 1 on
+CUTOFF_BUCKETS = 8
+
+class SearchStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.nodes = 0        # all nodes, quiescence included
+        self.qnodes = 0       # quiescence nodes
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.tb_hits = 0      # endgame bitbase probes that returned a result
+        self.null_cutoffs = 0 # nodes pruned by a null-move search
+        self.researches = 0   # PVS, LMR and aspiration re-searches
+        self.beta_cutoffs = [0] * CUTOFF_BUCKETS
+        self.seldepth = 0
+        self.depth_times = [] # (depth, seconds since start, nodes) per completed iteration
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def nps(self):
+        elapsed = self.elapsed()
+        return int(self.nodes / elapsed) if elapsed > 0 else 0
+
+    def cutoff(self, index):
+        self.beta_cutoffs[min(index, CUTOFF_BUCKETS - 1)] += 1
+
+    def first_move_cutoff_rate(self):
+        # Share of beta cutoffs produced by the first move searched; a
+        # direct measure of move ordering quality
+        total = sum(self.beta_cutoffs)
+        return self.beta_cutoffs[0] / total if total else 0.0
+
+    def merge(self, other):
+        # Add counters from another stats object (e.g. a worker process)
+        self.nodes += other['nodes']
+        self.qnodes += other['qnodes']
+        self.tt_probes += other['tt_probes']
+        self.tt_hits += other['tt_hits']
+        self.tt_cutoffs += other['tt_cutoffs']
+        self.tb_hits += other['tb_hits']
+        self.null_cutoffs += other['null_cutoffs']
+        self.researches += other['researches']
+        for i, n in enumerate(other['beta_cutoffs']):
+            self.beta_cutoffs[i] += n
+        self.seldepth = max(self.seldepth, other['seldepth'])
+
+    def to_dict(self):
+        return {
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_cutoffs': self.tt_cutoffs,
+            'tb_hits': self.tb_hits,
+            'null_cutoffs': self.null_cutoffs,
+            'researches': self.researches,
+            'beta_cutoffs': list(self.beta_cutoffs),
+            'seldepth': self.seldepth,
+            'time': round(self.elapsed(), 4),
+            'nps': self.nps(),
+            'depth_times': [list(d) for d in self.depth_times],
+        }
+
+class SearchResult:
+    # Outcome of a search (or of one completed iteration, for info callbacks)
+    def __init__(self, best_move=None, score=0, depth=0, pv=None, stats=None, hashfull=0,
+                 lines=None):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.pv = pv or []
+        self.stats = stats or SearchStats()
+        self.hashfull = hashfull
+        # (score, pv) per root move, best first; more than one with MultiPV
+        self.lines = lines or [(score, self.pv)]
+
+    def to_dict(self):
+        return {
+            'best_move': self.best_move.to_uci() if self.best_move else None,
+            'score': self.score,
+            'depth': self.depth,
+            'pv': [m.to_uci() for m in self.pv],
+            'lines': [{'score': score, 'pv': [m.to_uci() for m in pv]}
+                      for score, pv in self.lines],
+            'hashfull': self.hashfull,
+            'stats': self.stats.to_dict(),
+        }
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.analysis_cache import AnalysisCache
+
+def test_lru_and_ttl():
+    now = [0.0]
+    cache = AnalysisCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    a, b, c = Board(), Board(), Board()
+    b.make_move(b.legal_moves_by_uci()['e2e4'])
+    c.make_move(c.legal_moves_by_uci()['d2d4'])
+    cache.put(a, 3, 2.0, {'best_move': 'e2e4'})
+    cache.put(b, 3, 2.0, {'best_move': 'e7e5'})
+    assert cache.get(a, 3, 2.0) == {'best_move': 'e2e4'}
+    # Other limits are other entries
+    assert cache.get(a, 4, 2.0) is None
+    cache.put(c, 3, 2.0, {'best_move': 'd7d5'})
+    assert cache.get(b, 3, 2.0) is None and len(cache) == 2
+    now[0] = 10
+    assert cache.get(a, 3, 2.0) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 3, 1)
+
+def test_persistent(tmp_path):
+    path = str(tmp_path / "analysis.db")
+    now = [100.0]
+    cache = AnalysisCache(path=path, ttl=60, clock=lambda: now[0])
+    cache.put(Board(), 3, 2.0, {'best_move': 'e2e4', 'pv': ['e2e4', 'e7e5']})
+    cache.close()
+
+    cache = AnalysisCache(path=path, ttl=60, clock=lambda: now[0])
+    assert cache.get(Board(), 3, 2.0)['pv'] == ['e2e4', 'e7e5']
+    assert cache.stats()['disk_hits'] == 1
+    now[0] = 200
+    assert cache.prune() == 1
+    cache.clear()
+    assert cache.get(Board(), 3, 2.0) is None
+    cache.close()
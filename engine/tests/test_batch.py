@@ -0,0 +1,67 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.pgn import read_games, parse_san
+from engine.batch import analyse_file, read_epd, read_pgn
+
+PGN = """[Event "Test"]
+[White "A"]
+[Black "B"]
+
+1. e4 {best by test} e5 2. Nf3 (2. f4 exf4) Nc6 3. Bb5 a6 $1 4. O-O Nf6
+5. Re1 1-0
+
+[Event "Promotion"]
+[FEN "8/P7/8/8/8/8/8/k1K5 w - - 0 1"]
+
+1. a8=Q+ Kb1? *
+"""
+
+def test_pgn():
+    games = list(read_games(PGN.splitlines()))
+    assert [tags['Event'] for tags, _ in games] == ["Test", "Promotion"]
+    assert games[0][1] == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "O-O", "Nf6", "Re1"]
+    positions = list(read_pgn(PGN.splitlines()))
+    assert len(positions) == 11 and positions[0]['fen'] == Board().fen()
+    # Castling, and disambiguation by file
+    board = Board(positions[6]['fen'])
+    assert parse_san(board, "O-O") == board.legal_moves_by_uci()["e1g1"]
+    board = Board("4k3/8/8/8/8/8/8/R3K2R w - - 0 1")
+    assert parse_san(board, "Rad1") == board.legal_moves_by_uci()["a1d1"]
+
+def test_epd():
+    jobs = list(read_epd(['6k1/5ppp/8/8/8/8/8/R5K1 w - - bm Ra8#; id "mate1"; acd 2;']))
+    assert jobs == [{'id': 'mate1', 'fen': '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'depth': 2, 'bm': ['Ra8#']}]
+
+def records(text):
+    # Result records without their timings
+    return [{k: v for k, v in json.loads(line).items() if k != 'time'} for line in text.splitlines()]
+
+def test_batch_resume(tmp_path):
+    epd = tmp_path / "suite.epd"
+    epd.write_text('6k1/5ppp/8/8/8/8/8/R5K1 w - - bm Ra8#; id "mate1";\n'
+                   'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - id "start";\n'
+                   'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - id "open";\n')
+    out = tmp_path / "out.jsonl"
+    assert analyse_file(str(epd), str(out), depth=2, workers=2) == 3
+    full = out.read_text()
+    rows = records(full)
+    assert [r['id'] for r in rows] == ["mate1", "start", "open"]
+    assert rows[0]['best_move'] == "a1a8" and rows[0]['solved']
+
+    # Unordered: same records, any order
+    other = tmp_path / "unordered.jsonl"
+    analyse_file(str(epd), str(other), depth=2, workers=2, ordered=False)
+    assert sorted(records(other.read_text()), key=lambda r: r['index']) == rows
+
+    # Interrupted after the first result, with a partly written line
+    first = full.splitlines(keepends=True)[0]
+    out.write_text(first + '{"index": 1, "trunc')
+    ckpt = str(out) + ".ckpt"
+    with open(ckpt, "w") as f:
+        json.dump({'input': str(epd), 'offset': len(first), 'next': 1, 'done': []}, f)
+    assert analyse_file(str(epd), str(out), depth=2, workers=2, resume=True) == 2
+    assert out.read_text().startswith(first) and records(out.read_text()) == rows
@@ -0,0 +1,52 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine import search as search_mod
+from engine.bitbase import Bitbases, generate, WIN, DRAW, LOSS
+
+pytest.importorskip("numpy")
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    # KPK promotes into KQK and KRK, so build those first
+    directory = str(tmp_path_factory.mktemp("bitbases"))
+    for name in ("KQK", "KRK", "KPK"):
+        generate(name, directory)
+    bases = Bitbases(directory)
+    yield bases
+    bases.close()
+
+def test_bitbase_probe(tables):
+    assert len(tables) == 3 and tables.max_men == 3
+    # Mate, stalemate, and a rook hanging to the king
+    assert tables.probe(Board("7k/5KQ1/8/8/8/8/8/8 b - - 0 1")) == LOSS
+    assert tables.probe(Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")) == DRAW
+    assert tables.probe(Board("8/8/8/8/8/8/2k5/K1R5 b - - 0 1")) == DRAW
+    assert tables.probe(Board("8/8/8/4k3/8/8/8/R3K3 w - - 0 1")) == WIN
+    # Opposition decides king and pawn: the same squares either way round
+    assert tables.probe(Board("8/8/8/4k3/8/4K3/4P3/8 w - - 0 1")) == DRAW
+    assert tables.probe(Board("8/8/8/4k3/8/4K3/4P3/8 b - - 0 1")) == LOSS
+    # Colours reversed, and the rook's pawn that cannot be won
+    assert tables.probe(Board("8/4p3/4k3/8/4K3/8/8/8 w - - 0 1")) == LOSS
+    assert tables.probe(Board("k7/8/1K6/P7/8/8/8/8 w - - 0 1")) == DRAW
+    # Not covered
+    assert tables.probe(Board("8/8/8/4k3/8/4K3/4PP2/8 w - - 0 1")) is None
+    assert tables.probe(Board("8/8/8/4k3/8/2N1K3/8/8 w - - 0 1")) == DRAW
+
+def test_bitbase_search(tables):
+    search_mod.clear_tt()
+    search_mod.bitbases = tables
+    try:
+        # Root in a table: only moves that keep the win are searched, and
+        # Kd2/Kf2 is the only way to keep the opposition
+        result = search_mod.analyse(Board("8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"), 4, time_limit=10)
+        assert result.best_move.to_uci() in ("e1d2", "e1f2")
+        # Root outside the tables: trading into a won KPK is scored from them
+        result = search_mod.analyse(Board("8/8/3k4/3r4/8/3RK3/4P3/8 w - - 0 1"), 2, time_limit=10)
+        assert result.best_move.to_uci() == "d3d5"
+        assert result.stats.tb_hits > 0
+    finally:
+        search_mod.bitbases = None
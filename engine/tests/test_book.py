@@ -0,0 +1,70 @@
+import sys
+import os
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.book import OpeningBook, polyglot_key, ENTRY
+
+def play(board, moves):
+    for m in moves.split():
+        board.make_move(board.legal_moves_by_uci()[m])
+    return board
+
+def raw_move(uci):
+    # Polyglot move bits: to | from << 6, squares counted from a1
+    sq = lambda s: "abcdefgh".index(s[0]) + 8 * (int(s[1]) - 1)
+    return sq(uci[2:4]) | (sq(uci[0:2]) << 6)
+
+def write_book(path, entries):
+    # entries: (board, uci, weight)
+    rows = sorted((polyglot_key(b), raw_move(uci), w) for b, uci, w in entries)
+    with open(path, "wb") as f:
+        for key, raw, weight in rows:
+            f.write(ENTRY.pack(key, raw, weight, 0))
+
+def test_polyglot_keys():
+    # Reference hashes from the Polyglot format description
+    b = Board()
+    assert polyglot_key(b) == 0x463b96181691fc9c
+    assert polyglot_key(play(b, "e2e4")) == 0x823c9b50fd114196
+    assert polyglot_key(play(b, "d7d5 e4e5 f7f5")) == 0x22a48b5a8e47ff78
+    assert polyglot_key(play(b, "e1e2 e8f7")) == 0x00fdd303c946bdd9
+    b = play(Board(), "a2a4 b7b5 h2h4 b5b4 c2c4")
+    assert polyglot_key(b) == 0x3c8123ea7b067637
+
+def test_book_probe(tmp_path):
+    path = str(tmp_path / "book.bin")
+    castle = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    filler = [(play(Board(), m), "g8f6", 1) for m in ("a2a3", "b2b3", "c2c3", "h2h3")]
+    write_book(path, filler + [
+        (Board(), "e2e4", 10), (Board(), "d2d4", 30), (Board(), "e2e5", 99),
+        (castle, "e1h1", 1),
+    ])
+    with OpeningBook(path) as book:
+        assert len(book) == 8
+        # The illegal e2e5 entry is skipped
+        assert sorted((m.to_uci(), w) for m, w, _ in book.entries(Board())) == [("d2d4", 30), ("e2e4", 10)]
+        assert book.choose(Board(), "best").to_uci() == "d2d4"
+        picks = {book.choose(Board(), rng=random.Random(i)).to_uci() for i in range(40)}
+        assert picks == {"d2d4", "e2e4"}
+        # King-takes-rook is our castling move
+        assert book.choose(castle).to_uci() == "e1g1"
+        assert book.choose(play(Board(), "g2g3")) is None
+    empty = str(tmp_path / "empty.bin")
+    open(empty, "wb").close()
+    with OpeningBook(empty) as book:
+        assert book.choose(Board()) is None
+
+def test_uci_own_book(tmp_path):
+    from engine.uci import UCIEngine
+    path = str(tmp_path / "book.bin")
+    write_book(path, [(Board(), "g1f3", 1)])
+    lines = []
+    engine = UCIEngine(out=lines.append)
+    engine.handle(f"setoption name BookFile value {path}")
+    engine.handle("setoption name OwnBook value true")
+    engine.handle("position startpos")
+    engine.handle("go wtime 1000 btime 1000")
+    assert lines == ["bestmove g1f3"]
+    assert not engine.searching()
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.eval import evaluate, evaluate_full
+
+def test_startpos_is_balanced():
+    assert evaluate(Board()) == 0
+
+def test_incremental_matches_full():
+    fens = [
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+    ]
+    for fen in fens:
+        b = Board(fen)
+        root = (b.mg, b.eg, b.phase)
+        for m in b.generate_moves():
+            b.make_move(m)
+            assert evaluate(b) == evaluate_full(b)
+            for m2 in b.generate_moves():
+                b.make_move(m2)
+                assert (b.mg, b.eg, b.phase) == b.compute_psqt()
+                b.unmake_move(m2)
+            b.unmake_move(m)
+        assert (b.mg, b.eg, b.phase) == root
+
+def test_endgame_king_centralisation():
+    # With only pawns left the endgame king table applies
+    center = Board("8/8/8/3k4/8/8/4P3/4K3 w - - 0 1")
+    corner = Board("k7/8/8/8/8/8/4P3/4K3 w - - 0 1")
+    assert evaluate(center) < evaluate(corner)
+
+def test_batch_matches_evaluate():
+    from engine.batch_eval import (evaluate_batch, evaluate_planes, evaluate_fens,
+                                   evaluate_children, pack_boards, pack_planes)
+    from engine.move import move_buffer
+    fens = [
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        "r3k2r/8/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1",
+    ]
+    boards = [Board(f) for f in fens]
+    expected = [evaluate(b) for b in boards]
+    assert evaluate_batch(pack_boards(boards)).tolist() == expected
+    assert evaluate_planes(pack_planes(boards)).tolist() == expected
+    assert evaluate_fens(fens).tolist() == expected
+    # Children of a node (castling, en passant, promotions) without make/unmake
+    buf = move_buffer()
+    for b in boards:
+        moves = buf[:b.generate(buf)]
+        children = []
+        for m in moves:
+            b.make_move(m)
+            children.append(evaluate(b))
+            b.unmake_move(m)
+        assert evaluate_children(b, moves).tolist() == children
+
+def test_batch_frontier_search_matches():
+    from engine import search as search_mod
+    from engine.timeman import TimeManager
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    results = []
+    for batch in (False, True):
+        search_mod.clear_tt()
+        search_mod.batch_frontier = batch
+        try:
+            r = search_mod.analyse(Board(fen), 3, time_manager=TimeManager())
+        finally:
+            search_mod.batch_frontier = False
+        results.append((r.best_move, r.score, r.stats.nodes))
+    assert results[0] == results[1]
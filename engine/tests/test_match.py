@@ -0,0 +1,37 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.match import (elo, elo_error, los, sprt_llr, sprt_bounds, adjudicate,
+                          EngineConfig, Limits, Match)
+
+def test_statistics():
+    assert elo(0.5) == 0 and elo(0.75) == pytest.approx(190.85, abs=0.01)
+    assert los(10, 10) == 0.5 and los(30, 10) > 0.99
+    assert elo_error(400, 200, 400) < elo_error(40, 20, 40)
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert lower == pytest.approx(-2.944, abs=1e-3) and upper == -lower
+    # Evidence for the better engine grows with games
+    assert 0 < sprt_llr(60, 40, 40, 0, 10) < sprt_llr(600, 400, 400, 0, 10)
+    assert sprt_llr(40, 40, 60, 0, 10) < 0
+
+def test_adjudicate():
+    assert adjudicate(Board("7k/5KQ1/8/8/8/8/8/8 b - - 0 1"), {}) == ("1-0", "checkmate")
+    assert adjudicate(Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), {}) == ("1/2-1/2", "stalemate")
+    assert adjudicate(Board("8/8/4k3/8/8/2NK4/8/8 w - - 0 1"), {})[1] == "insufficient material"
+    assert adjudicate(Board("8/8/4k3/8/8/2RK4/8/8 w - - 0 1"), {}) is None
+    board = Board()
+    assert adjudicate(board, {board.hash: 3})[1] == "threefold repetition"
+
+def test_match():
+    # Two configurations of this engine, two games with colours reversed
+    first, second = EngineConfig.parse(["name=a"]), EngineConfig.parse(["name=b", "option.Hash=8"])
+    match = Match(first, second, Limits(depth=1), games=2, concurrency=2)
+    summary = match.run()
+    assert summary['games'] == 2
+    assert summary['wins'] + summary['draws'] + summary['losses'] == 2
+    for name in ("a", "b"):
+        assert summary['engines'][name]['moves'] > 0
+        assert summary['engines'][name]['nps'] > 0
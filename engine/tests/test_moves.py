@@ -37,3 +37,118 @@ def test_fools_mate():
     b = Board("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 2")
     moves = b.generate_moves()
     assert len(moves) == 0
+
+def test_castling_generated_and_applied():
+    b = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    ucis = [m.to_uci() for m in b.generate_moves()]
+    assert "e1g1" in ucis and "e1c1" in ucis
+    m = next(m for m in b.generate_moves() if m.to_uci() == "e1g1")
+    b.make_move(m)
+    # Rook hops over to f1, white loses both rights
+    assert b.squares[61] == 4 and b.squares[63] == 0
+    assert not b.castling['K'] and not b.castling['Q']
+    b.unmake_move(m)
+    assert b.squares[60] == 6 and b.squares[63] == 4
+
+def test_bitboards_match_squares():
+    b = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    for m in b.generate_moves():
+        b.make_move(m)
+        for sq in range(64):
+            p = b.squares[sq]
+            if p:
+                assert b.pieces[p] >> sq & 1
+        assert sum(bb.bit_count() for bb in b.pieces) == sum(1 for p in b.squares if p)
+        b.unmake_move(m)
+
+def test_unmake_restores_en_passant_and_promotion():
+    fen = "4k3/1P6/8/3pP3/8/8/8/4K3 w - d6 0 2"
+    b = Board(fen)
+    before = (b.squares[:], b.pieces[:], b.occupancy[:], b.castling_rights, b.en_passant)
+    for m in b.generate_moves():
+        b.make_move(m)
+        b.unmake_move(m)
+        assert (b.squares[:], b.pieces[:], b.occupancy[:], b.castling_rights, b.en_passant) == before
+    ep = next(m for m in b.generate_moves() if m.to_uci() == "e5d6")
+    b.make_move(ep)
+    assert b.squares[27] == 0  # d5 pawn removed
+    assert len(b.history[-1]) == 8
+
+def test_zobrist_hash_incremental():
+    b = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    root = b.hash
+    for m in b.generate_moves():
+        b.make_move(m)
+        assert b.hash == b.compute_hash()
+        for m2 in b.generate_moves():
+            b.make_move(m2)
+            assert b.hash == b.compute_hash()
+            b.unmake_move(m2)
+        b.unmake_move(m)
+    assert b.hash == root
+    # Transpositions reach the same key
+    b1, b2 = Board(), Board()
+    for s in ["g1f3", "g8f6", "b1c3"]:
+        b1.make_move(next(m for m in b1.generate_moves() if m.to_uci() == s))
+    for s in ["b1c3", "g8f6", "g1f3"]:
+        b2.make_move(next(m for m in b2.generate_moves() if m.to_uci() == s))
+    assert b1.hash == b2.hash
+
+def test_pins_and_checks():
+    # The e-pawn may not capture en passant: it would expose the king
+    # along the 5th rank
+    b = Board("7k/8/8/K2pP2r/8/8/8/8 w - d6 0 1")
+    ucis = {m.to_uci() for m in b.generate_moves()}
+    assert "e5d6" not in ucis and "e5e6" in ucis
+    # Bishop on d2 is pinned by the rook on d8
+    b = Board("3rk3/8/8/8/8/8/3B4/3K4 w - - 0 1")
+    ucis = {m.to_uci() for m in b.generate_moves()}
+    assert not any(u.startswith("d2") for u in ucis)
+    # In check from a knight: only king moves or capturing the knight
+    b = Board("4k3/8/8/8/8/5n2/8/R3K3 w Q - 0 1")
+    assert b.in_check()
+    ucis = {m.to_uci() for m in b.generate_moves()}
+    assert "e1c1" not in ucis and "a1a8" not in ucis
+
+def test_king_square_tracking():
+    b = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    for m in b.generate_moves():
+        b.make_move(m)
+        assert b.king_sq == [b.pieces[6].bit_length() - 1, b.pieces[12].bit_length() - 1]
+        b.unmake_move(m)
+    assert b.king_sq == [60, 4]
+
+def test_move_codes():
+    import pickle
+    from engine.move import move_buffer
+    m = Move(12, 4, 'q')
+    assert (m.start, m.end, m.promotion) == (12, 4, 'q')
+    assert m.to_uci() == "e7e8q" and m < 1 << 16
+    assert Move.from_uci("e7e8q") == m and pickle.loads(pickle.dumps(m)) == m
+    # Castling and en passant codes carry no flags, so parsed moves match
+    b = Board("r3k2r/8/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1")
+    index = b.legal_moves_by_uci()
+    assert index["e1g1"] == Move.from_uci("e1g1")
+    assert index["e5d6"] == Move.from_uci("e5d6")
+    buf = move_buffer()
+    n = b.generate(buf)
+    assert sorted(buf[:n]) == sorted(index.values())
+
+def test_staged_generation_partitions_moves():
+    from engine.board import CAPTURES, QUIETS
+    from engine.move import move_buffer
+    buf = move_buffer()
+    for fen in ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "r3k2r/8/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1",
+                "1n2k3/P1P5/8/8/8/8/8/4K3 w - - 0 1",
+                "4k3/8/8/8/1b6/8/3P4/4K2R w K - 0 1"):
+        b = Board(fen)
+        every = sorted(buf[:b.generate(buf)])
+        captures = buf[:b.generate(buf, CAPTURES)]
+        quiets = buf[:b.generate(buf, QUIETS)]
+        assert sorted(captures + quiets) == every
+        # A single piece's moves are enough to validate a move
+        assert all(b.is_legal(m, buf) for m in every)
+    # Pinned pawn, empty square, opponent's piece
+    for uci in ("d2d3", "a3a4", "b4c3"):
+        assert not b.is_legal(Move.from_uci(uci), buf)
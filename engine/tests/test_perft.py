@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.perft import SUITE, perft, divide, run_suite
+
+def test_suite_shallow():
+    for name, fen, expected in SUITE:
+        b = Board(fen)
+        for depth in (1, 2):
+            assert perft(b, depth) == expected[depth], (name, depth)
+
+def test_divide_sums_to_perft():
+    b = Board(SUITE[1][1])
+    counts = divide(b, 2)
+    assert len(counts) == 48
+    assert sum(counts.values()) == 2039
+
+def test_run_suite_report():
+    small = [entry for entry in SUITE if entry[0].startswith("ep_")]
+    report = run_suite(3, suite=small)
+    assert report['ok']
+    assert [r['name'] for r in report['results']] == [e[0] for e in small]
+    assert all(r['nps'] > 0 for r in report['results'])
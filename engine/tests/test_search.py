@@ -0,0 +1,245 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.tt import TranspositionTable, EXACT, LOWER
+from engine import search as search_mod
+
+def test_tt_store_and_replace():
+    tt = TranspositionTable(1)
+    assert tt.size & (tt.size - 1) == 0
+    key = 0xABCDEF
+    tt.store(key, 3, EXACT, 42, None)
+    assert tt.probe(key)[1:4] == (3, EXACT, 42)
+    # A shallower result for another key in the same slot does not evict
+    other = key + tt.size
+    tt.store(other, 1, LOWER, 7, None)
+    assert tt.probe(other) is None
+    # ...unless the old entry is from a previous search
+    tt.new_search()
+    tt.store(other, 1, LOWER, 7, None)
+    assert tt.probe(other) is not None
+
+def test_search_fills_tt():
+    search_mod.clear_tt()
+    b = Board()
+    move = search_mod.search(b, 2, 10.0)
+    assert move is not None
+    entry = search_mod.tt.probe(b.hash)
+    assert entry is not None and entry[4] == move
+
+def test_move_ordering():
+    from engine.ordering import MoveOrderer
+    from engine.move import Move
+    # White can take the queen on d5 with the pawn or the rook
+    b = Board("4k3/8/8/3q4/4P3/8/8/3RK3 w - - 0 1")
+    orderer = MoveOrderer()
+    moves = b.generate_moves()
+    ordered = orderer.order(b, moves)
+    assert ordered[0].to_uci() == "e4d5" # pawn takes queen
+    assert ordered[1].to_uci() == "d1d5"
+    # Hash move beats captures, killers beat plain quiets
+    hash_move = Move.from_uci("e1f2")
+    killer = Move.from_uci("d1a1")
+    orderer.update(b, killer, 3, 2)
+    ordered = orderer.order(b, moves, hash_move, 2)
+    assert ordered[0] == hash_move
+    assert ordered[3] == killer
+    assert orderer.history[b.turn][killer.start][killer.end] == 9
+
+def test_see():
+    from engine.ordering import see
+    from engine.move import Move
+    # Rook takes a pawn defended by a pawn: loses the exchange
+    b = Board("4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1")
+    assert see(b, Move.from_uci("d1d5")) == 100 - 500
+    # Undefended pawn
+    b = Board("4k3/8/8/3p4/8/8/8/3RK3 w - - 0 1")
+    assert see(b, Move.from_uci("d1d5")) == 100
+    # Pawn takes knight defended by a bishop
+    b = Board("4k3/8/5b2/4n3/3P4/8/8/4K3 w - - 0 1")
+    assert see(b, Move.from_uci("d4e5")) == 320 - 100
+
+def test_generate_captures_subset():
+    b = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    caps = {m.to_uci() for m in b.generate_captures()}
+    all_caps = {m.to_uci() for m in b.generate_moves() if b.squares[m.end]}
+    assert caps == all_caps and len(caps) == 8
+
+def test_quiescence_sees_recapture():
+    # Static eval likes grabbing the pawn; quiescence sees the recapture
+    b = Board("4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1")
+    from engine.eval import evaluate
+    q = search_mod.quiescence(b, -search_mod.INF, search_mod.INF)
+    assert q == evaluate(b)
+
+def test_time_manager_limits():
+    from engine.timeman import TimeManager
+    tm = TimeManager.from_clock(0, wtime=60000, btime=1000, winc=1000, binc=0)
+    assert 0 < tm.soft < tm.hard < 30
+    tm = TimeManager.from_clock(1, wtime=60000, btime=1000)
+    assert tm.hard < 1.0
+    tm = TimeManager.from_clock(0, movetime=200)
+    assert tm.soft == tm.hard
+
+def test_search_aborts_mid_iteration():
+    import time
+    from engine.timeman import TimeManager
+    b = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    fen_before = (b.squares[:], b.hash)
+    start = time.perf_counter()
+    move = search_mod.search(b, 30, time_manager=TimeManager(hard=0.3, check_interval=64))
+    assert time.perf_counter() - start < 1.0
+    assert move in b.generate_moves()
+    assert (b.squares[:], b.hash) == fen_before
+
+def test_analyse_reports_stats_and_mate():
+    from engine.timeman import TimeManager
+    search_mod.clear_tt()
+    # Back-rank mate in one
+    b = Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    seen = []
+    result = search_mod.analyse(b, 3, time_manager=TimeManager(), info=seen.append)
+    assert result.best_move.to_uci() == "a1a8"
+    assert result.score == search_mod.MATE_SCORE - 1
+    assert result.pv[0] == result.best_move
+    assert [r.depth for r in seen] == [1, 2, 3]
+    stats = result.stats
+    assert stats.nodes > stats.qnodes > 0
+    assert stats.tt_probes >= stats.tt_hits >= stats.tt_cutoffs
+    assert sum(stats.beta_cutoffs) > 0
+    assert [d for d, _, _ in stats.depth_times] == [1, 2, 3]
+    assert result.to_dict()['pv'][0] == "a1a8"
+
+def test_selective_search_toggles(monkeypatch):
+    from engine.timeman import TimeManager
+    fen = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 1"
+    b = Board(fen)
+    b.make_null_move()
+    assert b.turn == 1 and b.hash == b.compute_hash()
+    b.unmake_null_move()
+    assert b.fen() == fen and b.hash == b.compute_hash()
+
+    def nodes():
+        search_mod.clear_tt()
+        return search_mod.analyse(Board(fen), 5, time_manager=TimeManager()).stats.nodes
+    selective = nodes()
+    for flag in ("use_pvs", "use_aspiration", "use_null_move", "use_lmr"):
+        monkeypatch.setattr(search_mod, flag, False)
+    assert nodes() > 2 * selective
+
+    # Pawn endings are zugzwang territory: no null moves there
+    monkeypatch.setattr(search_mod, "use_null_move", True)
+    search_mod.clear_tt()
+    result = search_mod.analyse(Board("8/5k2/8/3p4/3P4/8/5K2/8 w - - 0 1"), 6, time_manager=TimeManager())
+    assert result.stats.null_cutoffs == 0
+
+def test_pv_and_multipv():
+    from engine.timeman import TimeManager
+    fen = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 1"
+    search_mod.clear_tt()
+    result = search_mod.analyse(Board(fen), 4, time_manager=TimeManager())
+    assert len(result.pv) == 4 and result.pv[0] == result.best_move
+    assert search_mod.last_pv == [int(m) for m in result.pv]
+
+    search_mod.clear_tt()
+    result = search_mod.analyse(Board(fen), 4, time_manager=TimeManager(), multipv=3)
+    assert len(result.lines) == 3
+    scores = [score for score, _ in result.lines]
+    assert scores == sorted(scores, reverse=True) and scores[0] == result.score
+    assert result.lines[0][1] == result.pv
+    assert len({pv[0] for _, pv in result.lines}) == 3
+    # Fewer legal moves than lines asked for
+    result = search_mod.analyse(Board("7k/8/8/8/8/8/8/K6q w - - 0 1"), 2,
+                                time_manager=TimeManager(), multipv=5)
+    assert len(result.lines) == 2
+
+def test_analyse_without_legal_moves():
+    from engine.timeman import TimeManager
+    from engine.parallel import shutdown_pool
+    for board, score in ((Board("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1"), -search_mod.MATE_SCORE),
+                         (Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), 0)):
+        search_mod.clear_tt()
+        result = search_mod.analyse(board, 3, time_manager=TimeManager())
+        assert result.best_move is None and result.score == score
+    try:
+        result = search_mod.analyse(Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), 3,
+                                    time_manager=TimeManager(), workers=2)
+    finally:
+        shutdown_pool()
+    assert result.best_move is None and result.score == 0
+
+def test_parallel_search_matches_serial():
+    from engine.timeman import TimeManager
+    from engine.parallel import shutdown_pool
+    fen = "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"
+    search_mod.clear_tt()
+    serial = search_mod.search(Board(fen), 3, time_manager=TimeManager())
+    search_mod.clear_tt()
+    try:
+        parallel = search_mod.search(Board(fen), 3, time_manager=TimeManager(), workers=2)
+    finally:
+        shutdown_pool()
+    assert parallel == serial
+
+def test_parallel_pool_follows_resized_table():
+    from engine.timeman import TimeManager
+    from engine.parallel import get_pool, shutdown_pool
+    from engine.tt import DEFAULT_HASH_MB
+    fen = "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"
+    try:
+        search_mod.use_shared_tt()
+        pool = get_pool(2)
+        # Same segment name, new table: the workers must move with it
+        search_mod.set_hash_size(2)
+        assert get_pool(2) is not pool
+        search_mod.clear_tt()
+        b = Board(fen)
+        search_mod.analyse(b, 3, time_manager=TimeManager(), workers=2)
+        # Root moves searched by workers left depth-2 entries in our table
+        moves = b.generate_moves()
+        deep = 0
+        for m in moves:
+            b.make_move(m)
+            entry = search_mod.tt.probe(b.hash)
+            deep += entry is not None and entry[1] == 2
+            b.unmake_move(m)
+        assert deep > len(moves) // 2
+    finally:
+        shutdown_pool()
+        search_mod.use_local_tt(DEFAULT_HASH_MB)
+
+def _store_in_child(name):
+    from engine.tt import SharedTranspositionTable
+    from engine.move import Move
+    t = SharedTranspositionTable.attach(name)
+    t.store(0x1234_5678_9ABC_DEF0, 7, LOWER, -250, Move(52, 36))
+    t.close()
+
+def test_shared_tt_across_processes(tmp_path):
+    import multiprocessing
+    from engine.tt import SharedTranspositionTable, HEADER_WORDS
+    from engine.move import Move
+    t = SharedTranspositionTable(1)
+    try:
+        p = multiprocessing.get_context("spawn").Process(target=_store_in_child, args=(t.name,))
+        p.start()
+        p.join(30)
+        entry = t.probe(0x1234_5678_9ABC_DEF0)
+        assert entry is not None and entry[1:4] == (7, LOWER, -250)
+        assert Move(entry[4]).to_uci() == "e2e4"
+        # A torn write (key word from another entry) reads as a miss
+        i = HEADER_WORDS + 2 * (0x1234_5678_9ABC_DEF0 & t.mask)
+        t.words[i] ^= 1 << 40
+        assert t.probe(0x1234_5678_9ABC_DEF0) is None
+    finally:
+        t.close()
+    # File-backed tables persist between instances
+    path = str(tmp_path / "tt.bin")
+    f1 = SharedTranspositionTable(1, path=path)
+    f1.store(42, 3, EXACT, 10, None)
+    f1.close()
+    f2 = SharedTranspositionTable(1, path=path)
+    assert f2.probe(42)[1:4] == (3, EXACT, 10)
+    f2.close()
@@ -0,0 +1,117 @@
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.board import Board
+from engine.pool import EnginePool, Saturated, DeadlineExceeded
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+from ui import server
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EnginePool(workers=1, max_queue=0)
+    yield pool
+    pool.shutdown()
+
+@pytest.fixture
+def client(pool, monkeypatch):
+    monkeypatch.setattr(server, "engine_pool", pool)
+    monkeypatch.setattr(server, "games", server.GameStore())
+    monkeypatch.setattr(server, "analysis_cache", server.AnalysisCache())
+    monkeypatch.setattr(server, "MOVE_TIME", 0.5)
+    return server.app.test_client()
+
+def test_game_store_eviction():
+    now = [0.0]
+    store = server.GameStore(ttl=10, max_games=2, clock=lambda: now[0])
+    a = store.create()
+    now[0] = 5
+    b = store.create()
+    # Touching a makes b the least recently used
+    assert store.get(a.id) is a
+    store.create()
+    assert store.get(b.id) is None and len(store) == 2
+    now[0] = 20
+    assert store.get(a.id) is None
+    assert store.evicted == 3
+
+def test_pool_backpressure(pool):
+    board = Board()
+    busy = pool.submit(board, 30, 1.0, 5.0)
+    with pytest.raises(Saturated):
+        pool.submit(board, 1, 1.0, 5.0)
+    assert busy.result().best_move is not None
+    # Nothing can start once the deadline has passed
+    with pytest.raises(DeadlineExceeded):
+        pool.search(board, 1, 1.0, 0.0)
+    stats = pool.stats()
+    assert stats['rejected'] == 1 and stats['expired'] == 1 and stats['completed'] == 1
+
+def test_sessions(client):
+    a = client.post('/api/new_game').get_json()
+    b = client.post('/api/new_game').get_json()
+    assert a['game_id'] != b['game_id']
+
+    reply = client.post('/api/move', json={'game_id': a['game_id'], 'move': 'e2e4'}).get_json()
+    assert reply['engine_move'] and reply['analysis']['depth'] >= 1
+    assert client.get(f"/api/game/{a['game_id']}").get_json()['moves'] == ['e2e4', reply['engine_move']]
+    # The other game is untouched
+    assert client.get(f"/api/game/{b['game_id']}").get_json()['moves'] == []
+
+    # Same position in the other game: answered from the analysis cache
+    again = client.post('/api/move', json={'game_id': b['game_id'], 'move': 'e2e4'}).get_json()
+    assert again['engine_move'] == reply['engine_move'] and again['analysis']['cached']
+    assert client.get('/api/status').get_json()['cache']['hits'] == 1
+
+    assert client.post('/api/move', json={'game_id': b['game_id'], 'move': 'e2e5'}).status_code == 400
+    assert client.post('/api/move', json={'game_id': 'nope', 'move': 'e2e4'}).status_code == 404
+
+def test_busy_responses(client, pool):
+    game = client.post('/api/new_game').get_json()
+    store_game = server.games.get(game['game_id'])
+    store_game.thinking = True
+    response = client.post('/api/move', json={'game_id': game['game_id'], 'move': 'e2e4'})
+    assert response.status_code == 429 and response.headers['Retry-After']
+    store_game.thinking = False
+
+    # Pool full: 503 and the user move is not kept
+    busy = pool.submit(Board(), 30, 1.0, 5.0)
+    response = client.post('/api/move', json={'game_id': game['game_id'], 'move': 'e2e4'})
+    assert response.status_code == 503
+    assert client.get(f"/api/game/{game['game_id']}").get_json()['moves'] == []
+    busy.result()
+
+def events(response):
+    # (event, data) pairs of a Server-Sent Events body
+    out = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            out.append((lines['event'], json.loads(lines['data'])))
+    return out
+
+def test_analysis_stream(client):
+    response = client.get('/api/analyse?fen=6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1&depth=3')
+    assert response.mimetype == 'text/event-stream'
+    sent = events(response)
+    assert [e for e, _ in sent] == ['start', 'info', 'info', 'info', 'bestmove']
+    assert [d['depth'] for e, d in sent if e == 'info'] == [1, 2, 3]
+    assert sent[-1][1]['best_move'] == 'a1a8'
+    sent = events(client.get('/api/analyse?fen=6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1&depth=2&multipv=3'))
+    lines = sent[-1][1]['lines']
+    assert len(lines) == 3 and lines[0]['pv'][0] == 'a1a8'
+    assert client.get('/api/analyse?fen=bad').status_code == 400
+    assert client.post('/api/analyse/nope/stop').status_code == 404
+
+def test_stream_until_stopped(pool):
+    # Analysis mode: no time limit, runs until stopped
+    stream = pool.submit_stream(Board())
+    first = stream.events.get(timeout=10)
+    assert first['depth'] == 1
+    stream.stop()
+    result = stream.future.result(timeout=10)
+    assert result.best_move is not None and result.depth >= 1
@@ -0,0 +1,120 @@
+import sys
+import os
+import time
+import queue
+import subprocess
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from engine.uci import UCIEngine
+
+def make_engine():
+    lines = []
+    return UCIEngine(out=lines.append), lines
+
+def test_isready_and_stop_during_infinite_search():
+    engine, lines = make_engine()
+    engine.handle("position startpos moves e2e4")
+    engine.handle("go infinite")
+    time.sleep(0.2)
+    engine.handle("isready")
+    assert "readyok" in lines
+    assert engine.searching()
+    assert not any(l.startswith("bestmove") for l in lines)
+    start = time.perf_counter()
+    engine.handle("stop")
+    assert time.perf_counter() - start < 1.0
+    assert [l for l in lines if l.startswith("bestmove")]
+
+def test_ponderhit_switches_to_clock():
+    engine, lines = make_engine()
+    engine.handle("position startpos")
+    engine.handle("go ponder movetime 200")
+    time.sleep(0.3)
+    # Pondering ignores the clock until ponderhit
+    assert engine.searching()
+    engine.handle("ponderhit")
+    engine.worker.join(2.0)
+    assert not engine.searching()
+    assert [l for l in lines if l.startswith("bestmove")]
+
+def test_quit_stops_search():
+    engine, lines = make_engine()
+    engine.handle("go infinite")
+    assert engine.handle("quit") is False
+    assert not engine.searching()
+
+def test_info_lines():
+    engine, lines = make_engine()
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    engine.handle("go depth 3")
+    engine.worker.join(10)
+    info = [l for l in lines if l.startswith("info depth")]
+    assert len(info) == 3
+    fields = info[-1].split()
+    for key in ("seldepth", "nodes", "nps", "time", "hashfull"):
+        assert key in fields
+    assert fields[fields.index("score") + 1:fields.index("score") + 3] == ["mate", "1"]
+    assert fields[fields.index("pv") + 1] == "a1a8"
+    assert lines[-1] == "bestmove a1a8"
+
+def test_invalid_spin_values():
+    from engine import search as search_mod
+    engine, lines = make_engine()
+    size = search_mod.tt.size_mb
+    engine.handle("setoption name Threads value 2")
+    for option in ("Hash", "Threads", "MultiPV"):
+        assert engine.handle(f"setoption name {option} value abc")
+        assert lines[-1] == f"info string invalid value for {option}: abc"
+    assert search_mod.tt.size_mb == size and engine.threads == 2 and engine.multipv == 1
+    engine.handle("isready")
+    assert lines[-1] == "readyok"
+
+def test_batch_eval_without_numpy(monkeypatch):
+    from engine import search as search_mod
+    monkeypatch.setattr(search_mod, "evaluate_children", None)
+    engine, lines = make_engine()
+    engine.handle("setoption name BatchEval value true")
+    assert lines[-1] == "info string cannot enable BatchEval: batch evaluation needs numpy"
+    assert not search_mod.batch_frontier
+
+def test_no_legal_moves():
+    engine, lines = make_engine()
+    engine.handle("position fen 7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+    engine.handle("go depth 3")
+    engine.worker.join(10)
+    assert lines[-1] == "bestmove 0000"
+
+def test_multipv_info_lines():
+    engine, lines = make_engine()
+    engine.handle("setoption name MultiPV value 2")
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    engine.handle("go depth 2")
+    engine.worker.join(10)
+    info = [l.split() for l in lines if l.startswith("info depth 2")]
+    assert [f[f.index("multipv") + 1] for f in info] == ["1", "2"]
+    assert info[0][info[0].index("pv") + 1] == "a1a8"
+    assert lines[-1] == "bestmove a1a8"
+
+def test_threads_over_stdin():
+    # A real engine process: the main thread blocks reading stdin while
+    # the search starts its worker pool
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+    proc = subprocess.Popen([sys.executable, "-m", "engine.uci"], cwd=root, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    lines = queue.Queue()
+    threading.Thread(target=lambda: [lines.put(l.strip()) for l in proc.stdout], daemon=True).start()
+    try:
+        for command in ("uci", "setoption name Threads value 2", "position startpos",
+                        "go movetime 1000"):
+            proc.stdin.write(command + "\n")
+        proc.stdin.flush()
+        deadline = time.monotonic() + 30
+        line = ""
+        while not line.startswith("bestmove"):
+            line = lines.get(timeout=max(0.1, deadline - time.monotonic()))
+        proc.stdin.write("quit\n")
+        proc.stdin.flush()
+        assert proc.wait(10) == 0
+    finally:
+        proc.kill()
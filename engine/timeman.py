@@ -0,0 +1,83 @@
+# Time management: soft/hard limits and in-search clock polling
+import time
+
+# Nodes between clock reads inside the search
+CHECK_INTERVAL = 1024
+# Safety margin (seconds) for GUI / process latency
+MOVE_OVERHEAD = 0.05
+# Assumed moves left in the game when the GUI does not send movestogo
+DEFAULT_MOVES_TO_GO = 30
+
+class TimeManager:
+    # soft: don't start another iteration after this many seconds
+    # hard: abort the running iteration after this many seconds
+    # Either may be None (no limit).
+    # stop_event: optional threading/multiprocessing Event that aborts the
+    # search when set (used to stop worker processes)
+    def __init__(self, soft=None, hard=None, check_interval=CHECK_INTERVAL, stop_event=None):
+        self.start = time.perf_counter()
+        self.soft = soft
+        self.hard = hard
+        self.check_interval = check_interval
+        self.countdown = check_interval
+        self.stop_event = stop_event
+        self.stopped = False
+
+    @classmethod
+    def from_clock(cls, side, wtime=None, btime=None, winc=0, binc=0,
+                   movestogo=None, movetime=None):
+        # Build limits from UCI 'go' parameters (all times in milliseconds)
+        if movetime is not None:
+            limit = max(movetime / 1000.0 - MOVE_OVERHEAD, 0.01)
+            return cls(soft=limit, hard=limit)
+        time_left = wtime if side == 0 else btime
+        if time_left is None:
+            return cls()
+        inc = (winc if side == 0 else binc) or 0
+        time_left /= 1000.0
+        inc /= 1000.0
+        available = max(time_left - MOVE_OVERHEAD, 0.01)
+        moves_to_go = min(movestogo, 50) if movestogo else DEFAULT_MOVES_TO_GO
+        optimum = available / moves_to_go + inc * 0.75
+        # Never plan to use more than the clock can afford; the hard limit
+        # lets a promising iteration run past the optimum
+        hard = min(optimum * 4, available * 0.5 if moves_to_go > 1 else available * 0.9)
+        soft = min(optimum * 0.6, hard)
+        return cls(soft=soft, hard=hard)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def poll(self):
+        # Called once per node; reads the clock every check_interval calls
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.countdown = self.check_interval
+            self.expired()
+        return self.stopped
+
+    def expired(self):
+        # Check the clock (and stop event) right now
+        if self.hard is not None and self.elapsed() >= self.hard:
+            self.stopped = True
+        elif self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+        return self.stopped
+
+    def remaining(self):
+        # Seconds left before the hard limit, or None when unlimited
+        if self.hard is None:
+            return None
+        return max(self.hard - self.elapsed(), 0.0)
+
+    def soft_expired(self):
+        return self.soft is not None and self.elapsed() >= self.soft
+
+    def set_limits(self, soft, hard):
+        # Restart the clock with new limits (ponderhit)
+        self.start = time.perf_counter()
+        self.soft = soft
+        self.hard = hard
+
+    def stop(self):
+        self.stopped = True
@@ -0,0 +1,198 @@
+# Fixed-size transposition table
+#
+# Entries are tuples (key, depth, bound, score, move, generation) stored in a
+# preallocated list indexed by the low bits of the Zobrist key. Moves are
+# int codes (see move.py) or None.
+import mmap
+import os
+from multiprocessing import shared_memory, resource_tracker
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+DEFAULT_HASH_MB = 16
+# Slots sampled for the UCI hashfull estimate
+HASHFULL_SAMPLE = 1000
+# Rough per-entry footprint of a tuple slot in CPython, used to turn a size
+# in MB into a slot count
+ENTRY_BYTES = 128
+
+class TranspositionTable:
+    def __init__(self, size_mb=DEFAULT_HASH_MB):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        # Round down to a power of two so the index is a mask
+        slots = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.size_mb = size_mb
+        self.clear()
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        # Entries from older searches become preferred replacement victims
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        entry = self.table[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        idx = key & self.mask
+        old = self.table[idx]
+        # Replacement: empty slot, same position, stale generation or
+        # at least as deep a search. Keep the old best move if the new
+        # search did not produce one.
+        if old is not None:
+            if old[0] == key:
+                if move is None:
+                    move = old[4]
+            elif old[5] == self.generation and old[1] > depth:
+                return
+        self.table[idx] = (key, depth, bound, score, move, self.generation)
+
+    def hashfull(self):
+        # Permille of sampled slots written by the current search
+        n = min(HASHFULL_SAMPLE, self.size)
+        used = sum(1 for e in self.table[:n] if e is not None and e[5] == self.generation)
+        return used * 1000 // n
+
+
+# Shared-memory transposition table
+#
+# The table lives in a flat buffer (multiprocessing.shared_memory or an
+# mmap'd file) so several engine processes on one host can read each
+# other's results. Each entry is two 64-bit words:
+#
+#   word 0: key ^ data
+#   word 1: data = move (15 bits) | score (32) | depth (8) | bound (2) | generation (7)
+#
+# Writes are not locked. A torn write (one word from each of two writers)
+# fails the key ^ data check on probe and simply reads as a miss.
+
+SHARED_ENTRY_BYTES = 16
+HEADER_WORDS = 2
+TT_MAGIC = 0x43484553_53545431  # "CHESSTT1"
+
+SCORE_OFFSET = 1 << 31
+MASK64 = (1 << 64) - 1
+
+def encode_move(move):
+    # Move codes fit in 15 bits; code 0 means "no move"
+    return 0 if move is None else int(move)
+
+def decode_move(code):
+    return code or None
+
+class SharedTranspositionTable:
+    # Same interface as TranspositionTable. Pass `name` to create or attach
+    # to a named shared memory block, or `path` for a file-backed table.
+    def __init__(self, size_mb=DEFAULT_HASH_MB, name=None, path=None):
+        self.size_mb = size_mb
+        self.generation = 0
+        self.path = path
+        self.owner = False
+        self.closed = False
+        self._shm = None
+        self._mmap = None
+        slots = max(1, int(size_mb * 1024 * 1024) // SHARED_ENTRY_BYTES)
+        size = 1 << (slots.bit_length() - 1)
+        nbytes = (HEADER_WORDS + 2 * size) * 8
+
+        if path is not None:
+            fresh = not os.path.exists(path) or os.path.getsize(path) < nbytes
+            with open(path, "a+b") as f:
+                if fresh:
+                    f.truncate(nbytes)
+                self._mmap = mmap.mmap(f.fileno(), 0)
+            buf = self._mmap
+            self.name = path
+        else:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=nbytes)
+                self.owner = True
+                fresh = True
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=name)
+                # Python < 3.13 would unlink segments it merely attached to
+                # at exit; the creator owns cleanup
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+                fresh = False
+            buf = self._shm.buf
+            self.name = self._shm.name
+
+        self.raw = memoryview(buf)
+        self.words = self.raw.cast('Q')
+        if fresh or self.words[0] != TT_MAGIC:
+            self.words[0] = TT_MAGIC
+            self.words[1] = size
+            self.clear()
+        # An existing table keeps the size it was created with
+        self.size = self.words[1]
+        self.mask = self.size - 1
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    def clear(self):
+        start = HEADER_WORDS * 8
+        self.raw[start:] = bytes(len(self.raw) - start)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0x7F
+
+    def probe(self, key):
+        i = HEADER_WORDS + 2 * (key & self.mask)
+        words = self.words
+        data = words[i + 1]
+        if data == 0 or words[i] ^ data != key:
+            return None
+        return (key, (data >> 47) & 0xFF, (data >> 55) & 3,
+                ((data >> 15) & 0xFFFFFFFF) - SCORE_OFFSET,
+                decode_move(data & 0x7FFF), data >> 57)
+
+    def store(self, key, depth, bound, score, move):
+        i = HEADER_WORDS + 2 * (key & self.mask)
+        words = self.words
+        old_data = words[i + 1]
+        if old_data:
+            if words[i] ^ old_data == key:
+                if move is None:
+                    move = decode_move(old_data & 0x7FFF)
+            elif old_data >> 57 == self.generation and (old_data >> 47) & 0xFF > depth:
+                return
+        data = (encode_move(move) | ((score + SCORE_OFFSET) << 15) |
+                (min(max(depth, 0), 0xFF) << 47) | (bound << 55) | (self.generation << 57))
+        words[i] = (key ^ data) & MASK64
+        words[i + 1] = data
+
+    def hashfull(self):
+        n = min(HASHFULL_SAMPLE, self.size)
+        words = self.words
+        used = 0
+        for i in range(HEADER_WORDS + 1, HEADER_WORDS + 2 * n, 2):
+            data = words[i]
+            if data and data >> 57 == self.generation:
+                used += 1
+        return used * 1000 // n
+
+    def close(self, unlink=None):
+        # The creating process unlinks the shared memory block by default
+        if self.closed:
+            return
+        self.closed = True
+        self.words.release()
+        self.raw.release()
+        if self._shm is not None:
+            self._shm.close()
+            if self.owner if unlink is None else unlink:
+                self._shm.unlink()
+        if self._mmap is not None:
+            self._mmap.close()
@@ -1,87 +1,353 @@
 import sys
+import threading
 from .board import Board
 from .move import Move
-from .search import search
+from . import search as search_mod
+from .search import analyse, clear_tt, set_hash_size, use_shared_tt, use_local_tt, use_bitbases, MATE_SCORE, MATE_BOUND
+from .tt import DEFAULT_HASH_MB
+from .perft import divide
+from .book import OpeningBook
+from .timeman import TimeManager
 
-def uci_loop():
-    board = Board()
-    
-    while True:
-        try:
-            line = sys.stdin.readline()
-            if not line: break
-            line = line.strip()
-        except EOFError:
-            break
-            
+# Depth cap when searching on the clock, and the time budget (seconds)
+# for a bare 'go'
+MAX_DEPTH = 64
+DEFAULT_TIME = 5.0
+MAX_THREADS = 64
+MAX_MULTIPV = 64
+
+# Check options for the selective search techniques -> search module flag
+SEARCH_OPTIONS = {
+    "PVS": "use_pvs",
+    "AspirationWindows": "use_aspiration",
+    "NullMove": "use_null_move",
+    "LMR": "use_lmr",
+}
+SEARCH_OPTIONS_LOWER = {name.lower(): flag for name, flag in SEARCH_OPTIONS.items()}
+
+def format_score(score):
+    # 'cp X', or 'mate N' in moves (negative when being mated)
+    if score > MATE_BOUND:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score < -MATE_BOUND:
+        return f"mate {-((MATE_SCORE + score) // 2)}"
+    return f"cp {score}"
+
+def format_info(result, index=0):
+    # 'info' line for a completed iteration; index picks one of the
+    # MultiPV lines, which are numbered in the output
+    stats = result.stats
+    score, pv = result.lines[index]
+    line = f"info depth {result.depth} seldepth {max(stats.seldepth, result.depth)} "
+    if len(result.lines) > 1:
+        line += f"multipv {index + 1} "
+    line += (f"score {format_score(score)} nodes {stats.nodes} nps {stats.nps()} "
+             f"time {int(stats.elapsed() * 1000)} hashfull {result.hashfull}")
+    if stats.tb_hits:
+        line += f" tbhits {stats.tb_hits}"
+    if pv:
+        line += " pv " + " ".join(m.to_uci() for m in pv)
+    return line
+
+class UCIEngine:
+    # Command handler. Searches run on a worker thread so that isready,
+    # stop, ponderhit and quit are answered while the engine is thinking.
+    def __init__(self, out=None):
+        self.board = Board()
+        self.out = out or self._print
+        self.out_lock = threading.Lock()
+        self.worker = None
+        self.timer = None
+        # Set when a 'go infinite' / 'go ponder' search may report bestmove
+        self.release = threading.Event()
+        self.ponder_timer = None
+        self.threads = 1
+        self.multipv = 1
+        # Polyglot book (OwnBook / BookFile / BookMode options)
+        self.book = None
+        self.own_book = False
+        self.book_mode = "weighted"
+
+    @staticmethod
+    def _print(line):
+        print(line)
+        sys.stdout.flush()
+
+    def send(self, line):
+        with self.out_lock:
+            self.out(line)
+
+    def searching(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def stop_search(self):
+        # Abort the running search and wait for its bestmove
+        if self.searching():
+            self.release.set()
+            self.timer.stop()
+            self.worker.join()
+        self.worker = None
+
+    def handle(self, line):
+        # Returns False when the engine should exit
         parts = line.split()
-        if not parts: continue
-        
+        if not parts:
+            return True
+
         cmd = parts[0]
-        
+
         if cmd == "uci":
-            print("id name SimpleChessEngine")
-            print("id author Antigravity")
-            print("uciok")
-            sys.stdout.flush()
+            self.send("id name SimpleChessEngine")
+            self.send("id author Antigravity")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 1024")
+            self.send("option name Ponder type check default false")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send(f"option name MultiPV type spin default 1 min 1 max {MAX_MULTIPV}")
+            self.send("option name SharedHash type string default <empty>")
+            self.send("option name BatchEval type check default false")
+            self.send("option name OwnBook type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name BookMode type combo default weighted var weighted var best")
+            self.send("option name BitbasePath type string default <empty>")
+            for option in SEARCH_OPTIONS:
+                self.send(f"option name {option} type check default true")
+            self.send("uciok")
         elif cmd == "isready":
-            print("readyok")
-            sys.stdout.flush()
+            self.send("readyok")
+        elif cmd == "stop":
+            self.stop_search()
+        elif cmd == "ponderhit":
+            # The opponent played the expected move: keep searching, now on
+            # our own clock
+            if self.searching() and self.ponder_timer is not None:
+                self.timer.set_limits(self.ponder_timer.soft, self.ponder_timer.hard)
+                self.ponder_timer = None
+                self.release.set()
+        elif cmd == "quit":
+            self.stop_search()
+            return False
+        elif cmd == "setoption":
+            self.stop_search()
+            # setoption name <id> [value <x>]
+            if "name" in parts:
+                if "value" in parts:
+                    name = " ".join(parts[parts.index("name") + 1:parts.index("value")])
+                    value = " ".join(parts[parts.index("value") + 1:])
+                else:
+                    name = " ".join(parts[parts.index("name") + 1:])
+                    value = None
+                if name.lower() == "hash" and value is not None:
+                    size = self._spin(name, value, 1, 1024)
+                    if size is not None:
+                        set_hash_size(size)
+                elif name.lower() == "threads" and value is not None:
+                    # Search processes; 1 searches in the engine process
+                    self.threads = self._spin(name, value, 1, MAX_THREADS, self.threads)
+                elif name.lower() == "multipv" and value is not None:
+                    # Best root moves reported per iteration, each with its line
+                    self.multipv = self._spin(name, value, 1, MAX_MULTIPV, self.multipv)
+                elif name.lower() == "batcheval" and value is not None:
+                    # Vectorized evaluation of frontier leaves (numpy)
+                    try:
+                        search_mod.use_batch_frontier(value.lower() == "true")
+                    except ValueError as e:
+                        self.send(f"info string cannot enable BatchEval: {e}")
+                elif name.lower() in SEARCH_OPTIONS_LOWER and value is not None:
+                    # Selective search techniques, switchable to measure them
+                    setattr(search_mod, SEARCH_OPTIONS_LOWER[name.lower()], value.lower() == "true")
+                elif name.lower() == "ownbook" and value is not None:
+                    self.own_book = value.lower() == "true"
+                elif name.lower() == "bookfile":
+                    self.set_book(value)
+                elif name.lower() == "bookmode" and value in ("weighted", "best"):
+                    self.book_mode = value
+                elif name.lower() == "bitbasepath":
+                    self.set_bitbases(value)
+                elif name.lower() == "sharedhash":
+                    # Name of a shared-memory table to create or join, so
+                    # engine processes on one host share search results
+                    if value and value != "<empty>":
+                        use_shared_tt(name=value)
+                    else:
+                        use_local_tt()
+        elif cmd == "ucinewgame":
+            self.stop_search()
+            clear_tt()
         elif cmd == "position":
-            # position startpos moves e2e4 ...
-            # position fen ... moves ...
-            idx = 1
-            if parts[idx] == "startpos":
-                board = Board()
-                idx += 1
-            elif parts[idx] == "fen":
-                # Find 'moves' to know where fen ends
-                if "moves" in parts:
-                    moves_idx = parts.index("moves")
-                    fen_parts = parts[idx+1:moves_idx]
-                    idx = moves_idx
+            self.stop_search()
+            self.set_position(parts)
+        elif cmd == "go" and "perft" in parts:
+            self.stop_search()
+            # go perft N: per-move counts followed by the total
+            depth = int(parts[parts.index("perft") + 1])
+            counts = divide(self.board, depth)
+            for uci, n in counts.items():
+                self.send(f"{uci}: {n}")
+            self.send(f"\nNodes searched: {sum(counts.values())}")
+        elif cmd == "go":
+            self.stop_search()
+            self.go(parts)
+        return True
+
+    def set_position(self, parts):
+        # position startpos moves e2e4 ...
+        # position fen ... moves ...
+        board = self.board
+        idx = 1
+        if parts[idx] == "startpos":
+            board = Board()
+            idx += 1
+        elif parts[idx] == "fen":
+            # Find 'moves' to know where fen ends
+            if "moves" in parts:
+                moves_idx = parts.index("moves")
+                fen_parts = parts[idx+1:moves_idx]
+                idx = moves_idx
+            else:
+                fen_parts = parts[idx+1:]
+                idx = len(parts)
+
+            fen = " ".join(fen_parts)
+            board = Board(fen)
+
+        if idx < len(parts) and parts[idx] == "moves":
+            for m_str in parts[idx+1:]:
+                move = board.legal_moves_by_uci().get(m_str)
+                if move is not None:
+                    board.make_move(move)
                 else:
-                    fen_parts = parts[idx+1:]
-                    idx = len(parts)
-                
-                fen = " ".join(fen_parts)
-                board = Board(fen)
-            
-            if idx < len(parts) and parts[idx] == "moves":
-                for m_str in parts[idx+1:]:
-                    legal_moves = board.generate_moves()
-                    found = False
-                    for lm in legal_moves:
-                        if lm.to_uci() == m_str:
-                            board.make_move(lm)
-                            found = True
-                            break
-                    if not found:
-                        # Fallback: create move from UCI and trust it (risky but keeps it moving)
-                        # This happens if our generator misses something or promotion syntax differs
-                        m = Move.from_uci(m_str)
-                        board.make_move(m)
+                    # Fallback: create move from UCI and trust it (risky but keeps it moving)
+                    # This happens if our generator misses something or promotion syntax differs
+                    m = Move.from_uci(m_str)
+                    board.make_move(m)
+        self.board = board
 
-        elif cmd == "go":
+    def set_book(self, path):
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if path and path != "<empty>":
+            try:
+                self.book = OpeningBook(path)
+            except OSError as e:
+                self.send(f"info string cannot open book {path}: {e.strerror}")
+
+    def _spin(self, name, value, low, high, current=None):
+        # Integer option value clamped to [low, high]; current if it is
+        # not a number
+        try:
+            return max(low, min(high, int(value)))
+        except ValueError:
+            self.send(f"info string invalid value for {name}: {value}")
+            return current
+
+    def set_bitbases(self, directory):
+        # Directory of .bb files built by engine.bitbase
+        if not directory or directory == "<empty>":
+            use_bitbases(None)
+            return
+        try:
+            tables = use_bitbases(directory)
+        except (OSError, ValueError) as e:
+            self.send(f"info string cannot load bitbases from {directory}: {e}")
+            return
+        self.send(f"info string {len(tables)} bitbases loaded from {directory}")
+
+    def go(self, parts):
+        params = {}
+        for key in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo"):
+            if key in parts:
+                params[key] = int(parts[parts.index(key) + 1])
+        infinite = "infinite" in parts
+        ponder = "ponder" in parts
+
+        clock = {k: v for k, v in params.items() if k != "depth"}
+        if infinite:
+            timer = TimeManager()
+            depth = params.get("depth", MAX_DEPTH)
+        elif clock:
+            # Clock-driven: search as deep as the time manager allows
+            timer = TimeManager.from_clock(self.board.turn, **clock)
+            depth = params.get("depth", MAX_DEPTH)
+        elif "depth" in params:
+            timer = TimeManager()
+            depth = params["depth"]
+        else:
+            timer = TimeManager(soft=DEFAULT_TIME, hard=DEFAULT_TIME)
             depth = 3
-            if "depth" in parts:
-                depth = int(parts[parts.index("depth") + 1])
-            
-            # Simple time management
-            time_limit = 5.0
-            if "movetime" in parts:
-                time_limit = int(parts[parts.index("movetime") + 1]) / 1000.0
-            
-            best_move = search(board, depth, time_limit)
-            if best_move:
-                print(f"bestmove {best_move.to_uci()}")
-            else:
-                # Should not happen unless mate/stalemate
-                print("bestmove 0000")
-            sys.stdout.flush()
-            
-        elif cmd == "quit":
+
+        if self.own_book and self.book is not None and not (infinite or ponder):
+            # Book moves are played without searching
+            move = self.book.choose(self.board, self.book_mode)
+            if move is not None:
+                self.send(f"bestmove {move.to_uci()}")
+                return
+
+        self.ponder_timer = None
+        if ponder:
+            # Think without limits until ponderhit hands us the clock
+            self.ponder_timer = timer
+            timer = TimeManager()
+            depth = params.get("depth", MAX_DEPTH)
+
+        self.timer = timer
+        if infinite or ponder:
+            self.release.clear()
+        else:
+            self.release.set()
+        # Search a private copy so the position can't change under the worker
+        board = self.board.copy()
+        self.worker = threading.Thread(target=self._search, args=(board, depth, timer), daemon=True)
+        self.worker.start()
+
+    def _search(self, board, depth, timer):
+        result = analyse(board, depth, time_manager=timer, workers=self.threads,
+                         info=self._info, multipv=self.multipv)
+        best_move = result.best_move
+        # In infinite / ponder mode bestmove may only be sent after
+        # stop or ponderhit
+        self.release.wait()
+        if best_move:
+            line = f"bestmove {best_move.to_uci()}"
+            ponder_move = self._ponder_move(board, best_move)
+            if ponder_move:
+                line += f" ponder {ponder_move.to_uci()}"
+            self.send(line)
+        else:
+            # Should not happen unless mate/stalemate
+            self.send("bestmove 0000")
+
+    def _info(self, result):
+        for index in range(len(result.lines)):
+            self.send(format_info(result, index))
+
+    @staticmethod
+    def _ponder_move(board, best_move):
+        # Expected reply: the TT move of the position after best_move
+        board.make_move(best_move)
+        entry = search_mod.tt.probe(board.hash)
+        reply = None
+        if entry is not None and entry[4] is not None and entry[4] in board.generate_moves():
+            reply = Move(entry[4])
+        board.unmake_move(best_move)
+        return reply
+
+def uci_loop():
+    engine = UCIEngine()
+
+    while True:
+        try:
+            line = sys.stdin.readline()
+            if not line: break
+            line = line.strip()
+        except EOFError:
+            break
+        if not engine.handle(line):
             break
+    # End of input: let a normal search finish, abort an infinite one
+    if engine.searching() and engine.release.is_set():
+        engine.worker.join()
+    engine.stop_search()
 
 if __name__ == "__main__":
     uci_loop()
@@ -0,0 +1,15 @@
+# Zobrist keys for position hashing
+import random
+
+_rng = random.Random(0x5EED)
+
+def _key():
+    return _rng.getrandbits(64)
+
+# PIECE_KEYS[piece][square]; row 0 (EMPTY) is all zeros so it can be XORed freely
+PIECE_KEYS = [[0] * 64] + [[_key() for _ in range(64)] for _ in range(12)]
+# One key per castling-rights bitmask (0-15)
+CASTLE_KEYS = [_key() for _ in range(16)]
+# En passant keys by file
+EP_KEYS = [_key() for _ in range(8)]
+SIDE_KEY = _key()
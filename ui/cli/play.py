@@ -6,10 +6,14 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 
 from engine.board import Board, WHITE
 from engine.search import search
+from engine.uci import format_info
 from engine.move import Move
+from engine.book import OpeningBook
 
 def main():
     board = Board()
+    # Optional Polyglot book: python ui/cli/play.py path/to/book.bin
+    book = OpeningBook(sys.argv[1]) if len(sys.argv) > 1 else None
     
     while True:
         print("\n" + "="*20)
@@ -21,19 +25,17 @@ def main():
             if move_str == "quit": break
             
             # Validate
-            legal_moves = board.generate_moves()
-            found = False
-            for m in legal_moves:
-                if m.to_uci() == move_str:
-                    board.make_move(m)
-                    found = True
-                    break
-            if not found:
-                print(f"Illegal move! Available: {[m.to_uci() for m in legal_moves[:5]]}...")
+            legal_moves = board.legal_moves_by_uci()
+            move = legal_moves.get(move_str)
+            if move is None:
+                print(f"Illegal move! Available: {list(legal_moves)[:5]}...")
                 continue
+            board.make_move(move)
         else:
-            print("Engine thinking...")
-            best_move = search(board, 3)
+            best_move = book.choose(board) if book is not None else None
+            if best_move is None:
+                print("Engine thinking...")
+                best_move = search(board, 3, info=lambda r: print(format_info(r)))
             if best_move:
                 print(f"Engine played: {best_move.to_uci()}")
                 board.make_move(best_move)
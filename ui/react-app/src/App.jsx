@@ -8,6 +8,7 @@ function App() {
   const [moveHistory, setMoveHistory] = useState([]);
   const [thinking, setThinking] = useState(false);
   const [gameOver, setGameOver] = useState(false);
+  const [gameId, setGameId] = useState(null);
 
   const API_URL = "http://localhost:5000/api";
 
@@ -21,6 +22,7 @@ function App() {
     try {
       const res = await fetch(`${API_URL}/new_game`, { method: 'POST' });
       const data = await res.json();
+      setGameId(data.game_id);
       setFen(data.fen);
       setGameStatus("playing");
       setStatusMessage("Your move! Drag a piece or click to select.");
@@ -42,10 +44,24 @@ function App() {
       const res = await fetch(`${API_URL}/move`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ move: moveStr })
+        body: JSON.stringify({ game_id: gameId, move: moveStr })
       });
       const data = await res.json();
 
+      if (res.status === 404) {
+        setGameStatus("finished");
+        setStatusMessage("Game expired. Start a new game!");
+        setGameOver(true);
+        setThinking(false);
+        return;
+      }
+
+      if (res.status === 429 || res.status === 503) {
+        setStatusMessage("⏳ Engine is busy, try that move again.");
+        setThinking(false);
+        return;
+      }
+
       if (data.error) {
         setStatusMessage(`⚠️ Illegal move! Try again.`);
         setThinking(false);
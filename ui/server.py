@@ -1,20 +1,139 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import sys
 import os
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
 
 # Add engine to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 from engine.board import Board, WHITE, BLACK, PIECE_STR
-from engine.search import search
+from engine.search import use_bitbases
 from engine.move import Move
+from engine.book import OpeningBook
+from engine.pool import EnginePool, Saturated, DEADLINE_GRACE
+from engine.analysis_cache import AnalysisCache
 
 app = Flask(__name__)
 CORS(app)
 
-# Global board instance
-board = Board()
+# Engine settings
+SEARCH_DEPTH = 3
+MOVE_TIME = float(os.environ.get('CHESS_MOVE_TIME', 2.0))
+# Longest a move request may wait for a worker and search, in seconds
+MOVE_DEADLINE = float(os.environ.get('CHESS_MOVE_DEADLINE', 10.0))
+# Games idle this long are dropped
+GAME_TTL = float(os.environ.get('CHESS_GAME_TTL', 3600))
+MAX_GAMES = int(os.environ.get('CHESS_MAX_GAMES', 1000))
+# Search processes and how many searches may wait for one
+WORKERS = int(os.environ.get('CHESS_WORKERS', 0)) or None
+QUEUE = int(os.environ['CHESS_QUEUE']) if os.environ.get('CHESS_QUEUE') else None
+# Analysis cache: entries kept in memory, their lifetime in seconds, and an
+# optional SQLite file that keeps them across restarts
+CACHE_SIZE = int(os.environ.get('CHESS_CACHE_SIZE', 10000))
+CACHE_TTL = float(os.environ.get('CHESS_CACHE_TTL', 7 * 24 * 3600))
+CACHE_DB = os.environ.get('CHESS_CACHE_DB')
+# Streaming analysis: deepest search allowed, and seconds between
+# keep-alive comments (which is also how soon a closed stream is noticed)
+ANALYSIS_DEPTH = 64
+# Most candidate lines one analysis may ask for
+MAX_MULTIPV = 10
+KEEPALIVE = 1.0
+# Sent with 429/503 responses
+RETRY_AFTER = 1
+
+# Optional Polyglot opening book: CHESS_BOOK=/path/to/book.bin
+book = OpeningBook(os.environ['CHESS_BOOK']) if os.environ.get('CHESS_BOOK') else None
+
+# Optional endgame bitbases: CHESS_BITBASES=/path/to/bitbases
+BITBASES = os.environ.get('CHESS_BITBASES')
+if BITBASES:
+    use_bitbases(BITBASES)
+
+class Game:
+    def __init__(self, game_id):
+        self.id = game_id
+        self.board = Board()
+        self.moves = []          # UCI moves played so far
+        self.lock = threading.Lock()
+        self.thinking = False    # an engine move is being searched
+        self.touched = time.monotonic()
+
+class GameStore:
+    """In-memory games by id. Games idle for `ttl` seconds are evicted,
+    and the least recently used once there are `max_games`."""
+
+    def __init__(self, ttl=GAME_TTL, max_games=MAX_GAMES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_games = max_games
+        self.clock = clock
+        self.evicted = 0
+        self._games = OrderedDict()   # least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._games)
+
+    def _evict(self, now, limit):
+        # Expired games, then least recently used ones down to limit
+        while self._games:
+            game = next(iter(self._games.values()))
+            if now - game.touched < self.ttl and len(self._games) <= limit:
+                break
+            del self._games[game.id]
+            self.evicted += 1
+
+    def create(self):
+        with self._lock:
+            now = self.clock()
+            self._evict(now, self.max_games - 1)
+            game = Game(uuid.uuid4().hex)
+            game.touched = now
+            self._games[game.id] = game
+            return game
+
+    def get(self, game_id):
+        # The game, or None if unknown or expired
+        with self._lock:
+            now = self.clock()
+            self._evict(now, self.max_games)
+            game = self._games.get(game_id)
+            if game is not None:
+                game.touched = now
+                self._games.move_to_end(game_id)
+            return game
+
+games = GameStore()
+
+# Engine replies by position, shared by every game
+analysis_cache = AnalysisCache(CACHE_SIZE, CACHE_TTL, CACHE_DB)
+
+# Created on first use, so importing this module starts no processes
+engine_pool = None
+_pool_lock = threading.Lock()
+
+def get_engine_pool():
+    global engine_pool
+    with _pool_lock:
+        if engine_pool is None:
+            engine_pool = EnginePool(WORKERS, QUEUE, bitbase_dir=BITBASES)
+        return engine_pool
+
+# Running analysis streams by id, so clients can stop them
+streams = {}
+_streams_lock = threading.Lock()
+
+def error(message, status, **extra):
+    response = jsonify({'error': message, **extra})
+    response.status_code = status
+    if status in (429, 503):
+        response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
 
 def get_fen(board):
     """Convert board to FEN string"""
@@ -40,70 +159,210 @@ def get_fen(board):
     turn = 'w' if board.turn == WHITE else 'b'
     return f"{fen} {turn} - - 0 1"
 
+def game_state(game):
+    return {
+        'game_id': game.id,
+        'fen': get_fen(game.board),
+        'turn': 'white' if game.board.turn == WHITE else 'black',
+        'moves': game.moves,
+    }
+
 @app.route('/api/new_game', methods=['POST'])
 def new_game():
     """Start a new game"""
-    global board
-    board = Board()
-    return jsonify({
-        'fen': get_fen(board), 
-        'turn': 'white'
-    })
+    return jsonify(game_state(games.create()))
+
+@app.route('/api/game/<game_id>', methods=['GET'])
+def get_game(game_id):
+    """Current state of a game"""
+    game = games.get(game_id)
+    if game is None:
+        return error('Unknown game', 404)
+    return jsonify(game_state(game))
 
 @app.route('/api/move', methods=['POST'])
 def make_move():
     """Make a move and get engine response"""
-    global board
-    data = request.json
+    data = request.get_json(silent=True) or {}
     move_uci = data.get('move')
     
     if not move_uci:
-        return jsonify({'error': 'No move provided'}), 400
-    
-    # User move
-    legal_moves = board.generate_moves()
-    found = False
-    for m in legal_moves:
-        if m.to_uci() == move_uci:
-            board.make_move(m)
-            found = True
-            break
-            
-    if not found:
-        return jsonify({
-            'error': 'Illegal move', 
-            'fen': get_fen(board)
-        }), 400
-        
-    # Check if game over after user move
-    if not board.generate_moves():
-        return jsonify({
-            'fen': get_fen(board), 
-            'game_over': True, 
-            'winner': 'user',
-            'engine_move': None
-        })
-
-    # Engine move
+        return error('No move provided', 400)
+    game = games.get(data.get('game_id'))
+    if game is None:
+        return error('Unknown game', 404)
+
+    with game.lock:
+        if game.thinking:
+            return error('Engine is still thinking', 429)
+        board = game.board
+        # User move
+        move = board.legal_moves_by_uci().get(move_uci)
+        if move is None:
+            return error('Illegal move', 400, fen=get_fen(board))
+        board.make_move(move)
+        game.moves.append(move_uci)
+
+        # Check if game over after user move
+        if not board.generate_moves():
+            return jsonify({
+                'fen': get_fen(board), 
+                'game_over': True, 
+                'winner': 'user',
+                'engine_move': None
+            })
+
+        best_move = book.choose(board) if book is not None else None
+        if best_move is not None:
+            return engine_reply(game, best_move, None)
+        cached = analysis_cache.get(board, SEARCH_DEPTH, MOVE_TIME)
+        if cached is not None:
+            # Guard against a hash collision before playing the move
+            best_move = board.legal_moves_by_uci().get(cached['best_move'])
+            if best_move is not None:
+                return engine_reply(game, best_move, dict(cached, cached=True))
+        try:
+            future = get_engine_pool().submit(board.copy(), SEARCH_DEPTH, MOVE_TIME, MOVE_DEADLINE)
+        except Saturated:
+            # Leave the game as it was so the client can retry the move
+            board.unmake_move(move)
+            game.moves.pop()
+            return error('Server busy', 503)
+        game.thinking = True
+
+    # Engine move, searched in the pool without holding the game lock
     try:
-        best_move = search(board, 3, 2.0)
-        if best_move:
-            board.make_move(best_move)
-            engine_move = best_move.to_uci()
-        else:
-            engine_move = None
+        result = future.result(timeout=MOVE_DEADLINE + DEADLINE_GRACE)
     except Exception as e:
         print(f"Error during search: {e}")
+        future.cancel()
+        result = None
+    with game.lock:
+        game.thinking = False
+        if result is None:
+            # No engine move in time: take the user move back as well
+            board.unmake_move(move)
+            game.moves.pop()
+            return error('Engine timed out', 503, fen=get_fen(board))
+        analysis = result.to_dict()
+        if result.best_move is not None:
+            analysis_cache.put(board, SEARCH_DEPTH, MOVE_TIME, analysis)
+        return engine_reply(game, result.best_move, analysis)
+
+def engine_reply(game, best_move, analysis):
+    # Play the engine move; the caller holds game.lock
+    board = game.board
+    if best_move:
+        board.make_move(best_move)
+        engine_move = best_move.to_uci()
+        game.moves.append(engine_move)
+    else:
         engine_move = None
-        
     return jsonify({
         'fen': get_fen(board),
         'engine_move': engine_move,
-        'game_over': engine_move is None
+        'game_over': engine_move is None,
+        'analysis': analysis
+    })
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/analyse', methods=['GET'])
+def analyse_stream():
+    """Stream search progress as Server-Sent Events
+
+    Query: game_id or fen, depth, movetime (seconds), infinite=1 to keep
+    deepening until the client stops the stream or disconnects, multipv
+    for that many candidate moves ('lines', best first). Sends 'start'
+    (stream id), one 'info' per completed depth, then 'bestmove'.
+    """
+    args = request.args
+    if args.get('game_id'):
+        game = games.get(args['game_id'])
+        if game is None:
+            return error('Unknown game', 404)
+        with game.lock:
+            board = game.board.copy()
+    else:
+        try:
+            board = Board(args['fen']) if args.get('fen') else Board()
+        except (ValueError, IndexError, KeyError):
+            return error('Invalid FEN', 400)
+        if -1 in board.king_sq:
+            return error('Invalid FEN', 400)
+    if not board.generate_moves():
+        return error('No legal moves', 400, fen=get_fen(board))
+    try:
+        depth = max(1, min(ANALYSIS_DEPTH, int(args.get('depth', ANALYSIS_DEPTH))))
+        movetime = None if args.get('infinite') == '1' else float(args.get('movetime', MOVE_TIME))
+        multipv = max(1, min(MAX_MULTIPV, int(args.get('multipv', 1))))
+    except ValueError:
+        return error('Invalid depth, movetime or multipv', 400)
+
+    try:
+        stream = get_engine_pool().submit_stream(board, depth, movetime, MOVE_DEADLINE, multipv)
+    except Saturated:
+        return error('Server busy', 503)
+    stream_id = uuid.uuid4().hex
+    with _streams_lock:
+        streams[stream_id] = stream
+
+    def generate():
+        try:
+            yield sse('start', {'id': stream_id})
+            while True:
+                try:
+                    info = stream.events.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    if stream.future.done():
+                        break
+                    # Writing fails once the client has gone away
+                    yield ": keepalive\n\n"
+                    continue
+                if info is None:
+                    break
+                yield sse('info', info)
+            try:
+                result = stream.future.result(timeout=DEADLINE_GRACE)
+            except Exception:
+                result = None
+            if result is None:
+                yield sse('error', {'error': 'Engine timed out'})
+            else:
+                yield sse('bestmove', result.to_dict())
+        finally:
+            # Client gone or search over: make sure the worker stops
+            stream.stop()
+            with _streams_lock:
+                streams.pop(stream_id, None)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/analyse/<stream_id>/stop', methods=['POST'])
+def stop_analysis(stream_id):
+    """Stop an analysis stream; it still sends its final 'bestmove'"""
+    with _streams_lock:
+        stream = streams.get(stream_id)
+    if stream is None:
+        return error('Unknown stream', 404)
+    stream.stop()
+    return jsonify({'stopped': stream_id})
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    """Game store, engine pool and analysis cache counters"""
+    return jsonify({
+        'games': len(games),
+        'games_evicted': games.evicted,
+        'pool': engine_pool.stats() if engine_pool is not None else None,
+        'cache': analysis_cache.stats(),
+        'streams': len(streams),
     })
 
 if __name__ == '__main__':
     print("🚀 Starting Chess Engine Server...")
     print("📡 Server running on http://localhost:5000")
     print("✅ CORS enabled for frontend")
-    app.run(port=5000, debug=True)
+    app.run(port=5000, debug=True, threaded=True)